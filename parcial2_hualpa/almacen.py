@@ -0,0 +1,438 @@
+# MÓDULO: almacen.py
+# RESPONSABILIDAD: Estructura de datos en memoria (columnar).
+# Guarda los ítems en columnas tipadas (array) en lugar de un dict por país.
+# Los valores de jerarquía y las rutas de archivo se guardan UNA sola vez
+# en una tabla y cada fila solo guarda un código entero chico.
+# Las filas se acceden con "vistas" livianas que se comportan como el dict
+# de siempre (item['nombre'], item.get('continente', 'N/A'), etc.), así que
+# funciones.py y vistas.py no necesitan saber que no son diccionarios.
+# Además mantiene los índices secundarios (ver indices.py) y el árbol de
+# jerarquía con totales por nodo (ver arbol.py) al día en cada alta,
+# modificación o baja.
+# No lee ni escribe en disco.
+
+import math
+import sys
+from array import array
+
+import validaciones as val
+from arbol import ArbolJerarquia, sumar_compensado
+from indices import IndiceHash, IndiceOrdenado, IndiceTrigramas
+
+CAMPOS_NUMERICOS = ('poblacion', 'superficie')
+
+
+class ItemVista:
+
+    """
+    (ALMACÉN) Vista liviana de UNA fila del almacén.
+    No copia datos: cada acceso lee la columna correspondiente.
+    Soporta la misma interfaz de dict que usan las otras capas.
+    """
+    __slots__ = ('_almacen', '_id')
+
+    def __init__(self, almacen, id_fila):
+        self._almacen = almacen
+        self._id = id_fila
+
+    def __getitem__(self, clave):
+        valor = self._almacen.valor(self._id, clave)
+        if valor is None:
+            raise KeyError(clave)
+        return valor
+
+    def __setitem__(self, clave, valor):
+        self._almacen.actualizar(self._id, clave, valor)
+
+    def __contains__(self, clave):
+        return self.get(clave) is not None
+
+    def get(self, clave, defecto=None):
+        try:
+            valor = self._almacen.valor(self._id, clave)
+        except KeyError:
+            return defecto
+        return defecto if valor is None else valor
+
+    def keys(self):
+        return [clave for clave in self._almacen.claves() if clave in self]
+
+    def items(self):
+        return [(clave, self[clave]) for clave in self.keys()]
+
+    def a_dict(self):
+        """Copia la fila a un dict común (ej: para serializar)."""
+        return dict(self.items())
+
+    def __eq__(self, otro):
+        return (isinstance(otro, ItemVista) and otro._almacen is self._almacen
+                and otro._id == self._id)
+
+    def __hash__(self):
+        return hash((id(self._almacen), self._id))
+
+    def __repr__(self):
+        return f"ItemVista({self.a_dict()!r})"
+
+
+class AlmacenItems:
+
+    """
+    (ALMACÉN) Contenedor columnar de ítems. Se usa igual que la lista
+    'items_globales': len(), iteración, append(), extend() y remove().
+    Cada fila tiene un id entero fijo; las filas eliminadas quedan
+    marcadas como muertas hasta que se llama a compactar().
+    """
+
+    def __init__(self, niveles_jerarquia):
+        self.niveles = list(niveles_jerarquia)
+
+        # Columnas numéricas tipadas (8 bytes por valor, sin objetos Python)
+        self.poblacion = array('q')
+        self.superficie = array('d')
+        self.nombres = []
+        self.nombres_norm = []  # Nombre normalizado (búsquedas y orden)
+
+        # Columnas de códigos: el código 0 significa "sin valor"
+        self.codigos = {nivel: array('I') for nivel in self.niveles}
+        self.codigos['ruta_archivo'] = array('I')
+        self.tablas = {clave: [None] for clave in self.codigos}
+        self._indices_tablas = {clave: {} for clave in self.codigos}
+
+        # Versión normalizada de cada valor de las tablas (se calcula una vez)
+        self._tablas_norm = {clave: [None] for clave in self.codigos}
+
+        self.vivos = bytearray()  # 1 = fila viva, 0 = eliminada
+        self._cantidad_vivos = 0
+
+        # Cambia con cada alta/modificación/baja: sirve para saber si algo
+        # calculado antes (ej: un ordenamiento) sigue siendo válido.
+        self.version = 0
+        self.cache_orden = {}  # (clave, reverso) -> (version, array de ids)
+
+        self._crear_indices()
+        self._reiniciar_agregados()
+
+    # --- Interfaz tipo lista ---
+
+    def __len__(self):
+        return self._cantidad_vivos
+
+    def __bool__(self):
+        return self._cantidad_vivos > 0
+
+    def __iter__(self):
+        vivos = self.vivos
+        for id_fila in range(len(vivos)):
+            if vivos[id_fila]:
+                yield ItemVista(self, id_fila)
+
+    def append(self, item):
+        """Agrega un ítem (dict o vista) y devuelve el id de la fila nueva."""
+        id_fila = len(self.vivos)
+        self.nombres.append(sys.intern(item['nombre']))
+        self.nombres_norm.append(sys.intern(val.normalizar_texto_sin_cache(item['nombre'])))
+        self.poblacion.append(item['poblacion'])
+        self.superficie.append(item['superficie'])
+        for clave, columna in self.codigos.items():
+            columna.append(self._codificar(clave, item.get(clave)))
+        self.vivos.append(1)
+        self._cantidad_vivos += 1
+        self.version += 1
+        self._indexar(id_fila)
+        return id_fila
+
+    def extend(self, items):
+        # Una hoja leída por columnas (persistencia.HojaItems) se copia
+        # directo, sin armar un dict por fila
+        if hasattr(items, 'jerarquia_info'):
+            self.agregar_hoja(items.jerarquia_info, items.ruta_archivo,
+                              items.nombres, items.poblaciones, items.superficies)
+            return
+        for item in items:
+            self.append(item)
+
+    def agregar_hoja(self, jerarquia_info, ruta_archivo, nombres, poblaciones, superficies):
+
+        """
+        Agrega todas las filas de un mismo CSV de una vez. La jerarquía y
+        la ruta son las mismas para todas, así que se codifican UNA vez.
+        """
+        cantidad = len(nombres)
+        if not cantidad:
+            return
+        primero = len(self.vivos)
+        ids = range(primero, primero + cantidad)
+        intern = sys.intern
+        normalizar = val.normalizar_texto_sin_cache
+        self.nombres.extend([intern(nombre) for nombre in nombres])
+        self.nombres_norm.extend([intern(normalizar(nombre)) for nombre in nombres])
+        self.poblacion.extend(poblaciones)
+        self.superficie.extend(superficies)
+        for clave, columna in self.codigos.items():
+            valor = ruta_archivo if clave == 'ruta_archivo' else jerarquia_info.get(clave)
+            columna.extend(array('I', [self._codificar(clave, valor)]) * cantidad)
+        self.vivos.extend(b'\x01' * cantidad)
+        self._cantidad_vivos += cantidad
+        self.version += 1
+
+        # Índices: la jerarquía y la ruta son iguales para toda la hoja y
+        # los números se agregan como columnas; solo el nombre va por fila
+        for id_fila in ids:
+            self.indice_nombre.agregar(id_fila, self.nombres_norm[id_fila])
+        self.indice_ruta.agregar_lote(ids, self.codigos['ruta_archivo'][primero])
+        for nivel, indice in self.indices_nivel.items():
+            indice.agregar_lote(ids, self._valor_norm(nivel, primero))
+        self.indice_poblacion.agregar_lote(ids, self.poblacion[primero:])
+        self.indice_superficie.agregar_lote(ids, self.superficie[primero:])
+        self.suma_poblacion += sum(poblaciones)
+        self._suma_superficie, self._compensacion_superficie = sumar_compensado(
+            self._suma_superficie, self._compensacion_superficie, math.fsum(superficies))
+        # Todas las filas van al mismo nodo: se suman juntas
+        self.arbol.agregar_lote(
+            ids, tuple(jerarquia_info.get(nivel) for nivel in self.niveles),
+            poblaciones, superficies)
+
+    def remove(self, item):
+        """Elimina la fila de una vista. Igual que list.remove, lanza ValueError."""
+        if (not isinstance(item, ItemVista) or item._almacen is not self
+                or not self.vivos[item._id]):
+            raise ValueError("El ítem no pertenece al almacén")
+        self.eliminar_fila(item._id)
+
+    # --- Acceso por id de fila ---
+
+    def vista(self, id_fila):
+        return ItemVista(self, id_fila)
+
+    def ids_vivos(self):
+        vivos = self.vivos
+        return [id_fila for id_fila in range(len(vivos)) if vivos[id_fila]]
+
+    def cantidad_muertas(self):
+        return len(self.vivos) - self._cantidad_vivos
+
+    def claves(self):
+        return ['nombre', *CAMPOS_NUMERICOS, *self.niveles, 'ruta_archivo']
+
+    def valor(self, id_fila, clave):
+        if clave == 'nombre':
+            return self.nombres[id_fila]
+        if clave == 'poblacion':
+            return self.poblacion[id_fila]
+        if clave == 'superficie':
+            return self.superficie[id_fila]
+        # KeyError si la clave no existe, igual que un dict
+        return self.tablas[clave][self.codigos[clave][id_fila]]
+
+    def actualizar(self, id_fila, clave, valor):
+        if clave not in self.claves():
+            raise KeyError(clave)
+
+        # Convertimos ANTES de tocar los índices: si el valor es inválido,
+        # la excepción sale sin dejar la fila a medio actualizar.
+        if clave == 'nombre':
+            columna, valor = self.nombres, sys.intern(valor)
+            nombre_norm = sys.intern(val.normalizar_texto_sin_cache(valor))
+        elif clave == 'poblacion':
+            columna, valor = self.poblacion, array('q', [valor])[0]
+        elif clave == 'superficie':
+            columna, valor = self.superficie, array('d', [valor])[0]
+        else:
+            columna, valor = self.codigos[clave], self._codificar(clave, valor)
+
+        # Solo se tocan los índices de esa clave
+        vivo = self.vivos[id_fila]
+        if vivo:
+            self._desindexar(id_fila, clave)
+        columna[id_fila] = valor
+        if clave == 'nombre':
+            self.nombres_norm[id_fila] = nombre_norm
+        self.version += 1
+
+        if vivo:
+            self._indexar(id_fila, clave)
+
+    def eliminar_fila(self, id_fila):
+        self._desindexar(id_fila)
+        self.vivos[id_fila] = 0
+        self._cantidad_vivos -= 1
+        self.version += 1
+
+    def compactar(self):
+
+        """
+        Quita físicamente las filas muertas. OJO: cambia los ids,
+        así que las vistas obtenidas antes dejan de ser válidas.
+        """
+        ids = self.ids_vivos()
+        self.nombres = [self.nombres[i] for i in ids]
+        self.nombres_norm = [self.nombres_norm[i] for i in ids]
+        self.poblacion = array('q', (self.poblacion[i] for i in ids))
+        self.superficie = array('d', (self.superficie[i] for i in ids))
+        for clave, columna in self.codigos.items():
+            self.codigos[clave] = array('I', (columna[i] for i in ids))
+        self.vivos = bytearray(b'\x01' * len(ids))
+        self.version += 1
+        self.cache_orden = {}  # Los ids cambiaron
+
+        # Los ids cambiaron: reconstruimos los índices desde cero
+        self._crear_indices()
+        self._reiniciar_agregados()
+        for id_fila in range(len(ids)):
+            self._indexar(id_fila)
+
+    # --- Índices secundarios ---
+
+    def _crear_indices(self):
+        # Cada índice le pregunta al almacén si una entrada sigue vigente
+        # (fila viva y con el mismo valor): las bajas quedan como lápidas
+        vivos = lambda i: self.vivos[i]
+        self.indice_nombre = IndiceTrigramas(
+            lambda i: self.nombres_norm[i] if vivos(i) else None)
+        self.indices_nivel = {
+            nivel: IndiceHash(lambda i, valor, nivel=nivel:
+                              vivos(i) and self._valor_norm(nivel, i) == valor)
+            for nivel in self.niveles}
+        self.indice_ruta = IndiceHash(     # código de ruta -> ids
+            lambda i, codigo: vivos(i) and self.codigos['ruta_archivo'][i] == codigo)
+        self.indice_poblacion = IndiceOrdenado(
+            'q', lambda i, valor: vivos(i) and self.poblacion[i] == valor)
+        self.indice_superficie = IndiceOrdenado(
+            'd', lambda i, valor: vivos(i) and self.superficie[i] == valor)
+
+    def _valor_norm(self, clave, id_fila):
+        return self._tablas_norm[clave][self.codigos[clave][id_fila]]
+
+    def _indexar(self, id_fila, clave=None):
+        """Agrega la fila a los índices de 'clave' (None = todos)."""
+        if clave in (None, 'nombre'):
+            self.indice_nombre.agregar(id_fila, self.nombres_norm[id_fila])
+        if clave in (None, 'ruta_archivo'):
+            self.indice_ruta.agregar(id_fila, self.codigos['ruta_archivo'][id_fila])
+        for nivel, indice in self.indices_nivel.items():
+            if clave in (None, nivel):
+                indice.agregar(id_fila, self._valor_norm(nivel, id_fila))
+        if clave in (None, 'poblacion'):
+            self.indice_poblacion.agregar(id_fila, self.poblacion[id_fila])
+        if clave in (None, 'superficie'):
+            self.indice_superficie.agregar(id_fila, self.superficie[id_fila])
+        if clave in (None, *CAMPOS_NUMERICOS):
+            self._sumar_agregados(id_fila, 1)
+        if clave not in ('nombre', 'ruta_archivo'):
+            self.arbol.agregar(id_fila, self.camino(id_fila),
+                               self.poblacion[id_fila], self.superficie[id_fila])
+
+    def _desindexar(self, id_fila, clave=None):
+        """Quita la fila (con sus valores actuales) de los índices de 'clave'."""
+        if clave in (None, 'nombre'):
+            self.indice_nombre.quitar(id_fila, self.nombres_norm[id_fila])
+        if clave in (None, 'ruta_archivo'):
+            self.indice_ruta.quitar(id_fila, self.codigos['ruta_archivo'][id_fila])
+        for nivel, indice in self.indices_nivel.items():
+            if clave in (None, nivel):
+                indice.quitar(id_fila, self._valor_norm(nivel, id_fila))
+        if clave in (None, 'poblacion'):
+            self.indice_poblacion.quitar(id_fila, self.poblacion[id_fila])
+        if clave in (None, 'superficie'):
+            self.indice_superficie.quitar(id_fila, self.superficie[id_fila])
+        if clave in (None, *CAMPOS_NUMERICOS):
+            self._sumar_agregados(id_fila, -1)
+        if clave not in ('nombre', 'ruta_archivo'):
+            self.arbol.quitar(id_fila, self.camino(id_fila),
+                              self.poblacion[id_fila], self.superficie[id_fila])
+
+    # --- Agregados mantenidos en cada cambio ---
+
+    def _reiniciar_agregados(self):
+        self.suma_poblacion = 0
+        # Superficie: suma compensada (ver arbol.sumar_compensado())
+        self._suma_superficie = 0.0
+        self._compensacion_superficie = 0.0
+        # Totales por continente, región... (reemplaza a los agregados por nivel)
+        self.arbol = ArbolJerarquia(
+            self.niveles, self._valores_numericos,
+            lambda i, camino: self.vivos[i] and self.camino(i) == camino)
+
+    def _valores_numericos(self, id_fila):
+        return self.poblacion[id_fila], self.superficie[id_fila]
+
+    def camino(self, id_fila):
+        """Valores de jerarquía de una fila, en orden de nivel (None = sin valor)."""
+        return tuple(self.tablas[nivel][self.codigos[nivel][id_fila]]
+                     for nivel in self.niveles)
+
+    def _sumar_agregados(self, id_fila, signo):
+        """Suma (signo=1) o resta (signo=-1) una fila de los agregados."""
+        pob = self.poblacion[id_fila]
+        sup = self.superficie[id_fila]
+        self.suma_poblacion += signo * pob
+        self._suma_superficie, self._compensacion_superficie = sumar_compensado(
+            self._suma_superficie, self._compensacion_superficie, signo * sup)
+
+    @property
+    def suma_superficie(self):
+        return self._suma_superficie + self._compensacion_superficie
+
+    def filtrar_por_nombre(self, busqueda_norm):
+        """Ítems cuyo nombre normalizado contiene 'busqueda_norm'."""
+        return [ItemVista(self, i)
+                for i in self.indice_nombre.buscar_subcadena(busqueda_norm)]
+
+    def filtrar_por_nivel(self, nivel, valor_norm):
+        """Ítems cuyo valor (normalizado) en 'nivel' es exactamente 'valor_norm'."""
+        return [ItemVista(self, i)
+                for i in self.indices_nivel[nivel].buscar(valor_norm)]
+
+    def filtrar_por_niveles(self, condiciones):
+
+        """
+        Ítems que cumplen TODAS las condiciones {nivel: función(valor_norm)}.
+        Cada función se prueba una vez por valor distinto del nivel (no
+        por fila) y las filas salen de los índices hash de esos valores.
+        """
+        ids = None
+        for nivel, acepta in condiciones.items():
+            indice = self.indices_nivel[nivel]
+            del_nivel = set()
+            for valor_norm in indice.valores():
+                if valor_norm is not None and acepta(valor_norm):
+                    del_nivel.update(indice.buscar(valor_norm))
+            ids = del_nivel if ids is None else ids & del_nivel
+            if not ids:
+                return []
+        return [ItemVista(self, i) for i in sorted(ids or ())]
+
+    def buscar_por_nombre_exacto(self, nombre_norm):
+        """Ítems cuyo nombre normalizado es exactamente 'nombre_norm'."""
+        return [ItemVista(self, i)
+                for i in self.indice_nombre.buscar_exacto(nombre_norm)]
+
+    def items_de_archivo(self, ruta_archivo):
+        """Ítems (en orden de carga) que pertenecen a un mismo CSV."""
+        codigo = self.codigo_de('ruta_archivo', ruta_archivo)
+        if codigo is None:
+            return []
+        return [ItemVista(self, i) for i in self.indice_ruta.buscar(codigo)]
+
+    def filtrar_por_rango_poblacion(self, minimo, maximo):
+        """Ítems con minimo <= poblacion <= maximo."""
+        return [ItemVista(self, i)
+                for i in self.indice_poblacion.buscar_rango(minimo, maximo)]
+
+    # --- Tablas de códigos ---
+
+    def _codificar(self, clave, valor):
+        if valor is None:
+            return 0
+        indice = self._indices_tablas[clave]
+        codigo = indice.get(valor)
+        if codigo is None:
+            codigo = indice[valor] = len(self.tablas[clave])
+            self.tablas[clave].append(sys.intern(valor))
+            self._tablas_norm[clave].append(val.normalizar_texto(valor))
+        return codigo
+
+    def codigo_de(self, clave, valor):
+        """Código de un valor de jerarquía/ruta, o None si nunca se vio."""
+        return self._indices_tablas[clave].get(valor)
@@ -0,0 +1,208 @@
+# MÓDULO: arbol.py
+# RESPONSABILIDAD: Árbol de jerarquía en memoria con totales por nodo.
+# Copia la forma de las carpetas (continente / region / gobierno): cada
+# nodo guarda cuántos ítems tiene debajo, las sumas de población y
+# superficie y los mínimos/máximos. El almacén lo actualiza en cada alta,
+# modificación o baja, así las estadísticas por nivel y la navegación
+# ("drill-down") salen de los nodos sin recorrer los ítems.
+# Las hojas guardan los ids de sus filas en un array (como indices.py):
+# las bajas quedan como lápidas y se limpian cuando son mayoría.
+# No lee ni escribe en disco.
+
+import math
+from array import array
+
+
+def sumar_compensado(suma, compensacion, valor):
+
+    """
+    (ÁRBOL) Suma compensada (Kahan-Neumaier): devuelve (suma, compensacion)
+    con 'valor' sumado. 'compensacion' junta lo que cada redondeo pierde y
+    el total es suma + compensacion; así miles de altas y bajas de
+    superficies (float) no van corriendo el total.
+    """
+    nueva = suma + valor
+    if abs(suma) >= abs(valor):
+        compensacion += (suma - nueva) + valor
+    else:
+        compensacion += (valor - nueva) + suma
+    return nueva, compensacion
+
+
+class NodoJerarquia:
+
+    """
+    (ÁRBOL) Un nodo: la raíz, un continente, una región de ese continente...
+    'camino' es la tupla de valores desde la raíz (ej: ('Europa', 'Sur')).
+    Los mínimos/máximos se mantienen al agregar; si se quita justo el
+    valor extremo, el nodo queda "sucio" y se recalcula al consultarlo
+    (desde sus hijos, o desde sus filas si es una hoja).
+    """
+
+    __slots__ = ('camino', 'hijos', 'ids', 'cantidad', 'suma_poblacion',
+                 '_suma_superficie', '_compensacion', '_extremos', '_sucio', '_lapidas')
+
+    def __init__(self, camino, es_hoja):
+        self.camino = camino
+        self.hijos = {}                      # valor -> NodoJerarquia
+        self.ids = array('I') if es_hoja else None   # Con lápidas (ver quitar())
+        self._lapidas = 0
+        self.cantidad = 0
+        self.suma_poblacion = 0
+        self._suma_superficie = 0.0
+        self._compensacion = 0.0
+        # [min poblacion, max poblacion, min superficie, max superficie]
+        self._extremos = None
+        self._sucio = False
+
+    @property
+    def suma_superficie(self):
+        return self._suma_superficie + self._compensacion
+
+    def _sumar(self, cantidad, suma_pob, suma_sup, extremos):
+        self.cantidad += cantidad
+        self.suma_poblacion += suma_pob
+        self._suma_superficie, self._compensacion = sumar_compensado(
+            self._suma_superficie, self._compensacion, suma_sup)
+        if self._sucio:
+            return  # Se recalcula entero al consultarlo
+        if self._extremos is None:
+            self._extremos = list(extremos)
+            return
+        actuales = self._extremos
+        if extremos[0] < actuales[0]:
+            actuales[0] = extremos[0]
+        if extremos[1] > actuales[1]:
+            actuales[1] = extremos[1]
+        if extremos[2] < actuales[2]:
+            actuales[2] = extremos[2]
+        if extremos[3] > actuales[3]:
+            actuales[3] = extremos[3]
+
+    def _restar(self, pob, sup):
+        self.cantidad -= 1
+        self.suma_poblacion -= pob
+        self._suma_superficie, self._compensacion = sumar_compensado(
+            self._suma_superficie, self._compensacion, -sup)
+        if self.cantidad == 0:
+            self._suma_superficie = self._compensacion = 0.0  # Sin restos de redondeo
+            self._extremos = None
+            self._sucio = False
+        elif self._extremos is not None and (
+                pob in (self._extremos[0], self._extremos[1])
+                or sup in (self._extremos[2], self._extremos[3])):
+            self._sucio = True
+
+
+class ArbolJerarquia:
+
+    """
+    (ÁRBOL) Árbol completo. 'valores_fila(id)' devuelve (poblacion,
+    superficie) de una fila: se usa solo para recalcular los extremos
+    de una hoja después de una baja. 'fila_vigente(id, camino)' dice si
+    la fila sigue viva y en ese camino (reconoce las lápidas de las
+    hojas); sin él (árbol de solo altas) todos los ids valen.
+    """
+
+    def __init__(self, niveles_jerarquia, valores_fila, fila_vigente=None):
+        self.niveles = list(niveles_jerarquia)
+        self.raiz = NodoJerarquia((), es_hoja=not self.niveles)
+        self._valores_fila = valores_fila
+        self._fila_vigente = fila_vigente
+
+    def _camino_de_nodos(self, camino, crear):
+        """Nodos desde la raíz hasta la hoja de 'camino' (o None si no existe)."""
+        nodos = [self.raiz]
+        nodo = self.raiz
+        for profundidad, valor in enumerate(camino, start=1):
+            hijo = nodo.hijos.get(valor)
+            if hijo is None:
+                if not crear:
+                    return None
+                hijo = nodo.hijos[valor] = NodoJerarquia(
+                    camino[:profundidad], es_hoja=profundidad == len(self.niveles))
+            nodos.append(hijo)
+            nodo = hijo
+        return nodos
+
+    def agregar(self, id_fila, camino, poblacion, superficie):
+        """Suma una fila. 'camino' trae un valor por nivel (None = sin valor)."""
+        extremos = (poblacion, poblacion, superficie, superficie)
+        nodos = self._camino_de_nodos(camino, crear=True)
+        for nodo in nodos:
+            nodo._sumar(1, poblacion, superficie, extremos)
+        nodos[-1].ids.append(id_fila)
+
+    def agregar_lote(self, ids, camino, poblaciones, superficies):
+        """Suma varias filas con el MISMO camino (ej: un CSV entero) de una vez."""
+        if not ids:
+            return
+        extremos = (min(poblaciones), max(poblaciones), min(superficies), max(superficies))
+        suma_pob = sum(poblaciones)
+        suma_sup = math.fsum(superficies)
+        nodos = self._camino_de_nodos(camino, crear=True)
+        for nodo in nodos:
+            nodo._sumar(len(ids), suma_pob, suma_sup, extremos)
+        nodos[-1].ids.extend(ids)
+
+    def quitar(self, id_fila, camino, poblacion, superficie):
+        """
+        Resta una fila (con los valores y el camino que tenía al agregarse).
+        Su id queda en la hoja como lápida hasta la próxima limpieza.
+        """
+        nodos = self._camino_de_nodos(camino, crear=False)
+        if nodos is None:
+            return
+        for nodo in nodos:
+            nodo._restar(poblacion, superficie)
+        hoja = nodos[-1]
+        hoja._lapidas += 1
+        if hoja._lapidas * 2 > len(hoja.ids):
+            hoja.ids = array('I', self._ids_vigentes(hoja))
+            hoja._lapidas = 0
+
+        # Los nodos que quedaron vacíos se sacan del árbol (la raíz nunca)
+        for padre, nodo in zip(reversed(nodos[:-1]), reversed(nodos[1:])):
+            if nodo.cantidad:
+                break
+            del padre.hijos[nodo.camino[-1]]
+
+    def _ids_vigentes(self, hoja):
+        """Ids (ordenados, sin repetir) de las filas que siguen en la hoja."""
+        if self._fila_vigente is None:
+            return sorted(set(hoja.ids))
+        fila_vigente = self._fila_vigente
+        camino = hoja.camino
+        return sorted({i for i in hoja.ids if fila_vigente(i, camino)})
+
+    def nodo(self, camino):
+        """El nodo de ese camino (parcial o completo), o None."""
+        nodos = self._camino_de_nodos(tuple(camino), crear=False)
+        return nodos[-1] if nodos else None
+
+    def nodos_en_profundidad(self, profundidad):
+        """Lista con los nodos de una profundidad (0 = la raíz, 1 = primer nivel...)."""
+        pendientes = [self.raiz]
+        for _ in range(profundidad):
+            pendientes = [hijo for nodo in pendientes for hijo in nodo.hijos.values()]
+        return pendientes
+
+    def extremos(self, nodo):
+
+        """
+        (ÁRBOL) [min poblacion, max poblacion, min superficie, max superficie]
+        de un nodo, recalculándolos si una baja los dejó desactualizados.
+        """
+        if nodo._sucio:
+            if nodo.ids is not None:
+                valores = [self._valores_fila(i) for i in self._ids_vigentes(nodo)]
+                poblaciones = [pob for pob, _ in valores]
+                superficies = [sup for _, sup in valores]
+                nodo._extremos = [min(poblaciones), max(poblaciones),
+                                  min(superficies), max(superficies)]
+            else:
+                de_hijos = [self.extremos(hijo) for hijo in nodo.hijos.values()]
+                nodo._extremos = [min(e[0] for e in de_hijos), max(e[1] for e in de_hijos),
+                                  min(e[2] for e in de_hijos), max(e[3] for e in de_hijos)]
+            nodo._sucio = False
+        return nodo._extremos
@@ -0,0 +1,641 @@
+# MÓDULO: backends.py
+# RESPONSABILIDAD: Dónde viven los datos (LÓGICA). Un "backend" ofrece las
+# mismas operaciones sin importar cómo se guardan los ítems:
+#   BackendCSV:    la carpeta 'datos_paises' (un items.csv por hoja), con el
+#                  almacén en memoria, el journal y el snapshot de siempre.
+#   BackendSQLite: una base SQLite local (ver persistencia_sqlite.py); los
+#                  filtros, órdenes y agregados los resuelve SQLite con sus
+#                  índices, sin cargar los ítems en memoria.
+# Operaciones (las usa cli.py): cargar, filtrar, ordenar, estadisticas,
+# explorar, buscar_por_nombre, alta, modificar, eliminar, importar,
+# iterar_items, iterar_lotes, agregar_items, carga_masiva, esta_vacio y cerrar.
+# migrar() copia todos los ítems de un backend a otro (en cualquier sentido);
+# exportar_columnar() / importar_columnar() los pasan por UN archivo columnar
+# (ver persistencia_columnar.py), para compartir los datos completos.
+# No imprime tablas (eso lo hace 'vistas.py').
+
+import contextlib
+import itertools
+import time
+
+import funciones as fn
+import persistencia as db
+import persistencia_columnar as dbc
+import persistencia_sqlite as dbs
+import validaciones as val
+
+# Filas por transacción (SQLite) o por escritura de CSV al copiar/importar
+FILAS_POR_LOTE = 1000
+
+
+class ErrorBackend(Exception):
+
+    """(BACKEND) El backend no puede atender el pedido (ej: base que no abre)."""
+
+
+class BackendCSV:
+
+    """
+    (BACKEND) La carpeta de CSV. Guarda la configuración de main.py y los
+    datos, que se cargan UNA vez (recién cuando una operación los necesita).
+    'items' es el AlmacenItems cargado (o None) y 'manifiesto' las firmas
+    de los CSV leídos; el servidor los usa para seguir los cambios externos.
+    """
+
+    def __init__(self, directorio_datos, niveles_jerarquia, campos_item_csv,
+                 ruta_journal, ruta_snapshot, lote_journal):
+        self.directorio_datos = directorio_datos
+        self.niveles = niveles_jerarquia
+        self.campos = campos_item_csv
+        self.ruta_journal = ruta_journal
+        self.ruta_snapshot = ruta_snapshot
+        self.lote_journal = lote_journal
+        self.items = None
+        self.manifiesto = {}
+
+    def cargar(self):
+        """(Re)carga todo desde el disco. Devuelve la cantidad de ítems."""
+        fn.compactar_journal(self.ruta_journal, self.campos)
+        self.items = fn.cargar_almacen(
+            self.directorio_datos, self.niveles, manifiesto=self.manifiesto,
+            ruta_snapshot=self.ruta_snapshot)
+        return len(self.items)
+
+    def datos(self):
+        if self.items is None:
+            self.cargar()
+        return self.items
+
+    def filtrar(self, criterio=None, restricciones=None, limite=None):
+
+        """
+        (BACKEND) Ítems que cumplen el criterio (ver filtrar_por_criterio())
+        y las restricciones por nivel ({nivel: patrones}). Hace falta al
+        menos uno de los dos. Devuelve (cantidad, primeros 'limite' ítems).
+        """
+        primer_nivel = self.niveles[0]
+        if restricciones and self.items is None:
+            # Sin datos en memoria: solo se leen las ramas pedidas, no todo el árbol
+            fn.compactar_journal(self.ruta_journal, self.campos)
+            resultados = fn.cargar_datos_por_jerarquia(
+                self.directorio_datos, self.niveles, restricciones)
+        elif restricciones:
+            resultados = fn.filtrar_por_criterio(
+                self.items, ('jerarquia', restricciones), primer_nivel)
+        else:
+            resultados = self.datos()
+        if criterio is not None:
+            resultados = fn.filtrar_por_criterio(resultados, criterio, primer_nivel)
+        return len(resultados), resultados[:limite]
+
+    def ordenar(self, clave_ordenamiento, reverso, limite=None):
+        """Devuelve (cantidad total, primeros 'limite' ítems ordenados)."""
+        items = self.datos()
+        ordenados = fn.ordenar_items(items, clave_ordenamiento, reverso, limite)
+        return len(items), ordenados[:limite]
+
+    def estadisticas(self, niveles_grupo):
+        return fn.calcular_estadisticas(self.datos(), niveles_grupo)
+
+    def explorar(self, camino):
+        return fn.explorar_jerarquia(self.datos(), self.niveles, camino)
+
+    def buscar_por_nombre(self, nombre):
+        return fn.buscar_por_nombre_exacto(self.datos(), nombre)
+
+    def alta(self, jerarquia_valores, item_para_csv):
+
+        """
+        (BACKEND) Guarda un ítem ya validado. Devuelve un dict con dónde
+        quedó ({'ruta_archivo': ...}) o None si no se pudo guardar.
+        """
+        ruta = fn.aplicar_alta(self.directorio_datos, jerarquia_valores,
+                               item_para_csv, self.campos)
+        if ruta is None:
+            return None
+        if self.items is not None:
+            # Igual que en el menú: solo se relee el CSV que cambió (con sus
+            # cambios pendientes del journal ya aplicados), sin recorrer el árbol
+            fn.compactar_journal(self.ruta_journal, self.campos, self.manifiesto,
+                                 solo_rutas={ruta})
+            fn.recargar_hojas(self.directorio_datos, self.niveles, self.items,
+                              self.manifiesto, [ruta])
+        return {'ruta_archivo': ruta}
+
+    def modificar(self, item, campo, valor):
+        """Cambia un campo de un ítem (de buscar_por_nombre()). Devuelve True si se guardó."""
+        if not fn.aplicar_modificacion(self.items, item, campo, valor,
+                                       self.campos, self.ruta_journal, self.manifiesto):
+            return False
+        fn.compactar_journal(self.ruta_journal, self.campos,
+                             self.manifiesto, self.lote_journal)
+        return True
+
+    def eliminar(self, item):
+        if not fn.aplicar_eliminacion(self.items, item, self.campos, self.ruta_journal,
+                                      self.manifiesto):
+            return False
+        fn.compactar_journal(self.ruta_journal, self.campos,
+                             self.manifiesto, self.lote_journal)
+        return True
+
+    def importar(self, ruta_feed):
+        """Importación masiva (ver importar_items_masivo()). Devuelve el resumen o None."""
+        fn.compactar_journal(self.ruta_journal, self.campos)
+        resumen = fn.importar_items_masivo(
+            ruta_feed, self.directorio_datos, self.niveles, self.campos)
+        if resumen is not None and self.items is not None and resumen['aceptadas']:
+            fn.recargar_datos_incremental(
+                self.directorio_datos, self.niveles, self.items, self.manifiesto)
+        return resumen
+
+    def iterar_items(self):
+        """Todos los ítems: los de memoria, o leídos del disco de a un CSV."""
+        fn.compactar_journal(self.ruta_journal, self.campos)
+        if self.items is not None:
+            return self.items
+        return fn.iterar_datos_recursivo(self.directorio_datos, self.niveles)
+
+    def iterar_lotes(self, filas_por_lote=FILAS_POR_LOTE):
+        """
+        Todos los ítems en lotes: sin cargar, una HojaItems por CSV (leída
+        por columnas); cargados, listas de hasta 'filas_por_lote' ítems.
+        """
+        fn.compactar_journal(self.ruta_journal, self.campos)
+        if self.items is None:
+            return fn.iterar_hojas_recursivo(self.directorio_datos, self.niveles)
+        items = iter(self.items)
+        return iter(lambda: list(itertools.islice(items, filas_por_lote)), [])
+
+    def agregar_items(self, filas):
+
+        """
+        (BACKEND) Escritura masiva de filas ya validadas
+        [(jerarquia_valores, item_para_csv), ...]: una escritura por hoja.
+        Devuelve (guardadas, rechazadas) con rechazadas = [(None, motivo)].
+        """
+        filas_por_carpeta = {}
+        rechazadas = []
+        for jerarquia_valores, item_para_csv in filas:
+            if None in jerarquia_valores:
+                # Sin valor en algún nivel no hay carpeta donde ponerlo
+                rechazadas.append((None, f"{item_para_csv['nombre']}: le falta un nivel "
+                                         f"de jerarquía ({', '.join(self.niveles)})."))
+                continue
+            errores = [f"{nivel}: {error}" for nivel, valor in zip(self.niveles, jerarquia_valores)
+                       if (error := val.error_nombre_carpeta(valor))]
+            if errores:
+                # Viene de otra base o de un archivo: no puede salir de la carpeta
+                rechazadas.append((None, f"{item_para_csv['nombre']}: {'; '.join(errores)}"))
+                continue
+            filas_por_carpeta.setdefault(tuple(jerarquia_valores), []).append(
+                {campo: item_para_csv[campo] for campo in self.campos})
+        guardadas, _ = fn.guardar_items_por_carpeta(
+            self.directorio_datos, filas_por_carpeta, self.campos, rechazadas)
+        if guardadas and self.items is not None:
+            fn.recargar_datos_incremental(
+                self.directorio_datos, self.niveles, self.items, self.manifiesto)
+        return guardadas, rechazadas
+
+    def carga_masiva(self):
+        """Los CSV no tienen índices que rearmar: no hace falta preparar nada."""
+        return contextlib.nullcontext()
+
+    def esta_vacio(self):
+        return next(iter(self.iterar_items()), None) is None
+
+    def cerrar(self):
+        """Aplica a los CSV los cambios que hayan quedado en el journal."""
+        fn.compactar_journal(self.ruta_journal, self.campos, self.manifiesto)
+
+
+class _ColumnaOrdenada:
+
+    """
+    Ayuda (BACKEND): Una columna de la base vista como lista ordenada
+    (len() y [posición]) sin traerla entera: cada posición es una
+    consulta sobre el índice. Alcanza para calcular percentiles.
+    """
+
+    def __init__(self, conexion, columna, cantidad):
+        self._conexion = conexion
+        self._columna = columna
+        self._cantidad = cantidad
+
+    def __len__(self):
+        return self._cantidad
+
+    def __getitem__(self, posicion):
+        return dbs.valor_en_posicion(self._conexion, self._columna, posicion)
+
+
+def _resumen_grupo(agregados):
+
+    """
+    Ayuda (BACKEND): Tupla (cantidad, sumas, mínimos y máximos) de un
+    GROUP BY como dict, con las claves de cada grupo de calcular_estadisticas().
+    """
+    cantidad, suma_pob, suma_sup, min_pob, max_pob, min_sup, max_sup = agregados
+    return {
+        'cantidad': cantidad,
+        'total_poblacion': suma_pob,
+        'total_superficie': suma_sup,
+        'promedio_poblacion': suma_pob / cantidad,
+        'promedio_superficie': suma_sup / cantidad,
+        'min_poblacion': min_pob,
+        'max_poblacion': max_pob,
+        'min_superficie': min_sup,
+        'max_superficie': max_sup
+    }
+
+
+class BackendSQLite:
+
+    """
+    (BACKEND) Base SQLite local. No carga nada en memoria: cada operación
+    es una consulta. Las escrituras sueltas (alta, modificar, eliminar)
+    quedan en una transacción abierta que se confirma cada
+    'lote_escrituras' cambios y al cerrar; las masivas (importar,
+    agregar_items) van en una transacción por lote de FILAS_POR_LOTE.
+    Los ítems son dicts con su 'id' de la base.
+    """
+
+    def __init__(self, ruta_base_datos, niveles_jerarquia, campos_item_csv,
+                 lote_escrituras=1):
+        self.ruta_base_datos = ruta_base_datos
+        self.niveles = niveles_jerarquia
+        self.campos = campos_item_csv
+        self.lote_escrituras = max(1, lote_escrituras)
+        self._conexion = None
+        self._pendientes = 0
+
+    def _base(self):
+        if self._conexion is None:
+            self._conexion = dbs.abrir_base(self.ruta_base_datos, self.niveles)
+            if self._conexion is None:
+                raise ErrorBackend(f"No se pudo abrir la base {self.ruta_base_datos}.")
+        return self._conexion
+
+    def _anotar_escritura(self):
+        self._pendientes += 1
+        if self._pendientes >= self.lote_escrituras:
+            dbs.confirmar(self._conexion)
+            self._pendientes = 0
+
+    def cargar(self):
+        """Nada que cargar: devuelve la cantidad de ítems de la base."""
+        return dbs.contar_items(self._base())
+
+    def filtrar(self, criterio=None, restricciones=None, limite=None):
+        """Igual que BackendCSV.filtrar(), resuelto con un WHERE (y LIMIT)."""
+        conexion = self._base()
+        condiciones = dbs.armar_condiciones(self.niveles, criterio, restricciones)
+        return (dbs.contar_items(conexion, condiciones),
+                dbs.consultar_items(conexion, self.niveles, condiciones, limite=limite))
+
+    def ordenar(self, clave_ordenamiento, reverso, limite=None):
+        """Igual que BackendCSV.ordenar(), con ORDER BY sobre el índice de la clave."""
+        if clave_ordenamiento == 'nombre':
+            # Como ordenar_items(): sin mayúsculas ni acentos, desempata el original
+            orden = [('nombre_norm', reverso), ('nombre', reverso)]
+        else:
+            orden = [(clave_ordenamiento, reverso)]
+        conexion = self._base()
+        return (dbs.contar_items(conexion),
+                dbs.consultar_items(conexion, self.niveles,
+                                    orden=orden + [('id', False)], limite=limite))
+
+    def estadisticas(self, niveles_grupo, percentiles=(25, 50, 75)):
+
+        """
+        (BACKEND) Mismo diccionario que calcular_estadisticas(), armado con
+        agregados de SQL (SUM/MIN/MAX ... GROUP BY); extremos y percentiles
+        se leen por posición en los índices de población y superficie.
+        """
+        conexion = self._base()
+        _, cantidad, suma_pob, suma_sup, *_ = dbs.consultar_agregados(conexion)[0]
+        if not cantidad:
+            return None
+
+        # Mismo orden de grupos que BackendCSV (ver fn.ordenar_grupos())
+        grupos = fn.ordenar_grupos({
+            valores: _resumen_grupo(agregados)
+            for valores, *agregados in dbs.consultar_agregados(conexion, niveles_grupo)
+        })
+        poblaciones = _ColumnaOrdenada(conexion, 'poblacion', cantidad)
+        superficies = _ColumnaOrdenada(conexion, 'superficie', cantidad)
+        return {
+            'cantidad_total': cantidad,
+            'total_poblacion': suma_pob,
+            'total_superficie': suma_sup,
+            'promedio_poblacion': suma_pob / cantidad,
+            'promedio_superficie': suma_sup / cantidad,
+            'pais_mayor_pob': dbs.item_extremo(conexion, self.niveles, 'poblacion', True),
+            'pais_menor_pob': dbs.item_extremo(conexion, self.niveles, 'poblacion', False),
+            'pais_mayor_sup': dbs.item_extremo(conexion, self.niveles, 'superficie', True),
+            'pais_menor_sup': dbs.item_extremo(conexion, self.niveles, 'superficie', False),
+            'percentiles_poblacion': {p: fn.percentil(poblaciones, p) for p in percentiles},
+            'percentiles_superficie': {p: fn.percentil(superficies, p) for p in percentiles},
+            'conteo_primer_nivel': {clave: grupo['cantidad'] for clave, grupo in grupos.items()},
+            'grupos': grupos,
+            'primer_nivel_jerarquia': " / ".join(niveles_grupo)
+        }
+
+    def explorar(self, camino):
+        """Igual que explorar_jerarquia(): totales del nodo (WHERE) y de sus hijos (GROUP BY)."""
+        if len(camino) > len(self.niveles):
+            return None
+        sin_categoria_norm = val.normalizar_texto(fn.SIN_CATEGORIA)
+        camino_norm = [None if valor == sin_categoria_norm else valor
+                       for valor in map(val.normalizar_texto, camino)]
+        conexion = self._base()
+        condiciones = dbs.armar_condiciones(self.niveles, camino=camino_norm)
+        _, *total = dbs.consultar_agregados(conexion, condiciones=condiciones)[0]
+        if camino and not total[0]:
+            return None
+
+        profundidad = len(camino)
+        camino_real = []
+        if camino:
+            # Los valores tal como están guardados (con mayúsculas y acentos)
+            item = dbs.consultar_items(conexion, self.niveles, condiciones, limite=1)[0]
+            camino_real = [item[nivel] or fn.SIN_CATEGORIA for nivel in self.niveles[:profundidad]]
+        hijos = {}
+        if profundidad < len(self.niveles):
+            for valores, *agregados in dbs.consultar_agregados(
+                    conexion, [self.niveles[profundidad]], condiciones):
+                hijos[valores[0] or fn.SIN_CATEGORIA] = _resumen_grupo(agregados)
+        return {
+            'camino': camino_real,
+            'nivel': self.niveles[profundidad - 1] if profundidad else None,
+            'nivel_hijos': (self.niveles[profundidad]
+                            if profundidad < len(self.niveles) else None),
+            'total': _resumen_grupo(total) if total[0] else None,
+            'hijos': hijos
+        }
+
+    def buscar_por_nombre(self, nombre):
+        condiciones = dbs.armar_condiciones(
+            self.niveles, nombre_exacto=val.normalizar_texto(nombre))
+        return dbs.consultar_items(self._base(), self.niveles, condiciones)
+
+    def alta(self, jerarquia_valores, item_para_csv):
+        """Igual que BackendCSV.alta(); devuelve {'base_datos': ..., 'id': ...} o None."""
+        id_fila = dbs.insertar_item(self._base(), self.niveles, jerarquia_valores,
+                                    item_para_csv, val.normalizar_texto)
+        if id_fila is None:
+            return None
+        self._anotar_escritura()
+        print(f"✅ Ítem '{item_para_csv['nombre']}' agregado exitosamente en "
+              f"{self.ruta_base_datos} (id {id_fila}).")
+        return {'base_datos': self.ruta_base_datos, 'id': id_fila}
+
+    def modificar(self, item, campo, valor):
+        if not dbs.actualizar_campo(self._base(), item['id'], campo, valor,
+                                    val.normalizar_texto):
+            return False
+        item[campo] = valor
+        self._anotar_escritura()
+        return True
+
+    def eliminar(self, item):
+        if not dbs.borrar_item(self._base(), item['id']):
+            return False
+        self._anotar_escritura()
+        return True
+
+    def importar(self, ruta_feed):
+
+        """
+        (BACKEND) Igual que importar_items_masivo() (mismas validaciones y
+        mismo resumen), pero cada FILAS_POR_LOTE filas válidas van a la
+        base en UNA transacción. Devuelve el resumen o None.
+        """
+        inicio = time.perf_counter()
+        rechazadas = []
+        filas_leidas = aceptadas = lotes_escritos = 0
+        lote = []
+        lineas = []  # Número de línea de cada fila del lote
+
+        def volcar():
+            nonlocal aceptadas, lotes_escritos
+            guardadas, rechazadas_lote = self.agregar_items(lote)
+            aceptadas += guardadas
+            lotes_escritos += 1 if guardadas else 0
+            # El lote se guarda entero o nada: si falló, una entrada por fila
+            rechazadas.extend((numero_linea, motivo) for numero_linea, (_, motivo)
+                              in zip(lineas, rechazadas_lote))
+            lote.clear()
+            lineas.clear()
+
+        try:
+            for numero_linea, fila, error in db.leer_feed(ruta_feed):
+                filas_leidas += 1
+                if error is None:
+                    jerarquia_valores, item_para_csv, error = fn.validar_fila_item(
+                        fila, self.niveles)
+                if error:
+                    rechazadas.append((numero_linea, error))
+                    continue
+                lote.append((jerarquia_valores, item_para_csv))
+                lineas.append(numero_linea)
+                if len(lote) >= FILAS_POR_LOTE:
+                    volcar()
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"❌ No se pudo leer el archivo de importación {ruta_feed}: {e}")
+            return None
+        if lote:
+            volcar()
+
+        segundos = time.perf_counter() - inicio
+        return {
+            'filas_leidas': filas_leidas,
+            'aceptadas': aceptadas,
+            'rechazadas': rechazadas,
+            'lotes_escritos': lotes_escritos,
+            'segundos': segundos,
+            'filas_por_segundo': filas_leidas / segundos if segundos > 0 else 0.0
+        }
+
+    def iterar_items(self):
+        return itertools.chain.from_iterable(self.iterar_lotes())
+
+    def iterar_lotes(self, filas_por_lote=FILAS_POR_LOTE):
+        return dbs.iterar_lotes_sqlite(self._base(), self.niveles, filas_por_lote)
+
+    def agregar_items(self, filas):
+        """Igual que BackendCSV.agregar_items(): todo el lote en UNA transacción."""
+        guardadas = dbs.insertar_items(self._base(), self.niveles, filas, val.normalizar_texto)
+        self._pendientes = 0  # La transacción del lote confirmó también lo pendiente
+        if guardadas is None:
+            return 0, [(None, f"{item_para_csv['nombre']}: no se pudo guardar en la base")
+                       for _, item_para_csv in filas]
+        return guardadas, []
+
+    @contextlib.contextmanager
+    def carga_masiva(self):
+
+        """
+        (BACKEND) Para agregar muchos ítems seguidos (migrar, importar un
+        archivo columnar). Si la base está vacía se insertan sin índices y
+        se arman todos juntos al final: mantenerlos fila por fila es lo que
+        más cuesta. Si el proceso se corta antes, abrir_base() los rearma.
+        """
+        conexion = self._base()
+        vacia = dbs.contar_items(conexion) == 0
+        if vacia:
+            dbs.quitar_indices(conexion)
+        try:
+            yield
+        finally:
+            if vacia:
+                with conexion:
+                    dbs.crear_indices(conexion, self.niveles)
+
+    def esta_vacio(self):
+        return dbs.contar_items(self._base()) == 0
+
+    def cerrar(self):
+        """Confirma las escrituras pendientes y cierra la base."""
+        if self._conexion is not None:
+            dbs.cerrar_base(self._conexion)
+            self._conexion = None
+            self._pendientes = 0
+
+
+def migrar(origen, destino, tamano_lote=FILAS_POR_LOTE):
+
+    """
+    (BACKEND) Copia todos los ítems de 'origen' a 'destino' (CSV -> SQLite,
+    SQLite -> CSV o CSV -> otra carpeta) de a 'tamano_lote' filas: nunca
+    tiene más de un lote en memoria. El destino tiene que estar vacío
+    (así una migración repetida no duplica ítems).
+    Devuelve un dict con el resumen, o None si no se pudo migrar.
+    """
+    if not destino.esta_vacio():
+        print("❌ El destino ya tiene datos: la migración solo copia a un destino vacío.")
+        return None
+
+    inicio = time.perf_counter()
+    copiadas = 0
+    omitidas = []
+    with destino.carga_masiva():
+        lote = []
+        for item in origen.iterar_items():
+            lote.append((tuple(item.get(nivel) for nivel in origen.niveles),
+                         {campo: item[campo] for campo in origen.campos}))
+            if len(lote) >= tamano_lote:
+                guardadas, rechazadas = destino.agregar_items(lote)
+                copiadas += guardadas
+                omitidas.extend(rechazadas)
+                lote = []
+        if lote:
+            guardadas, rechazadas = destino.agregar_items(lote)
+            copiadas += guardadas
+            omitidas.extend(rechazadas)
+
+    segundos = time.perf_counter() - inicio
+    return {
+        'copiadas': copiadas,
+        'omitidas': omitidas,
+        'segundos': segundos,
+        'filas_por_segundo': copiadas / segundos if segundos > 0 else 0.0
+    }
+
+
+def exportar_columnar(origen, ruta_archivo, filas_por_bloque=dbc.FILAS_POR_BLOQUE):
+
+    """
+    (BACKEND) Escribe todos los ítems de 'origen' (con sus niveles de
+    jerarquía) en UN archivo columnar ('.hcol', o Arrow si la ruta termina
+    en '.arrow'/'.feather' y pyarrow está instalado). Se recorre el origen
+    en flujo y se escribe de a bloques de 'filas_por_bloque'.
+    Devuelve un dict con el resumen, o None si no se pudo exportar (en ese
+    caso el archivo destino queda como estaba).
+    """
+    inicio = time.perf_counter()
+    try:
+        escritor = dbc.EscritorColumnar(ruta_archivo, origen.niveles, origen.campos,
+                                        filas_por_bloque)
+    except (OSError, ValueError) as e:
+        print(f"❌ No se pudo crear {ruta_archivo}: {e}")
+        return None
+    try:
+        for lote in origen.iterar_lotes():
+            escritor.agregar(lote)
+        resumen = escritor.cerrar()
+    except (OSError, ValueError) as e:
+        escritor.descartar()
+        print(f"❌ No se pudo exportar a {ruta_archivo}: {e}")
+        return None
+
+    segundos = time.perf_counter() - inicio
+    return {
+        'archivo': ruta_archivo,
+        **resumen,
+        'segundos': segundos,
+        'filas_por_segundo': resumen['filas'] / segundos if segundos > 0 else 0.0
+    }
+
+
+def importar_columnar(ruta_archivo, destino):
+
+    """
+    (BACKEND) Agrega a 'destino' todos los ítems de un archivo columnar
+    (el de exportar_columnar()). Igual que migrar(), el destino tiene que
+    estar vacío: importar dos veces el mismo archivo no duplica ítems.
+    Primero se revisa el archivo entero (sin descomprimir), así uno
+    truncado no deja la importación por la mitad; después se lee de a UN
+    bloque, cada fila se valida con las mismas reglas que el alta
+    (fn.validar_fila_item()) y cada bloque va al destino con una escritura
+    masiva (en la carpeta de CSV: una escritura por hoja).
+    Devuelve un resumen como el de importar_items_masivo(), o None.
+    """
+    if not destino.esta_vacio():
+        print("❌ El destino ya tiene datos: un archivo columnar solo se importa a un destino vacío.")
+        return None
+
+    inicio = time.perf_counter()
+    try:
+        cabecera = dbc.verificar_columnar(ruta_archivo)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"❌ No se pudo leer el archivo {ruta_archivo}: {e}")
+        return None
+    if cabecera.get('niveles') != list(destino.niveles):
+        print(f"❌ El archivo tiene otros niveles de jerarquía: "
+              f"{', '.join(cabecera.get('niveles') or [])}.")
+        return None
+
+    aceptadas = bloques = numero_fila = 0
+    rechazadas = []
+    campos = list(destino.niveles) + ['nombre', 'poblacion', 'superficie']
+    try:
+        with destino.carga_masiva():
+            for bloque in dbc.iterar_bloques_columnar(ruta_archivo):
+                # El archivo puede venir de cualquier lado: cada fila se valida
+                validas = []
+                for valores in zip(*(bloque[campo] for campo in campos)):
+                    numero_fila += 1
+                    jerarquia_valores, item_para_csv, motivo = fn.validar_fila_item(
+                        dict(zip(campos, valores)), destino.niveles)
+                    if motivo:
+                        rechazadas.append((numero_fila, motivo))
+                    else:
+                        validas.append((jerarquia_valores, item_para_csv))
+                guardadas, rechazadas_bloque = destino.agregar_items(validas)
+                aceptadas += guardadas
+                rechazadas.extend(rechazadas_bloque)
+                bloques += 1
+    except (OSError, ValueError, KeyError) as e:
+        print(f"❌ Error leyendo {ruta_archivo} (se importaron {aceptadas} filas): {e}")
+        return None
+
+    segundos = time.perf_counter() - inicio
+    return {
+        'filas_leidas': cabecera['filas'],
+        'aceptadas': aceptadas,
+        'rechazadas': rechazadas,
+        'bloques': bloques,
+        'segundos': segundos,
+        'filas_por_segundo': cabecera['filas'] / segundos if segundos > 0 else 0.0
+    }
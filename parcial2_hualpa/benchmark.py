@@ -0,0 +1,296 @@
+# MÓDULO: benchmark.py
+# RESPONSABILIDAD: Medir cómo escalan la carga, los filtros, el ordenamiento,
+# las estadísticas y las bajas/modificaciones.
+# Genera árboles 'datos_paises' sintéticos en una carpeta temporal,
+# mide tiempo y memoria de cada operación (con la lista de dicts y con el
+# AlmacenItems) y guarda el resultado en JSON para comparar versiones.
+#
+# Uso:
+#   python benchmark.py                                 (tamaños por defecto)
+#   python benchmark.py --tamanos 1000 20000 --ramas 6 5 4 --salida base.json
+#   python benchmark.py --salida nuevo.json --comparar base.json
+
+import argparse
+import contextlib
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import funciones as fn
+import persistencia as db
+import validaciones as val
+import vistas as vw
+
+NIVELES_PAISES = ['continente', 'region', 'gobierno']
+CAMPOS_CSV_ITEM = ['nombre', 'poblacion', 'superficie']
+SILABAS = ['ba', 'ke', 'lo', 'mu', 'ra', 'si', 'to', 'na', 'de', 'gu',
+           'pe', 'ri', 'vo', 'za', 'ja', 'fi', 'co', 'le', 'mo', 'tu']
+
+
+# --- Generador de datos sintéticos ---
+
+def _nombre_sintetico(azar):
+
+    """Ayuda (BENCHMARK): Nombre inventado, solo con letras (ej: 'Ramuto Ke')."""
+    palabra = ''.join(azar.choice(SILABAS) for _ in range(azar.randint(2, 4)))
+    sufijo = azar.choice(SILABAS)
+    return f"{palabra.capitalize()} {sufijo.capitalize()}"
+
+
+def _etiqueta(nivel, numero):
+
+    """Ayuda (BENCHMARK): Nombre de carpeta solo con letras (0 -> 'A', 26 -> 'Ba')."""
+    letras = ""
+    while True:
+        numero, resto = divmod(numero, 26)
+        letras = chr(ord('a') + resto) + letras
+        if numero == 0:
+            break
+    return f"{nivel.capitalize()} {letras.capitalize()}"
+
+
+def niveles_para_profundidad(profundidad):
+
+    """
+    (BENCHMARK) Nombres de nivel para un árbol de 'profundidad' niveles.
+    Con 3 niveles se usan los mismos que la aplicación.
+    """
+    if profundidad == len(NIVELES_PAISES):
+        return list(NIVELES_PAISES)
+    return [f"nivel{i + 1}" for i in range(profundidad)]
+
+
+def generar_arbol_sintetico(ruta_base, ramas, filas_por_hoja, semilla=0):
+
+    """
+    (BENCHMARK) Crea un árbol 'datos_paises' sintético en 'ruta_base'.
+    'ramas' es la cantidad de subcarpetas por nivel (ej: [5, 4, 3] ->
+    5 continentes, 4 regiones por continente y 3 gobiernos por región;
+    la profundidad es len(ramas)). Cada hoja lleva un items.csv con
+    'filas_por_hoja' filas. Devuelve (niveles, cantidad_de_filas).
+    """
+    azar = random.Random(semilla)
+    niveles = niveles_para_profundidad(len(ramas))
+    total = 0
+
+    def _crear(ruta, profundidad):
+        nonlocal total
+        if profundidad == len(ramas):
+            items = [{
+                'nombre': _nombre_sintetico(azar),
+                'poblacion': azar.randint(1_000, 1_500_000_000),
+                'superficie': round(azar.uniform(1.0, 17_000_000.0), 2)
+            } for _ in range(filas_por_hoja)]
+            os.makedirs(ruta, exist_ok=True)
+            db.reescribir_csv_especifico(
+                os.path.join(ruta, "items.csv"), items, CAMPOS_CSV_ITEM)
+            total += len(items)
+            return
+        for numero in range(ramas[profundidad]):
+            _crear(os.path.join(ruta, _etiqueta(niveles[profundidad], numero)),
+                   profundidad + 1)
+
+    _crear(ruta_base, 0)
+    return niveles, total
+
+
+# --- Medición ---
+
+def medir(operacion, repeticiones=3, medir_memoria=True):
+
+    """
+    (BENCHMARK) Ejecuta 'operacion' (sin argumentos) varias veces y
+    devuelve el mejor tiempo, la mediana y el pico de memoria.
+    La memoria se mide en una corrida aparte, porque tracemalloc hace
+    más lento todo lo que mide.
+    """
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        operacion()
+        tiempos.append(time.perf_counter() - inicio)
+
+    pico = None
+    if medir_memoria:
+        tracemalloc.start()
+        try:
+            operacion()
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {
+        'segundos_min': min(tiempos),
+        'segundos_mediana': statistics.median(tiempos),
+        'memoria_pico_bytes': pico
+    }
+
+
+def _operaciones(niveles, estructura, items, ruta_journal, azar):
+
+    """
+    Ayuda (BENCHMARK): Arma las operaciones a medir para una estructura
+    ('lista' o 'almacen') ya cargada. Cada una es (nombre, función).
+    Los criterios de filtro se arman igual que en el menú, pero sin teclado.
+    """
+    primer_nivel = niveles[0]
+    candidatos = list(items)  # Para elegir ítems al azar (el almacén no se indexa por posición)
+    muestra = candidatos[len(candidatos) // 2]
+    poblaciones = sorted(item['poblacion'] for item in candidatos)
+    criterios = {
+        'nombre': ('nombre', val.normalizar_texto(muestra['nombre'][1:4])),
+        'nivel': ('nivel', val.normalizar_texto(muestra[primer_nivel])),
+        'rango': ('rango', (poblaciones[len(poblaciones) // 4],
+                            poblaciones[3 * len(poblaciones) // 4]))
+    }
+
+    def _ordenar(clave):
+        def _operacion():
+            if estructura == 'almacen':
+                items.cache_orden.clear()  # Medimos el orden, no la caché
+            fn.ordenar_items(items, clave, False)
+        return _operacion
+
+    def _modificar(ruta_journal_op):
+        def _operacion():
+            item = candidatos[azar.randrange(len(candidatos))]
+            fn.aplicar_modificacion(items, item, 'poblacion', item['poblacion'] + 1,
+                                    CAMPOS_CSV_ITEM, ruta_journal_op)
+        return _operacion
+
+    def _eliminar():
+        item = candidatos.pop(azar.randrange(len(candidatos)))
+        fn.aplicar_eliminacion(items, item, CAMPOS_CSV_ITEM)
+
+    operaciones = [
+        (f"filtrar_{tipo}", lambda c=criterio: fn.filtrar_por_criterio(items, c, primer_nivel))
+        for tipo, criterio in criterios.items()
+    ]
+    operaciones += [
+        ('ordenar_nombre', _ordenar('nombre')),
+        ('ordenar_poblacion', _ordenar('poblacion')),
+        ('estadisticas', lambda: fn.calcular_estadisticas(items, primer_nivel)),
+        ('modificar', _modificar(None)),
+        ('modificar_journal', _modificar(ruta_journal)),
+        ('eliminar', _eliminar),
+    ]
+    return operaciones
+
+
+def medir_tamano(cantidad_filas, ramas, repeticiones=3, medir_memoria=True,
+                 semilla=0):
+
+    """
+    (BENCHMARK) Genera un árbol de ~'cantidad_filas' filas, lo carga como
+    lista y como AlmacenItems y mide cada operación sobre ambos.
+    Devuelve la lista de resultados (un dict por operación y estructura).
+    """
+    hojas = math.prod(ramas)
+    filas_por_hoja = max(1, math.ceil(cantidad_filas / hojas))
+    carpeta = tempfile.mkdtemp(prefix="bench_paises_")
+    resultados = []
+    try:
+        ruta_datos = os.path.join(carpeta, "datos_paises")
+        ruta_journal = ruta_datos + ".journal"
+        niveles, total = generar_arbol_sintetico(ruta_datos, ramas, filas_por_hoja, semilla)
+
+        cargadores = {
+            'lista': lambda: fn.cargar_datos_recursivo(ruta_datos, niveles),
+            'almacen': lambda: fn.cargar_almacen(ruta_datos, niveles),
+        }
+        for estructura, cargar in cargadores.items():
+            medicion = medir(cargar, repeticiones, medir_memoria)
+            resultados.append({'filas': total, 'estructura': estructura,
+                               'operacion': 'cargar', **medicion})
+
+            items = cargar()
+            azar = random.Random(semilla)
+            for nombre, operacion in _operaciones(niveles, estructura, items,
+                                                  ruta_journal, azar):
+                medicion = medir(operacion, repeticiones, medir_memoria)
+                resultados.append({'filas': total, 'estructura': estructura,
+                                   'operacion': nombre, **medicion})
+            db.vaciar_journal(ruta_journal)
+    finally:
+        shutil.rmtree(carpeta, ignore_errors=True)
+    return resultados
+
+
+def ejecutar_benchmark(tamanos, ramas, repeticiones=3, medir_memoria=True, semilla=0):
+
+    """
+    (BENCHMARK) Corre medir_tamano() para cada tamaño y arma el reporte
+    completo (con datos del entorno para poder comparar versiones).
+    Los mensajes de las funciones medidas se descartan; el avance se
+    informa por stderr.
+    """
+    resultados = []
+    with open(os.devnull, 'w', encoding='utf-8') as nulo:
+        for cantidad in tamanos:
+            print(f"⏱️ Midiendo ~{cantidad:,} filas...", file=sys.stderr)
+            with contextlib.redirect_stdout(nulo):
+                resultados += medir_tamano(cantidad, ramas, repeticiones,
+                                           medir_memoria, semilla)
+    return {
+        'fecha': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'ramas': list(ramas),
+        'repeticiones': repeticiones,
+        'resultados': resultados
+    }
+
+
+def cargar_reporte(ruta):
+
+    """(BENCHMARK) Lee un reporte JSON guardado antes, o None si no se puede."""
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"❌ No se pudo leer el reporte '{ruta}': {e}")
+        return None
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description="Benchmark de carga, filtros, orden, estadísticas y ABM.")
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[1_000, 10_000, 50_000],
+                        help="cantidades aproximadas de filas a medir")
+    parser.add_argument('--ramas', type=int, nargs='+', default=[5, 4, 3],
+                        help="subcarpetas por nivel (la profundidad es la cantidad de valores)")
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--sin-memoria', action='store_true',
+                        help="no medir memoria (más rápido)")
+    parser.add_argument('--salida', default="benchmark.json",
+                        help="archivo JSON donde guardar el reporte")
+    parser.add_argument('--comparar', metavar="REPORTE",
+                        help="reporte JSON anterior contra el cual comparar")
+    args = parser.parse_args()
+
+    if any(r < 1 for r in args.ramas) or any(t < 1 for t in args.tamanos):
+        print("❌ Las ramas y los tamaños deben ser enteros positivos.")
+        return
+
+    reporte = ejecutar_benchmark(args.tamanos, args.ramas, args.repeticiones,
+                                 not args.sin_memoria, args.semilla)
+    with open(args.salida, 'w', encoding='utf-8') as f:
+        json.dump(reporte, f, ensure_ascii=False, indent=2)
+
+    anterior = cargar_reporte(args.comparar) if args.comparar else None
+    vw.mostrar_resultados_benchmark(reporte, anterior)
+    print(f"\n💾 Reporte guardado en '{args.salida}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,458 @@
+# MÓDULO: cli.py
+# RESPONSABILIDAD: Modo no interactivo (CONTROLADOR por línea de comandos).
+# Traduce subcomandos (cargar, filtrar, ordenar, estadisticas, explorar,
+# alta, modificar, eliminar, importar, listar, migrar, exportar) a operaciones de un
+# BACKEND (backends.py) y devuelve cada resultado como UNA línea JSON (vía VISTAS).
+# Varios comandos pueden correr en el mismo proceso sobre UNA sola carga:
+#   python main.py filtrar --nombre ar ";" ordenar --por poblacion --limite 5
+#   python main.py lote comandos.txt        (un comando por línea; '-' = stdin)
+# Por defecto los datos son la carpeta de CSV; con '--sqlite archivo' al
+# principio, una base SQLite:
+#   python main.py --sqlite paises.sqlite estadisticas --agrupar region
+# Los mensajes de las funciones (✅, ⚠️...) se desvían a stderr para que
+# stdout tenga solo JSON.
+
+import argparse
+import contextlib
+import shlex
+import sys
+
+import backends
+import funciones as fn
+import persistencia_columnar as dbc
+import validaciones as val
+import vistas as vw
+
+SEPARADOR_COMANDOS = ";"
+CLAVES_ORDEN = ('nombre', 'poblacion', 'superficie')
+
+
+class ErrorComando(Exception):
+
+    """(CLI) Comando mal escrito o imposible de ejecutar."""
+
+
+class _Parser(argparse.ArgumentParser):
+
+    """
+    (CLI) ArgumentParser que, ante un error, lanza ErrorComando en lugar
+    de terminar el proceso: en un lote, un comando mal escrito no debe
+    cortar los demás.
+    """
+
+    def error(self, message):
+        raise ErrorComando(message)
+
+
+def _item_salida(item, niveles_jerarquia, campos_item_csv):
+
+    """Ayuda (CLI): Ítem como dict plano (jerarquía + campos), sin la ruta interna."""
+    return {clave: item.get(clave) for clave in (*niveles_jerarquia, *campos_item_csv)}
+
+
+def _buscar_unico(sesion, args):
+
+    """
+    Ayuda (CLI): Busca el ítem por nombre exacto; si hay varios, los niveles
+    pasados como opciones (--continente, ...) deben dejar uno solo.
+    """
+    candidatos = sesion.buscar_por_nombre(args.nombre)
+    for nivel in sesion.niveles:
+        valor = getattr(args, nivel)
+        if valor is not None:
+            valor_norm = val.normalizar_texto(valor)
+            candidatos = [item for item in candidatos
+                          if val.normalizar_texto(item.get(nivel) or '') == valor_norm]
+    if not candidatos:
+        raise ErrorComando(f"No se encontró ningún ítem con el nombre '{args.nombre}'.")
+    if len(candidatos) > 1:
+        ubicaciones = [" / ".join(item.get(n) or 'N/A' for n in sesion.niveles)
+                       for item in candidatos]
+        raise ErrorComando(
+            f"Hay {len(candidatos)} ítems con ese nombre ({'; '.join(ubicaciones)}). "
+            f"Indique {', '.join('--' + n for n in sesion.niveles)} para elegir uno.")
+    return candidatos[0]
+
+
+# --- Comandos: cada uno recibe (sesion, args) y devuelve un dict ---
+# 'sesion' es el backend (BackendCSV o BackendSQLite) de todo el proceso.
+
+def _cmd_cargar(sesion, args):
+    return {'cantidad': sesion.cargar()}
+
+
+def _cmd_filtrar(sesion, args):
+    criterio = None
+    if args.nombre is not None:
+        criterio = ('nombre', val.normalizar_texto(args.nombre))
+    elif args.nivel is not None:
+        criterio = ('nivel', val.normalizar_texto(args.nivel))
+    elif args.rango is not None:
+        minimo, maximo = args.rango
+        if minimo < 0 or minimo > maximo:
+            raise ErrorComando("Rango inválido: se espera 0 <= MIN <= MAX.")
+        criterio = ('rango', (minimo, maximo))
+
+    # --continente, --region... (se combinan con el criterio de arriba)
+    restricciones = fn.armar_restricciones(sesion.niveles, {
+        nivel: fn.SEPARADOR_PATRONES.join(getattr(args, nivel) or [])
+        for nivel in sesion.niveles
+    })
+    if criterio is None and not restricciones:
+        raise ErrorComando(
+            "Indique --nombre, --nivel, --rango o algún nivel "
+            f"({', '.join('--' + n for n in sesion.niveles)}).")
+
+    cantidad, resultados = sesion.filtrar(criterio, restricciones, args.limite)
+    return {
+        'cantidad': cantidad,
+        'items': [_item_salida(item, sesion.niveles, sesion.campos)
+                  for item in resultados]
+    }
+
+
+def _cmd_ordenar(sesion, args):
+    cantidad, ordenados = sesion.ordenar(args.por, args.desc, args.limite)
+    return {
+        'cantidad': cantidad,
+        'items': [_item_salida(item, sesion.niveles, sesion.campos)
+                  for item in ordenados]
+    }
+
+
+def _cmd_estadisticas(sesion, args):
+    niveles_grupo = args.agrupar or [sesion.niveles[0]]
+    desconocidos = [n for n in niveles_grupo if n not in sesion.niveles]
+    if desconocidos:
+        raise ErrorComando(
+            f"Nivel desconocido: {', '.join(desconocidos)}. "
+            f"Opciones: {', '.join(sesion.niveles)}.")
+    stats = sesion.estadisticas(niveles_grupo)
+    if not stats:
+        return {'cantidad_total': 0}
+    for clave in ('pais_mayor_pob', 'pais_menor_pob', 'pais_mayor_sup', 'pais_menor_sup'):
+        stats[clave] = _item_salida(stats[clave], sesion.niveles, sesion.campos)
+    return stats
+
+
+def _cmd_explorar(sesion, args):
+    exploracion = sesion.explorar(args.camino)
+    if exploracion is None:
+        raise ErrorComando(f"No existe el camino '{' / '.join(args.camino)}'.")
+    return exploracion
+
+
+def _cmd_alta(sesion, args):
+    jerarquia_valores, item_para_csv, motivo = fn.validar_fila_item(vars(args), sesion.niveles)
+    if motivo:
+        raise ErrorComando(motivo)
+    ubicacion = sesion.alta(jerarquia_valores, item_para_csv)
+    if ubicacion is None:
+        raise ErrorComando("No se pudo guardar el ítem.")
+    return {**ubicacion,
+            'item': dict(zip(sesion.niveles, jerarquia_valores), **item_para_csv)}
+
+
+def _cmd_modificar(sesion, args):
+    item = _buscar_unico(sesion, args)
+    if args.campo == 'nombre':
+        valor = args.valor.strip()
+        error = val.error_string_alfabetico(valor)
+    elif args.campo == 'poblacion':
+        valor, error = val.convertir_entero_positivo(args.valor)
+    else:
+        valor, error = val.convertir_flotante_positivo(args.valor)
+    if error:
+        raise ErrorComando(f"{args.campo}: {error}")
+
+    if not sesion.modificar(item, args.campo, valor):
+        raise ErrorComando("No se pudo guardar la modificación.")
+    return {'item': _item_salida(item, sesion.niveles, sesion.campos)}
+
+
+def _cmd_eliminar(sesion, args):
+    item = _buscar_unico(sesion, args)
+    eliminado = _item_salida(item, sesion.niveles, sesion.campos)
+    if not sesion.eliminar(item):
+        raise ErrorComando("No se pudo guardar la eliminación.")
+    return {'item': eliminado}
+
+
+def _cmd_importar(sesion, args):
+    if dbc.es_archivo_columnar(args.feed):
+        # Un archivo de 'exportar': se copia por bloques a un destino vacío
+        resumen = backends.importar_columnar(args.feed, sesion)
+    else:
+        resumen = sesion.importar(args.feed)
+    if resumen is None:
+        raise ErrorComando("La importación no se pudo realizar.")
+    return dict(resumen)
+
+
+def _cmd_listar(sesion, args):
+    # Salida propia (tabla/tsv/jsonl), igual que antes de existir este módulo
+    por_pagina = args.por_pagina
+    if por_pagina is None and args.pagina is not None:
+        por_pagina = args.por_pagina_defecto
+    vw.mostrar_pagina_items(sesion.iterar_items(), sesion.niveles, args.pagina or 1,
+                            por_pagina, args.formato)
+    return None
+
+
+def _cmd_exportar(sesion, args):
+    resumen = backends.exportar_columnar(sesion, args.archivo, args.filas_por_bloque)
+    if resumen is None:
+        raise ErrorComando("La exportación no se pudo realizar.")
+    return resumen
+
+
+def _cmd_migrar(sesion, args):
+    # El destino usa la misma configuración (niveles, campos) que el origen
+    if args.a_sqlite is not None:
+        destino = backends.BackendSQLite(args.a_sqlite, sesion.niveles, sesion.campos)
+        descripcion = args.a_sqlite
+    else:
+        destino = backends.BackendCSV(args.a_csv, sesion.niveles, sesion.campos,
+                                      args.a_csv + ".journal", args.a_csv + ".snap", 1)
+        descripcion = args.a_csv
+    try:
+        resumen = backends.migrar(sesion, destino)
+    finally:
+        destino.cerrar()
+    if resumen is None:
+        raise ErrorComando("La migración no se pudo realizar.")
+    return {'destino': descripcion, **resumen}
+
+
+def _entero_no_negativo(texto):
+    valor = int(texto)
+    if valor < 0:
+        raise ValueError(texto)
+    return valor
+
+
+def _entero_positivo(texto):
+    valor = int(texto)
+    if valor < 1:
+        raise ValueError(texto)
+    return valor
+
+
+def armar_parser(niveles_jerarquia, items_por_pagina=None):
+
+    """
+    (CLI) Define los subcomandos y sus opciones. 'items_por_pagina' es
+    el tamaño de página de 'listar' cuando se pide una página sin decirlo.
+    """
+    parser = _Parser(prog="main.py", description="Gestión jerárquica de países (modo no interactivo).")
+    sub = parser.add_subparsers(dest='comando', parser_class=_Parser)
+
+    p = sub.add_parser('cargar', help="(re)carga los datos desde el disco")
+    p.set_defaults(funcion=_cmd_cargar)
+
+    p = sub.add_parser('filtrar', help="filtra por nombre, por jerarquía o por rango de población")
+    grupo = p.add_mutually_exclusive_group()
+    grupo.add_argument('--nombre', help="parte del nombre")
+    grupo.add_argument('--nivel', help=f"valor exacto de '{niveles_jerarquia[0]}'")
+    grupo.add_argument('--rango', nargs=2, type=int, metavar=('MIN', 'MAX'),
+                       help="población entre MIN y MAX")
+    for nivel in niveles_jerarquia:
+        p.add_argument(f'--{nivel}', action='append', metavar='PATRON',
+                       help="admite * y ?; repetido o separado por coma = cualquiera de ellos")
+    p.add_argument('--limite', type=_entero_no_negativo, help="cuántos ítems devolver")
+    p.set_defaults(funcion=_cmd_filtrar)
+
+    p = sub.add_parser('ordenar', help="ordena todos los ítems")
+    p.add_argument('--por', choices=CLAVES_ORDEN, default='nombre')
+    p.add_argument('--desc', action='store_true', help="orden descendente")
+    p.add_argument('--limite', type=_entero_no_negativo, help="solo los primeros N")
+    p.set_defaults(funcion=_cmd_ordenar)
+
+    p = sub.add_parser('estadisticas', help="estadísticas agrupadas por uno o más niveles")
+    p.add_argument('--agrupar', nargs='+', metavar='NIVEL',
+                   help=f"niveles ({', '.join(niveles_jerarquia)}); por defecto el primero")
+    p.set_defaults(funcion=_cmd_estadisticas)
+
+    p = sub.add_parser('explorar', help="totales de un nodo de la jerarquía y de cada hijo")
+    p.add_argument('camino', nargs='*', metavar='VALOR',
+                   help="valores desde el primer nivel (ej: Europa Sur); vacío = todo")
+    p.set_defaults(funcion=_cmd_explorar)
+
+    p = sub.add_parser('alta', help="agrega un ítem")
+    for nivel in niveles_jerarquia:
+        p.add_argument(f'--{nivel}', required=True)
+    p.add_argument('--nombre', required=True)
+    p.add_argument('--poblacion', required=True)
+    p.add_argument('--superficie', required=True)
+    p.set_defaults(funcion=_cmd_alta)
+
+    for nombre, funcion, ayuda in (('modificar', _cmd_modificar, "modifica un atributo de un ítem"),
+                                   ('eliminar', _cmd_eliminar, "elimina un ítem")):
+        p = sub.add_parser(nombre, help=ayuda)
+        p.add_argument('--nombre', required=True, help="nombre exacto del ítem")
+        for nivel in niveles_jerarquia:
+            p.add_argument(f'--{nivel}', help="para elegir entre ítems con el mismo nombre")
+        if nombre == 'modificar':
+            p.add_argument('--campo', required=True, choices=CLAVES_ORDEN)
+            p.add_argument('--valor', required=True)
+        p.set_defaults(funcion=funcion)
+
+    p = sub.add_parser('importar', help="importación masiva desde un CSV, JSONL o un archivo de 'exportar'")
+    p.add_argument('feed')
+    p.set_defaults(funcion=_cmd_importar)
+
+    p = sub.add_parser('listar', help="lista los ítems en tabla, TSV o JSONL")
+    p.add_argument('formato', nargs='?', default='tabla', choices=vw.FORMATOS_SALIDA)
+    p.add_argument('pagina', nargs='?', type=_entero_positivo)
+    p.add_argument('por_pagina', nargs='?', type=_entero_positivo)
+    p.set_defaults(funcion=_cmd_listar, por_pagina_defecto=items_por_pagina)
+
+    p = sub.add_parser('migrar', help="copia todos los ítems a una base SQLite o a una carpeta de CSV")
+    grupo = p.add_mutually_exclusive_group(required=True)
+    grupo.add_argument('--a-sqlite', metavar='ARCHIVO', help="base SQLite destino (vacía o nueva)")
+    grupo.add_argument('--a-csv', metavar='CARPETA', help="carpeta destino (vacía o nueva)")
+    p.set_defaults(funcion=_cmd_migrar)
+
+    p = sub.add_parser('exportar', help="todos los ítems en UN archivo columnar (.hcol, o .arrow con pyarrow)")
+    p.add_argument('archivo')
+    p.add_argument('--filas-por-bloque', type=_entero_positivo, default=dbc.FILAS_POR_BLOQUE,
+                   help="filas en memoria a la vez (por defecto %(default)s)")
+    p.set_defaults(funcion=_cmd_exportar)
+
+    p = sub.add_parser('lote', help="ejecuta los comandos de un archivo (uno por línea; '-' = stdin)")
+    p.add_argument('archivo', nargs='?', default='-')
+
+    return parser
+
+
+def resolver_comando(sesion, parser, argumentos, permitidos=None):
+
+    """
+    (CLI) Ejecuta UN comando y devuelve su respuesta como dict. Nunca
+    lanza: los errores vuelven como {"ok": false, "error": ...}.
+    'listar' escribe su propia salida y devuelve None. Con 'permitidos'
+    se rechaza cualquier comando que no esté en ese conjunto.
+    Lo usan ejecutar_comando() y el servidor.
+    """
+    comando = argumentos[0] if argumentos else ''
+    try:
+        if permitidos is not None and comando not in permitidos:
+            raise ErrorComando(
+                f"Comando no disponible aquí: '{comando}'. "
+                f"Opciones: {', '.join(sorted(permitidos))}.")
+        args = parser.parse_args(argumentos)
+        if args.comando in (None, 'lote'):
+            raise ErrorComando("Falta el comando (o 'lote' dentro de un lote).")
+        if args.comando == 'listar':
+            args.funcion(sesion, args)
+            return None
+        with contextlib.redirect_stdout(sys.stderr):
+            respuesta = args.funcion(sesion, args)
+    except (ErrorComando, backends.ErrorBackend) as e:
+        return {'ok': False, 'comando': comando, 'error': str(e)}
+    except Exception as e:
+        return {'ok': False, 'comando': comando, 'error': f"Error inesperado: {e}"}
+    return {'ok': True, 'comando': comando, **respuesta}
+
+
+def ejecutar_comando(sesion, parser, argumentos):
+
+    """
+    (CLI) Ejecuta UN comando y muestra su respuesta JSON.
+    Devuelve True si el comando salió bien.
+    """
+    respuesta = resolver_comando(sesion, parser, argumentos)
+    if respuesta is None:
+        return True
+    vw.mostrar_respuesta_json(respuesta)
+    return respuesta['ok']
+
+
+def _lineas_de_lote(ruta):
+
+    """
+    Ayuda (CLI): Líneas de comando de un lote, sin vacías ni comentarios (#).
+    Con '-' se leen de stdin a medida que llegan (sirve para un pipe).
+    """
+    if ruta == '-':
+        lineas = sys.stdin
+    else:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            lineas = f.read().splitlines()
+    return (linea.strip() for linea in lineas
+            if linea.strip() and not linea.strip().startswith('#'))
+
+
+def _tomar_opcion_sqlite(argumentos):
+
+    """
+    Ayuda (CLI): Quita del principio '--sqlite ARCHIVO' (o '--sqlite=ARCHIVO').
+    Devuelve (ruta de la base o None, argumentos restantes).
+    """
+    if argumentos and argumentos[0].startswith('--sqlite='):
+        return argumentos[0].partition('=')[2], argumentos[1:]
+    if argumentos and argumentos[0] == '--sqlite' and len(argumentos) > 1:
+        return argumentos[1], argumentos[2:]
+    return None, argumentos
+
+
+def ejecutar_cli(argumentos, directorio_datos, niveles_jerarquia, campos_item_csv,
+                 ruta_journal, ruta_snapshot, lote_journal, items_por_pagina):
+
+    """
+    (CLI) Punto de entrada del modo no interactivo. 'argumentos' son los
+    de la línea de comandos: uno o más comandos separados por ';', o
+    'lote [archivo]'; con '--sqlite ARCHIVO' al principio los datos salen
+    de esa base SQLite en lugar de la carpeta de CSV.
+    Devuelve el código de salida (0 si todo salió bien).
+    """
+    ruta_sqlite, argumentos = _tomar_opcion_sqlite(argumentos)
+    if ruta_sqlite:
+        sesion = backends.BackendSQLite(ruta_sqlite, niveles_jerarquia,
+                                        campos_item_csv, lote_journal)
+    else:
+        sesion = backends.BackendCSV(directorio_datos, niveles_jerarquia, campos_item_csv,
+                                     ruta_journal, ruta_snapshot, lote_journal)
+    parser = armar_parser(niveles_jerarquia, items_por_pagina)
+
+    if not argumentos or argumentos[0] in ('-h', '--help'):
+        parser.print_help()
+        return 0 if argumentos else 2
+
+    if argumentos[0] == 'lote':
+        if len(argumentos) > 2:
+            vw.mostrar_respuesta_json({'ok': False, 'comando': 'lote',
+                                       'error': "Uso: lote [archivo|-]"})
+            return 2
+        try:
+            lineas = _lineas_de_lote(argumentos[1] if len(argumentos) == 2 else '-')
+        except OSError as e:
+            vw.mostrar_respuesta_json({'ok': False, 'comando': 'lote', 'error': str(e)})
+            return 2
+    else:
+        # Varios comandos en la misma línea, separados por ';'
+        lineas, actual = [], []
+        for arg in argumentos:
+            if arg == SEPARADOR_COMANDOS:
+                lineas.append(actual)
+                actual = []
+            else:
+                actual.append(arg)
+        lineas.append(actual)
+
+    todo_ok = True
+    try:
+        for linea in lineas:
+            if isinstance(linea, str):
+                try:
+                    linea = shlex.split(linea)
+                except ValueError as e:  # Ej: comillas sin cerrar
+                    vw.mostrar_respuesta_json({'ok': False, 'comando': linea, 'error': str(e)})
+                    todo_ok = False
+                    continue
+            if linea:
+                todo_ok = ejecutar_comando(sesion, parser, linea) and todo_ok
+    finally:
+        with contextlib.redirect_stdout(sys.stderr):
+            sesion.cerrar()
+    return 0 if todo_ok else 1
@@ -4,45 +4,69 @@
 # y a 'validaciones.py' para la entrada.
 # NO imprime menús ni tablas (eso lo hace 'vistas.py').
 
+import heapq
+import math
 import os
+import time
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from fnmatch import fnmatchcase
+from itertools import compress, islice
 
 # Importamos nuestros propios módulos
 import persistencia as db
+import instrumentacion as inst
+from almacen import AlmacenItems, ItemVista
+from arbol import ArbolJerarquia
 import validaciones as val
 
+SEPARADOR_PATRONES = ","  # Alternativas en un filtro de jerarquía (ej: "Europa,Asia")
+SIN_CATEGORIA = 'Sin Categoría'  # Grupo de los ítems sin valor en un nivel
+
 # --- Fase 2: Implementación Técnica Centralizada ---
 
 
-def cargar_datos_recursivo(ruta_base, niveles_jerarquia, ruta_relativa=""):
-    
+def _iterar_hojas(ruta_base, niveles_jerarquia, ruta_relativa="", restricciones=None):
+
     """
-    (LÓGICA) REQUISITO OBLIGATORIO (Fase 2 - Recursividad).
-    Recorre la estructura de carpetas y recolecta todos los ítems.
+    Ayuda (LÓGICA): Recorrido recursivo de la estructura de carpetas.
+    No lee los CSV: es un generador que va devolviendo las tuplas
+    (ruta_archivo_csv, jerarquia_info) en orden alfabético, a medida
+    que las encuentra.
+    Con 'restricciones' (ver armar_restricciones()) solo entra en las
+    carpetas cuyo nombre cumple el patrón de su nivel: las demás ramas
+    ni siquiera se listan.
     """
-    items_globales = []
-
     # os.path.join es crucial para compatibilidad (Linux/Windows)
     ruta_actual = os.path.join(ruta_base, ruta_relativa)
+    profundidad = len(ruta_relativa.split(os.sep)) if ruta_relativa else 0
 
     try:
 
-        # Iteramos sobre todo lo que hay en la carpeta actual
-        for entry in os.listdir(ruta_actual):
-            path_completo_abs = os.path.join(ruta_actual, entry)
-            path_completo_rel = os.path.join(ruta_relativa, entry)
+        # os.scandir devuelve entradas que ya saben si son carpeta o archivo,
+        # así evitamos un os.path.isdir (una consulta extra al disco) por entrada.
+        # Ordenamos por nombre para que el resultado sea siempre el mismo.
+        with os.scandir(ruta_actual) as it:
+            entradas = sorted(it, key=lambda e: e.name)
+        inst.contar('carga.directorios')
+
+        for entry in entradas:
+            path_completo_rel = os.path.join(ruta_relativa, entry.name)
 
             # --- PASO RECURSIVO ---
             # Si es un directorio, nos volvemos a llamar a nosotros mismos
             # para "meternos" en esa subcarpeta.
-            if os.path.isdir(path_completo_abs):
-                items_globales.extend(
-                    cargar_datos_recursivo(
-                        ruta_base, niveles_jerarquia, path_completo_rel)
-                )
+            if entry.is_dir():
+                if restricciones and not _carpeta_permitida(
+                        entry.name, profundidad, niveles_jerarquia, restricciones):
+                    continue  # Poda: esta rama no puede tener ítems que sirvan
+                yield from _iterar_hojas(
+                    ruta_base, niveles_jerarquia, path_completo_rel, restricciones)
 
             # --- CASO BASE ---
-            # Si es un archivo .csv, dejamos de "bajar" y leemos el contenido.
-            elif entry.endswith('.csv'):
+            # Si es un archivo .csv, dejamos de "bajar" y lo anotamos.
+            elif entry.name.endswith('.csv'):
 
                 # Creamos el dict de jerarquía basado en la ruta de carpetas
                 partes_ruta = ruta_relativa.split(os.sep)
@@ -50,11 +74,10 @@ def cargar_datos_recursivo(ruta_base, niveles_jerarquia, ruta_relativa=""):
 
                 if len(partes_ruta) == len(niveles_jerarquia):
                     jerarquia_info = dict(zip(niveles_jerarquia, partes_ruta))
+                elif restricciones:
+                    continue  # Un CSV fuera de lugar no cumple ninguna restricción
 
-                # Llamamos a la capa de persistencia para leer el archivo
-                items_globales.extend(
-                    db.leer_csv_items(path_completo_abs, jerarquia_info)
-                )
+                yield entry.path, jerarquia_info
 
     except FileNotFoundError:
 
@@ -65,8 +88,425 @@ def cargar_datos_recursivo(ruta_base, niveles_jerarquia, ruta_relativa=""):
     except Exception as e:
         print(f"❌ Error al escanear directorio {ruta_actual}: {e}")
 
+
+def _carpeta_permitida(nombre_carpeta, profundidad, niveles_jerarquia, restricciones):
+
+    """
+    Ayuda (LÓGICA): ¿Hay que entrar en esta carpeta? Sí, salvo que su
+    nivel tenga restricción y el nombre no la cumpla. Más abajo de la
+    última carpeta de jerarquía no hay hojas válidas.
+    """
+    if profundidad >= len(niveles_jerarquia):
+        return False
+    patrones = restricciones.get(niveles_jerarquia[profundidad])
+    return not patrones or coincide_patrones(val.normalizar_texto(nombre_carpeta), patrones)
+
+
+def armar_restricciones(niveles_jerarquia, textos_por_nivel):
+
+    """
+    (LÓGICA) Convierte lo que escribió el usuario en restricciones de
+    jerarquía. Recibe {nivel: texto} (ej: {'continente': 'Europa,As*',
+    'gobierno': 'Rep?blica'}) y devuelve {nivel: (patrones normalizados)}.
+    Cada patrón admite los comodines '*' y '?'; varias alternativas van
+    separadas por coma. Los niveles sin texto quedan libres.
+    """
+    restricciones = {}
+    for nivel in niveles_jerarquia:
+        texto = textos_por_nivel.get(nivel) or ""
+        patrones = tuple(val.normalizar_texto(patron.strip())
+                         for patron in texto.split(SEPARADOR_PATRONES) if patron.strip())
+        if patrones:
+            restricciones[nivel] = patrones
+    return restricciones
+
+
+def escapar_patron(texto):
+
+    """
+    (LÓGICA) Escapa los comodines de un texto (como glob.escape()) para
+    usarlo como patrón que solo coincide con ese texto literal.
+    Ej: "a*b" -> "a[*]b".
+    """
+    return ''.join(f'[{letra}]' if letra in '*?[' else letra for letra in texto)
+
+
+def coincide_patrones(valor_norm, patrones):
+
+    """(LÓGICA) True si el valor (ya normalizado) cumple alguno de los patrones."""
+    return any(fnmatchcase(valor_norm, patron) for patron in patrones)
+
+
+def _firma_archivo(ruta_archivo):
+
+    """
+    Ayuda (LÓGICA): Devuelve (mtime_ns, tamaño, inodo) de un archivo,
+    o None si ya no existe. Sirve para saber si un CSV cambió.
+    """
+    return db.version_archivo(ruta_archivo)
+
+
+def _leer_trozo(hojas, medir_en_proceso=False):
+
+    """
+    Ayuda (LÓGICA): Lee varias hojas seguidas (una tarea del pool).
+    Con 'medir_en_proceso' (pool de procesos con la instrumentación
+    encendida) devuelve además lo que midió este proceso, que si no se
+    perdería: (hojas, medido).
+    """
+    if not medir_en_proceso:
+        return [db.leer_csv_items(ruta, jerarquia) for ruta, jerarquia in hojas]
+    inst.activar()
+    inst.reiniciar()  # Con fork, el proceso hereda lo que ya tenía el principal
+    leidas = [db.leer_csv_items(ruta, jerarquia) for ruta, jerarquia in hojas]
+    return leidas, inst.extraer()
+
+
+def _leer_hojas(hojas, max_trabajadores=None, usar_procesos=False):
+
+    """
+    Ayuda (LÓGICA): Lee los CSV de una lista de hojas (ruta, jerarquia_info)
+    y va entregando (generador) los ítems de cada hoja EN EL MISMO orden.
+    Usa un pool de hilos (o de procesos si usar_procesos=True), pero con
+    pocas hojas en vuelo a la vez: cada hoja se entrega apenas le toca,
+    así quien la consume (ej: el almacén) la copia y la suelta antes de
+    que estén leídas todas.
+    """
+    # Con una sola hoja (o un solo trabajador) no vale la pena levantar un pool.
+    if len(hojas) <= 1 or max_trabajadores == 1:
+        for ruta, jerarquia in hojas:
+            yield db.leer_csv_items(ruta, jerarquia)
+        return
+
+    # Con procesos, agrupamos varias hojas por envío (como el chunksize de map)
+    trabajadores = max_trabajadores or os.cpu_count() or 1
+    trozo = max(1, len(hojas) // (trabajadores * 4)) if usar_procesos else 1
+    trozos = (hojas[i:i + trozo] for i in range(0, len(hojas), trozo))
+
+    pool = ProcessPoolExecutor if usar_procesos else ThreadPoolExecutor
+    medir = usar_procesos and inst.activo
+    with pool(max_workers=max_trabajadores) as ejecutor:
+        # Como mucho 2 trozos por trabajador en vuelo; los resultados se
+        # toman en el orden en que se pidieron, aunque terminen en otro.
+        en_vuelo = deque(ejecutor.submit(_leer_trozo, t, medir)
+                         for t in islice(trozos, trabajadores * 2))
+        while en_vuelo:
+            with inst.cronometro('carga.lectura_csv'):
+                leidas = en_vuelo.popleft().result()
+            if medir:
+                leidas, medido = leidas
+                inst.sumar(medido)
+            siguiente = next(trozos, None)
+            if siguiente is not None:
+                en_vuelo.append(ejecutor.submit(_leer_trozo, siguiente, medir))
+            yield from leidas
+
+
+def _iterar_items_por_hoja(ruta_base, niveles_jerarquia, ruta_relativa,
+                           max_trabajadores, usar_procesos, manifiesto, ruta_snapshot):
+
+    """
+    Ayuda (LÓGICA): Hace todo el trabajo de cargar_datos_recursivo() pero
+    entrega (generador) los ítems de a una hoja, en el orden alfabético de
+    las rutas. Ninguna hoja queda guardada acá: el pico de memoria es el
+    de quien las consume más unas pocas hojas en lectura. Hay que
+    consumirlo entero (el snapshot se escribe al final).
+    """
+    # 1. Recorrido recursivo: solo juntamos las rutas de los CSV
+    with inst.cronometro('carga.recorrido'):
+        hojas = list(_iterar_hojas(ruta_base, niveles_jerarquia, ruta_relativa))
+
+    firmas = []
+    if manifiesto is not None or ruta_snapshot:
+        firmas = [_firma_archivo(ruta) for ruta, _ in hojas]
+
+    if manifiesto is not None:
+        manifiesto.clear()
+        for (ruta, _), firma in zip(hojas, firmas):
+            if firma is not None:
+                manifiesto[ruta] = firma
+
+    snapshot = None
+    if ruta_snapshot:
+        snapshot = db.leer_snapshot(ruta_snapshot, niveles_jerarquia)
+
+    # 2. Separamos las hojas que se pueden tomar del snapshot (misma firma)
+    # de las que hay que leer del CSV.
+    desde_snapshot = [False] * len(hojas)
+    pendientes = []
+    for i, (ruta, _) in enumerate(hojas):
+        if snapshot is not None and firmas[i] is not None:
+            hoja_snap = snapshot['hojas'].get(ruta)
+            if hoja_snap is not None and hoja_snap['firma'] == firmas[i]:
+                desde_snapshot[i] = True
+                continue
+        pendientes.append(hojas[i])
+
+    if inst.activo:
+        inst.contar('carga.archivos_leidos', len(pendientes))
+        inst.contar('carga.archivos_snapshot', len(hojas) - len(pendientes))
+
+    # 3. El snapshot se rearma (de a una hoja) solo si algo cambió
+    escritor = None
+    if ruta_snapshot:
+        sin_cambios = (snapshot is not None and not pendientes
+                       and len(snapshot['hojas']) == len(hojas))
+        if not sin_cambios:
+            escritor = db.EscritorSnapshot(niveles_jerarquia)
+
+    # 4. Lectura de los CSV pendientes, intercalada con las del snapshot
+    leidas = _leer_hojas(pendientes, max_trabajadores, usar_procesos)
+    for i, (ruta, jerarquia_info) in enumerate(hojas):
+        if desde_snapshot[i]:
+            items_hoja = db.items_desde_snapshot(snapshot, ruta)
+        else:
+            items_hoja = next(leidas)
+            inst.contar('carga.filas', len(items_hoja))
+        if escritor is not None and firmas[i] is not None:
+            escritor.agregar(ruta, firmas[i], jerarquia_info, items_hoja)
+        yield items_hoja
+
+    if escritor is not None:
+        escritor.guardar(ruta_snapshot)
+
+
+@inst.medido('logica.cargar')
+def cargar_datos_recursivo(ruta_base, niveles_jerarquia, ruta_relativa="",
+                           max_trabajadores=None, usar_procesos=False,
+                           manifiesto=None, ruta_snapshot=None):
+    
+    """
+    (LÓGICA) REQUISITO OBLIGATORIO (Fase 2 - Recursividad).
+    Recorre la estructura de carpetas y recolecta todos los ítems.
+    Los CSV de las hojas se leen en paralelo con un pool de hilos
+    (o de procesos si usar_procesos=True). El resultado es el mismo
+    que leerlos uno por uno, en orden alfabético de rutas.
+    Si se pasa un dict 'manifiesto', se llena con la firma de cada CSV
+    para poder usar luego recargar_datos_incremental().
+    Si se pasa 'ruta_snapshot', las hojas que no cambiaron desde la última
+    carga se toman del snapshot binario y solo se leen los CSV nuevos o
+    modificados. Al terminar, el snapshot se actualiza si hizo falta.
+    """
+    items_globales = []
+    for items_hoja in _iterar_items_por_hoja(
+            ruta_base, niveles_jerarquia, ruta_relativa, max_trabajadores,
+            usar_procesos, manifiesto, ruta_snapshot):
+        items_globales.extend(items_hoja)
     return items_globales
 
+
+@inst.medido('logica.cargar_almacen')
+def cargar_almacen(ruta_base, niveles_jerarquia, max_trabajadores=None,
+                   usar_procesos=False, manifiesto=None, ruta_snapshot=None):
+
+    """
+    (LÓGICA) Igual que cargar_datos_recursivo() pero devuelve un
+    AlmacenItems (columnar) en lugar de una lista de diccionarios.
+    Las hojas se leen y se copian al almacén de a una (nunca están todas
+    leídas a la vez) y se descartan apenas se copian.
+    """
+    almacen = AlmacenItems(niveles_jerarquia)
+    for items_hoja in _iterar_items_por_hoja(
+            ruta_base, niveles_jerarquia, "", max_trabajadores,
+            usar_procesos, manifiesto, ruta_snapshot):
+        almacen.extend(items_hoja)
+    return almacen
+
+
+def iterar_datos_recursivo(ruta_base, niveles_jerarquia, ruta_relativa="",
+                           restricciones=None):
+
+    """
+    (LÓGICA) Versión "perezosa" (generador) de cargar_datos_recursivo().
+    Recorre las carpetas y va devolviendo los ítems de a uno, leyendo
+    cada CSV recién cuando hace falta. No arma ninguna lista: el primer
+    ítem está disponible enseguida y la memoria usada no crece con el
+    tamaño del árbol.
+    Con 'restricciones' solo recorre las ramas que las cumplen.
+    """
+    for ruta, jerarquia_info in _iterar_hojas(
+            ruta_base, niveles_jerarquia, ruta_relativa, restricciones):
+        yield from db.iterar_csv_items(ruta, jerarquia_info)
+
+
+def iterar_hojas_recursivo(ruta_base, niveles_jerarquia, restricciones=None):
+
+    """
+    (LÓGICA) Como iterar_datos_recursivo(), pero devuelve UNA HojaItems
+    por CSV (leída por columnas) en vez de los ítems de a uno. Sirve para
+    copiar todo el árbol por columnas (ej: exportar a un archivo columnar).
+    """
+    for ruta, jerarquia_info in _iterar_hojas(ruta_base, niveles_jerarquia,
+                                              restricciones=restricciones):
+        yield db.leer_csv_items(ruta, jerarquia_info)
+
+
+@inst.medido('logica.cargar_jerarquia')
+def cargar_datos_por_jerarquia(ruta_base, niveles_jerarquia, restricciones,
+                               max_trabajadores=None, usar_procesos=False):
+
+    """
+    (LÓGICA) Carga SOLO los ítems de las ramas que cumplen las
+    'restricciones' (ver armar_restricciones()), ej: un continente, o las
+    regiones 'Sur*' de cualquier continente. Las carpetas que no cumplen
+    no se listan ni se leen, así el costo es el del subárbol pedido.
+    Devuelve una lista de ítems (no toca el manifiesto ni el snapshot,
+    que describen el árbol completo).
+    """
+    with inst.cronometro('carga.recorrido'):
+        hojas = list(_iterar_hojas(ruta_base, niveles_jerarquia, "", restricciones))
+    items = []
+    for items_hoja in _leer_hojas(hojas, max_trabajadores, usar_procesos):
+        items.extend(items_hoja)
+    return items
+
+
+def recargar_datos_incremental(ruta_base, niveles_jerarquia, items_globales, manifiesto):
+
+    """
+    (LÓGICA) Recarga incremental. Compara la firma de cada CSV contra
+    el 'manifiesto' de la carga anterior y solo vuelve a leer los archivos
+    nuevos o modificados. Los ítems de archivos borrados o modificados se
+    quitan de 'items_globales', que se actualiza EN EL LUGAR (no se crea
+    una lista nueva). Devuelve un dict con el resumen de los cambios.
+    """
+    hojas = list(_iterar_hojas(ruta_base, niveles_jerarquia))
+
+    # 1. Comparamos el disco contra el manifiesto anterior
+    nuevo_manifiesto = {}
+    hojas_a_leer = []
+    for ruta, jerarquia_info in hojas:
+        firma = _firma_archivo(ruta)
+        if firma is None:
+            continue  # Se borró entre el recorrido y el stat
+        nuevo_manifiesto[ruta] = firma
+        if manifiesto.get(ruta) != firma:
+            hojas_a_leer.append((ruta, jerarquia_info))
+
+    agregados = [ruta for ruta, _ in hojas_a_leer if ruta not in manifiesto]
+    modificados = [ruta for ruta, _ in hojas_a_leer if ruta in manifiesto]
+    eliminados = [ruta for ruta in manifiesto if ruta not in nuevo_manifiesto]
+
+    _reemplazar_hojas(items_globales, hojas_a_leer, set(modificados) | set(eliminados))
+
+    manifiesto.clear()
+    manifiesto.update(nuevo_manifiesto)
+
+    return {
+        'agregados': agregados,
+        'modificados': modificados,
+        'eliminados': eliminados,
+        'cantidad_items': len(items_globales)
+    }
+
+
+def _reemplazar_hojas(items_globales, hojas_a_leer, rutas_a_quitar):
+
+    """
+    Ayuda (LÓGICA): Saca de memoria los ítems de 'rutas_a_quitar' y agrega
+    los de 'hojas_a_leer' (ruta, jerarquia_info), leyendo solo esos CSV.
+    'items_globales' (lista o AlmacenItems) se actualiza EN EL LUGAR.
+    """
+    # 2. Sacamos de memoria los ítems de archivos que ya no valen
+    if rutas_a_quitar and isinstance(items_globales, AlmacenItems):
+        # Índice por ruta: solo tocamos las filas de esos archivos
+        for ruta in rutas_a_quitar:
+            for item in items_globales.items_de_archivo(ruta):
+                items_globales.remove(item)
+    elif rutas_a_quitar:
+        items_globales[:] = [
+            item for item in items_globales
+            if item['ruta_archivo'] not in rutas_a_quitar
+        ]
+
+    # 3. Leemos SOLO los archivos nuevos o modificados
+    for ruta, jerarquia_info in hojas_a_leer:
+        items_globales.extend(db.leer_csv_items(ruta, jerarquia_info))
+
+    # Si las filas borradas ya superan a las vivas, conviene compactar
+    if (isinstance(items_globales, AlmacenItems)
+            and items_globales.cantidad_muertas() > len(items_globales)):
+        items_globales.compactar()
+
+
+def _jerarquia_de_ruta(ruta_base, niveles_jerarquia, ruta_archivo):
+
+    """
+    Ayuda (LÓGICA): Arma el dict de jerarquía de un CSV a partir de sus
+    carpetas, igual que _iterar_hojas() (vacío si la profundidad no coincide).
+    """
+    ruta_relativa = os.path.relpath(os.path.dirname(ruta_archivo), ruta_base)
+    partes_ruta = ruta_relativa.split(os.sep)
+    if len(partes_ruta) == len(niveles_jerarquia) and '..' not in partes_ruta:
+        return dict(zip(niveles_jerarquia, partes_ruta))
+    return {}
+
+
+def recargar_hojas(ruta_base, niveles_jerarquia, items_globales, manifiesto, rutas):
+
+    """
+    (LÓGICA) Igual que recargar_datos_incremental(), pero solo revisa las
+    rutas de CSV indicadas (las que avisó el vigilante) en lugar de
+    recorrer todo el árbol. Las que no cambiaron de firma se ignoran.
+    """
+    agregados, modificados, eliminados, hojas_a_leer = [], [], [], []
+    for ruta in sorted(set(rutas)):
+        firma = _firma_archivo(ruta)
+        anterior = manifiesto.get(ruta)
+        if firma is None:
+            if anterior is not None:
+                eliminados.append(ruta)
+                del manifiesto[ruta]
+            continue
+        if firma == anterior:
+            continue  # Ej: lo reescribimos nosotros y el manifiesto ya lo sabe
+        (agregados if anterior is None else modificados).append(ruta)
+        hojas_a_leer.append((ruta, _jerarquia_de_ruta(ruta_base, niveles_jerarquia, ruta)))
+        manifiesto[ruta] = firma
+
+    _reemplazar_hojas(items_globales, hojas_a_leer, set(modificados) | set(eliminados))
+    return {
+        'agregados': agregados,
+        'modificados': modificados,
+        'eliminados': eliminados,
+        'cantidad_items': len(items_globales)
+    }
+
+
+def sincronizar_con_disco(ruta_base, niveles_jerarquia, items_globales, manifiesto,
+                          vigilante, ruta_journal, campos_item_csv):
+
+    """
+    (LÓGICA) Aplica a memoria los cambios que detectó el vigilante
+    (vigilancia.VigilanteDatos). Antes de releer, aplica el journal SOLO en
+    las hojas que se van a releer (las que tienen operaciones pendientes y
+    cambiaron en disco): así nunca se relee una hoja sin nuestros cambios,
+    y el resto del journal sigue esperando su lote. Devuelve el resumen,
+    o None si no cambió nada.
+    """
+    rutas, revisar_todo = vigilante.cambios()
+    if not rutas and not revisar_todo:
+        return None
+
+    rutas_pendientes = {op['ruta'] for op in db.leer_journal(ruta_journal)}
+    if not revisar_todo:
+        rutas_pendientes &= set(rutas)
+    a_releer = {ruta for ruta in rutas_pendientes
+                if _firma_archivo(ruta) != manifiesto.get(ruta)}
+    if a_releer:
+        compactar_journal(ruta_journal, campos_item_csv, manifiesto,
+                          solo_rutas=a_releer)
+    if revisar_todo:
+        resumen = recargar_datos_incremental(
+            ruta_base, niveles_jerarquia, items_globales, manifiesto)
+    else:
+        resumen = recargar_hojas(
+            ruta_base, niveles_jerarquia, items_globales, manifiesto, rutas)
+
+    if resumen['agregados'] or resumen['modificados'] or resumen['eliminados']:
+        return resumen
+    return None
+
 # --- Fase 3: Funcionalidades Mínimas (CRUD) ---
 
 
@@ -74,7 +514,8 @@ def alta_item(ruta_base, niveles_jerarquia, campos_item_csv):
 
     """
     (LÓGICA - CREATE) Pide datos, crea la estructura de carpetas
-    y llama a persistencia para guardar.
+    y llama a persistencia para guardar. Devuelve la ruta del CSV
+    donde quedó el ítem, o None si no se pudo guardar.
     """
     print("\n--- ➕ Alta de Nuevo Ítem ---")
     nuevo_item_memoria = {}
@@ -94,6 +535,19 @@ def alta_item(ruta_base, niveles_jerarquia, campos_item_csv):
     nuevo_item_memoria['superficie'] = val.validar_flotante_positivo(
         "Ingrese Superficie (km²): ")
 
+    item_para_csv = {
+        campo: nuevo_item_memoria[campo] for campo in campos_item_csv
+    }
+    return aplicar_alta(ruta_base, jerarquia_valores, item_para_csv, campos_item_csv)
+
+
+def aplicar_alta(ruta_base, jerarquia_valores, item_para_csv, campos_item_csv):
+
+    """
+    (LÓGICA - CREATE) Parte no interactiva de alta_item(): recibe la
+    jerarquía y el ítem ya validados, crea las carpetas que falten y
+    agrega la fila al CSV de la hoja. Devuelve la ruta del CSV, o None.
+    """
     try:
         # 3. Crear estructura de carpetas (Requisito Fase 3)
         # ej: ['America', 'Sur', 'Republica'] -> 'datos_paises/America/Sur/Republica'
@@ -104,70 +558,307 @@ def alta_item(ruta_base, niveles_jerarquia, campos_item_csv):
         os.makedirs(ruta_directorio_final, exist_ok=True)
         ruta_archivo_csv = os.path.join(ruta_directorio_final, "items.csv")
 
-        # 4. Preparar el dict que se enviará al CSV
-        item_para_csv = {
-            campo: nuevo_item_memoria[campo] for campo in campos_item_csv
-        }
-
-        # 5. Llamar a persistencia para guardar (modo 'a')
+        # 4. Llamar a persistencia para guardar (modo 'a')
         if db.agregar_item_csv(ruta_archivo_csv, item_para_csv, campos_item_csv):
             print(
-                f"✅ Ítem '{nuevo_item_memoria['nombre']}' agregado exitosamente en:")
+                f"✅ Ítem '{item_para_csv['nombre']}' agregado exitosamente en:")
             print(f"   {ruta_archivo_csv}")
-            return True
+            return ruta_archivo_csv
         else:
             print("❌ Fallo al guardar el ítem en el archivo CSV.")
-            return False
+            return None
 
     except OSError as e:
         print(f"❌ Error de Sistema Operativo al crear directorios: {e}")
     except Exception as e:
         print(f"❌ Error inesperado durante el alta: {e}")
 
-    return False
+    return None
 
 
-def filtrar_items(items_globales, niveles_jerarquia, opcion, primer_nivel_key):
+def validar_fila_item(fila, niveles_jerarquia):
 
     """
-    (LÓGICA - READ) Filtra la lista global en memoria.
-    No necesita llamar a persistencia, solo procesa la lista.
+    (LÓGICA) Valida UNA fila (importación o línea de comandos) con las
+    mismas reglas que el alta interactiva. Devuelve (jerarquia_valores, item_para_csv, None)
+    si es válida o (None, None, motivo) si se rechaza.
+    """
+    jerarquia_valores = []
+    for nivel in niveles_jerarquia:
+        valor = str(fila.get(nivel) or '').strip()
+        error = val.error_string_alfabetico(valor)
+        if error:
+            return None, None, f"{nivel}: {error}"
+        error = val.error_nombre_carpeta(valor)
+        if error:
+            return None, None, f"{nivel}: {error}"
+        jerarquia_valores.append(valor)
+
+    nombre = str(fila.get('nombre') or '').strip()
+    error = val.error_string_alfabetico(nombre)
+    if error:
+        return None, None, f"nombre: {error}"
+
+    poblacion, error = val.convertir_entero_positivo(fila.get('poblacion'))
+    if error:
+        return None, None, f"poblacion: {error}"
+
+    superficie, error = val.convertir_flotante_positivo(fila.get('superficie'))
+    if error:
+        return None, None, f"superficie: {error}"
+
+    item_para_csv = {
+        'nombre': nombre, 'poblacion': poblacion, 'superficie': superficie}
+    return tuple(jerarquia_valores), item_para_csv, None
+
+
+def importar_items_masivo(ruta_feed, ruta_base, niveles_jerarquia, campos_item_csv):
+
+    """
+    (LÓGICA - CREATE) Alta masiva NO interactiva desde un CSV o JSONL.
+    Cada fila debe traer los niveles de jerarquía y los campos del ítem.
+    Valida con las mismas reglas que alta_item(), agrupa las filas por
+    carpeta destino, crea cada carpeta una sola vez y escribe cada
+    items.csv con una sola escritura. Devuelve un dict con el resumen.
     """
-    resultados = []
+    inicio = time.perf_counter()
+    filas_por_carpeta = {}
+    lineas_por_carpeta = {}
+    rechazadas = []
+    filas_leidas = 0
+
+    # 1. Leer y validar (el feed se lee como generador)
+    try:
+        for numero_linea, fila, error in db.leer_feed(ruta_feed):
+            filas_leidas += 1
+            if error is None:
+                jerarquia_valores, item_para_csv, error = validar_fila_item(
+                    fila, niveles_jerarquia)
+            if error:
+                rechazadas.append((numero_linea, error))
+                continue
+            filas_por_carpeta.setdefault(jerarquia_valores, []).append(
+                {campo: item_para_csv[campo] for campo in campos_item_csv})
+            lineas_por_carpeta.setdefault(jerarquia_valores, []).append(numero_linea)
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"❌ No se pudo leer el archivo de importación {ruta_feed}: {e}")
+        return None
+
+    # 2. Una carpeta y una escritura por hoja
+    aceptadas, archivos_escritos = guardar_items_por_carpeta(
+        ruta_base, filas_por_carpeta, campos_item_csv, rechazadas, lineas_por_carpeta)
+
+    segundos = time.perf_counter() - inicio
+    return {
+        'filas_leidas': filas_leidas,
+        'aceptadas': aceptadas,
+        'rechazadas': rechazadas,
+        'archivos_escritos': archivos_escritos,
+        'segundos': segundos,
+        'filas_por_segundo': filas_leidas / segundos if segundos > 0 else 0.0
+    }
+
+
+def guardar_items_por_carpeta(ruta_base, filas_por_carpeta, campos_item_csv, rechazadas,
+                              lineas_por_carpeta=None):
 
+    """
+    (LÓGICA - CREATE) Escribe ítems ya validados agrupados por hoja
+    ({jerarquia_valores: [item_para_csv, ...]}): crea cada carpeta una sola
+    vez y agrega sus filas al items.csv con una sola escritura. Cada fila
+    que no se pudo guardar se agrega a 'rechazadas' como (numero_linea,
+    motivo), así aceptadas + rechazadas siguen sumando las filas leídas;
+    el número de línea sale de 'lineas_por_carpeta' (mismas claves, una
+    lista paralela) o es None.
+    Devuelve (filas_guardadas, archivos_escritos).
+    """
+    aceptadas = 0
+    archivos_escritos = 0
+    for jerarquia_valores, items_para_csv in filas_por_carpeta.items():
+        ruta_directorio_final = os.path.join(ruta_base, *jerarquia_valores)
+        ruta_archivo_csv = os.path.join(ruta_directorio_final, "items.csv")
+        try:
+            os.makedirs(ruta_directorio_final, exist_ok=True)
+        except OSError as e:
+            print(f"❌ Error de Sistema Operativo al crear directorios: {e}")
+            motivo = f"no se pudo crear {ruta_directorio_final}: {e}"
+        else:
+            if db.agregar_items_csv(ruta_archivo_csv, items_para_csv, campos_item_csv):
+                aceptadas += len(items_para_csv)
+                archivos_escritos += 1
+                continue
+            motivo = f"no se pudo escribir {ruta_archivo_csv}"
+
+        lineas = (lineas_por_carpeta or {}).get(jerarquia_valores) or [None] * len(items_para_csv)
+        rechazadas.extend((numero_linea, f"{item['nombre']}: {motivo}")
+                          for numero_linea, item in zip(lineas, items_para_csv))
+    return aceptadas, archivos_escritos
+
+
+def _pedir_criterio_filtro(opcion, primer_nivel_key, niveles_jerarquia):
+
+    """
+    Ayuda (LÓGICA): Pide al usuario los datos del filtro elegido y devuelve
+    el criterio como tupla (tipo, valor), o None si el rango es inválido
+    (o si en el filtro por jerarquía no se indicó ningún nivel).
+    """
     if opcion == 1:  # Por nombre
         busqueda = val.validar_string_no_vacio(
             "Ingrese el nombre (o parte) a buscar: ")
-        busqueda_norm = val.normalizar_texto(busqueda)
-        resultados = [
-            item for item in items_globales
-            if busqueda_norm in val.normalizar_texto(item['nombre'])
-        ]
+        return ('nombre', val.normalizar_texto(busqueda))
 
-    elif opcion == 2:  # Por 1er Nivel (Continente)
+    if opcion == 2:  # Por 1er Nivel (Continente)
         busqueda = val.validar_string_alfabetico(
             f"Ingrese {primer_nivel_key} a filtrar: ")
-        busqueda_norm = val.normalizar_texto(busqueda)
-        resultados = [
-            item for item in items_globales
-            if val.normalizar_texto(item[primer_nivel_key]) == busqueda_norm
-        ]
+        return ('nivel', val.normalizar_texto(busqueda))
+
+    if opcion == 4:  # Por cualquier combinación de niveles
+        print(f"Deje vacío un nivel para aceptar cualquiera. Admite comodines "
+              f"* y ? (ej: Am*) y varias opciones separadas por '{SEPARADOR_PATRONES}'.")
+        textos = {nivel: input(f"  {nivel.capitalize()}: ")
+                  for nivel in niveles_jerarquia}
+        restricciones = armar_restricciones(niveles_jerarquia, textos)
+        if not restricciones:
+            print("❌ Debe indicar al menos un nivel.")
+            return None
+        return ('jerarquia', restricciones)
+
+    # Por Rango de Población
+    print("Ingrese el rango de población:")
+    min_pob = val.validar_entero_positivo("Valor mínimo: ")
+    max_pob = val.validar_entero_positivo("Valor máximo: ")
+
+    if min_pob > max_pob:
+        print("❌ El valor mínimo no puede ser mayor que el máximo.")
+        return None
+    return ('rango', (min_pob, max_pob))
 
-    elif opcion == 3:  # Por Rango de Población
-        print("Ingrese el rango de población:")
-        min_pob = val.validar_entero_positivo("Valor mínimo: ")
-        max_pob = val.validar_entero_positivo("Valor máximo: ")
 
-        if min_pob > max_pob:
-            print("❌ El valor mínimo no puede ser mayor que el máximo.")
-            return []
+def iterar_filtrados(items, criterio, primer_nivel_key):
 
-        resultados = [
-            item for item in items_globales
-            if min_pob <= item['poblacion'] <= max_pob
-        ]
+    """
+    (LÓGICA - READ) Filtro "en flujo" (generador): recorre cualquier
+    iterable de ítems (una lista o iterar_datos_recursivo()) y va
+    devolviendo los que cumplen el criterio, sin armar listas.
+    """
+    tipo, valor = criterio
+
+    if tipo == 'nombre':
+        for item in items:
+            if valor in val.normalizar_texto(item['nombre']):
+                yield item
+
+    elif tipo == 'nivel':
+        for item in items:
+            if val.normalizar_texto(item.get(primer_nivel_key, '')) == valor:
+                yield item
+
+    elif tipo == 'rango':
+        min_pob, max_pob = valor
+        for item in items:
+            if min_pob <= item['poblacion'] <= max_pob:
+                yield item
+
+    elif tipo == 'jerarquia':
+        for item in items:
+            if all(coincide_patrones(val.normalizar_texto(item.get(nivel, '')), patrones)
+                   for nivel, patrones in valor.items()):
+                yield item
+
+
+def filtrar_items(items_globales, niveles_jerarquia, opcion, primer_nivel_key):
+
+    """
+    (LÓGICA - READ) Filtra la lista global en memoria.
+    No necesita llamar a persistencia, solo procesa la lista.
+    Si recibe un AlmacenItems, usa sus índices en lugar de recorrer todo.
+    """
+    criterio = _pedir_criterio_filtro(opcion, primer_nivel_key, niveles_jerarquia)
+    if criterio is None:
+        return []
+    return filtrar_por_criterio(items_globales, criterio, primer_nivel_key)
+
+
+@inst.medido('logica.filtrar')
+def filtrar_por_criterio(items_globales, criterio, primer_nivel_key):
+
+    """
+    (LÓGICA - READ) Aplica un criterio ya armado ('nombre'|'nivel'|'rango'|
+    'jerarquia', valor) sin pedir nada por teclado. Lo usan filtrar_items() y el
+    benchmark. Con un AlmacenItems resuelve con los índices.
+    """
+    tipo, valor = criterio
+    if isinstance(items_globales, AlmacenItems):
+        if tipo == 'nombre':
+            # Índice de trigramas: no recorre ni normaliza todos los ítems
+            return items_globales.filtrar_por_nombre(valor)
+        if tipo == 'nivel':
+            # Índice hash del nivel: búsqueda directa
+            return items_globales.filtrar_por_nivel(primer_nivel_key, valor)
+        if tipo == 'jerarquia':
+            # Los patrones se prueban contra los valores DISTINTOS de cada
+            # nivel (pocos), no contra cada ítem
+            return items_globales.filtrar_por_niveles({
+                nivel: (lambda valor_norm, p=patrones: coincide_patrones(valor_norm, p))
+                for nivel, patrones in valor.items()
+            })
+        # Índice ordenado: dos búsquedas binarias
+        return items_globales.filtrar_por_rango_poblacion(*valor)
+
+    return list(iterar_filtrados(items_globales, criterio, primer_nivel_key))
+
+
+def filtrar_items_stream(items, niveles_jerarquia, opcion, primer_nivel_key):
+
+    """
+    (LÓGICA - READ) Igual que filtrar_items() pero devuelve un generador.
+    Pensado para filtrar directo desde el disco con iterar_datos_recursivo().
+    """
+    criterio = _pedir_criterio_filtro(opcion, primer_nivel_key, niveles_jerarquia)
+    if criterio is None:
+        return iter(())
+    return iterar_filtrados(items, criterio, primer_nivel_key)
+
+
+def filtrar_en_disco(ruta_base, niveles_jerarquia, opcion, primer_nivel_key):
+
+    """
+    (LÓGICA - READ) Filtro "en flujo" sin datos cargados: pide el criterio
+    y recorre el disco. Un filtro por nivel o por jerarquía no recorre
+    todo el árbol: solo entra en las carpetas que lo cumplen.
+    """
+    criterio = _pedir_criterio_filtro(opcion, primer_nivel_key, niveles_jerarquia)
+    if criterio is None:
+        return iter(())
+    tipo, valor = criterio
+    if tipo == 'jerarquia':
+        restricciones = valor
+    elif tipo == 'nivel':
+        # En memoria el nivel se compara literal: acá tampoco hay comodines
+        restricciones = {primer_nivel_key: (escapar_patron(valor),)}
+    else:
+        return iterar_filtrados(iterar_datos_recursivo(ruta_base, niveles_jerarquia),
+                                criterio, primer_nivel_key)
+    # Las carpetas ya cumplen el criterio: todos sus ítems sirven
+    return iterar_datos_recursivo(ruta_base, niveles_jerarquia, restricciones=restricciones)
+
+
+def buscar_por_nombre_exacto(items_globales, nombre):
+
+    """
+    (LÓGICA - READ) Devuelve los ítems cuyo nombre coincide exactamente
+    con 'nombre' (sin distinguir mayúsculas ni acentos). Puede haber
+    más de uno en jerarquías distintas.
+    """
+    nombre_norm = val.normalizar_texto(nombre)
 
-    return resultados
+    # Busca en la lista global en memoria (con el índice si es un almacén)
+    if isinstance(items_globales, AlmacenItems):
+        return items_globales.buscar_por_nombre_exacto(nombre_norm)
+    return [
+        item for item in items_globales
+        if val.normalizar_texto(item['nombre']) == nombre_norm
+    ]
 
 
 def _buscar_item_unico(items_globales, niveles_jerarquia):
@@ -179,13 +870,7 @@ def _buscar_item_unico(items_globales, niveles_jerarquia):
     """
     busqueda = val.validar_string_no_vacio(
         "Ingrese el nombre exacto del ítem: ")
-    busqueda_norm = val.normalizar_texto(busqueda)
-
-    # Busca en la lista global en memoria
-    resultados = [
-        item for item in items_globales
-        if val.normalizar_texto(item['nombre']) == busqueda_norm
-    ]
+    resultados = buscar_por_nombre_exacto(items_globales, busqueda)
 
     if not resultados:
         print(f"ℹ️ No se encontró ningún ítem con el nombre '{busqueda}'.")
@@ -206,11 +891,42 @@ def _buscar_item_unico(items_globales, niveles_jerarquia):
     return resultados[opcion - 1]  # Devuelve el ítem elegido
 
 
-def modificar_item(items_globales, niveles_jerarquia, campos_item_csv):
+def _items_del_archivo(items_globales, ruta_archivo):
+
+    """
+    Ayuda (LÓGICA): Ítems que pertenecen a un mismo CSV.
+    Con un AlmacenItems usa el índice por ruta (no recorre todo).
+    """
+    if isinstance(items_globales, AlmacenItems):
+        return items_globales.items_de_archivo(ruta_archivo)
+    return [
+        item for item in items_globales
+        if item['ruta_archivo'] == ruta_archivo
+    ]
+
+
+def _posicion_en_archivo(items_del_archivo, item):
+
+    """
+    Ayuda (LÓGICA): Posición de 'item' dentro de los ítems de su CSV
+    (= número de fila entre las filas válidas del archivo; las corruptas
+    no se cargan y persistencia.aplicar_operaciones_csv() tampoco las cuenta).
+    """
+    for posicion, otro in enumerate(items_del_archivo):
+        if otro is item or (isinstance(item, ItemVista) and otro == item):
+            return posicion
+    raise ValueError("El ítem no está en su archivo")
+
+
+def modificar_item(items_globales, niveles_jerarquia, campos_item_csv,
+                   ruta_journal=None):
 
     """
     (LÓGICA - UPDATE) Modifica un ítem.
     1. Busca en memoria. 2. Modifica en memoria. 3. Llama a persistencia.
+    Si se pasa 'ruta_journal', el cambio solo se registra en el journal
+    (se confirma en cuanto queda en disco) y el CSV se actualiza después,
+    en lote, con compactar_journal().
     """
     if not items_globales:
         print("ℹ️ No hay datos cargados para modificar.")
@@ -245,6 +961,29 @@ def modificar_item(items_globales, niveles_jerarquia, campos_item_csv):
             nuevo_valor = val.validar_flotante_positivo(
                 "Ingrese nueva superficie: ")
 
+        return aplicar_modificacion(items_globales, item_a_modificar, atributo_key,
+                                    nuevo_valor, campos_item_csv, ruta_journal)
+
+    except Exception as e:
+        print(f"❌ Error durante la modificación: {e}")
+        return False
+
+
+def aplicar_modificacion(items_globales, item_a_modificar, atributo_key, nuevo_valor,
+                         campos_item_csv, ruta_journal=None, manifiesto=None):
+
+    """
+    (LÓGICA - UPDATE) Parte no interactiva de modificar_item(): cambia un
+    atributo de un ítem ya identificado (con el valor ya validado) y lo
+    persiste, reescribiendo su CSV o registrándolo en el journal.
+    Con el 'manifiesto' de la carga, el CSV solo se reescribe si sigue
+    como se leyó (ver _reescribir_hoja()).
+    """
+    try:
+        # Guardamos el nombre ANTES del cambio (el journal lo usa para verificar)
+        nombre_anterior = item_a_modificar['nombre']
+        valor_anterior = item_a_modificar[atributo_key]
+
         # 3. Modificar el ítem en la lista de memoria
         item_a_modificar[atributo_key] = nuevo_valor
         print("Ítem actualizado en memoria.")
@@ -254,30 +993,42 @@ def modificar_item(items_globales, niveles_jerarquia, campos_item_csv):
         ruta_archivo = item_a_modificar['ruta_archivo']
 
         # Creamos una lista solo con los ítems que pertenecen a ESE MISMO archivo
-        items_del_mismo_archivo = [
-            item for item in items_globales
-            if item['ruta_archivo'] == ruta_archivo
-        ]
-
-        # 5. Llamar a persistencia para re-escribir (modo 'w')
-        print(f"Re-escribiendo archivo: {ruta_archivo}...")
-        if db.reescribir_csv_especifico(ruta_archivo, items_del_mismo_archivo, campos_item_csv):
-            print("✅ Modificación guardada exitosamente en disco.")
-            return True
+        items_del_mismo_archivo = _items_del_archivo(items_globales, ruta_archivo)
+
+        if ruta_journal:
+            operacion = {
+                'op': 'modificar', 'ruta': ruta_archivo,
+                'fila': _posicion_en_archivo(items_del_mismo_archivo, item_a_modificar),
+                'nombre': nombre_anterior, 'campo': atributo_key, 'valor': nuevo_valor
+            }
+            if db.registrar_en_journal(ruta_journal, [operacion]):
+                print("✅ Modificación registrada en el journal.")
+                return True
         else:
-            print("❌ Fallo al guardar en disco.")
-            return False
+            # 5. Llamar a persistencia para re-escribir (modo 'w')
+            print(f"Re-escribiendo archivo: {ruta_archivo}...")
+            if _reescribir_hoja(ruta_archivo, items_del_mismo_archivo, campos_item_csv,
+                                manifiesto):
+                print("✅ Modificación guardada exitosamente en disco.")
+                return True
+
+        # No quedó en disco: la memoria vuelve a coincidir con el CSV
+        item_a_modificar[atributo_key] = valor_anterior
+        print("❌ Fallo al guardar en disco. Se restauró el valor anterior.")
+        return False
 
     except Exception as e:
         print(f"❌ Error durante la modificación: {e}")
         return False
 
 
-def eliminar_item(items_globales, niveles_jerarquia, campos_item_csv):
+def eliminar_item(items_globales, niveles_jerarquia, campos_item_csv,
+                  ruta_journal=None):
 
     """
     (LÓGICA - DELETE) Elimina un ítem.
-    1. Busca en memoria. 2. Elimina de memoria. 3. Llama a persistencia.
+    1. Busca en memoria. 2. Llama a persistencia. 3. Lo elimina de memoria.
+    Con 'ruta_journal' la baja se registra en el journal (ver modificar_item).
     """
     if not items_globales:
         print("ℹ️ No hay datos cargados para eliminar.")
@@ -297,100 +1048,558 @@ def eliminar_item(items_globales, niveles_jerarquia, campos_item_csv):
         print("Cancelado. No se eliminó el ítem.")
         return False
 
+    return aplicar_eliminacion(items_globales, item_a_eliminar, campos_item_csv,
+                               ruta_journal)
+
+
+def aplicar_eliminacion(items_globales, item_a_eliminar, campos_item_csv,
+                        ruta_journal=None, manifiesto=None):
+
+    """
+    (LÓGICA - DELETE) Parte no interactiva de eliminar_item(): persiste
+    la baja de un ítem ya identificado (y confirmado) y, solo si quedó en
+    disco, lo saca de memoria ('manifiesto': igual que en aplicar_modificacion()).
+    """
     try:
-        # Guardamos la ruta ANTES de borrar el ítem
+        # Primero se persiste la baja y recién después se saca de memoria:
+        # si el disco falla, el ítem sigue en memoria igual que en el CSV
         ruta_archivo = item_a_eliminar['ruta_archivo']
-        
-        # 2. Eliminar el ítem de la lista de memoria
-        items_globales.remove(item_a_eliminar)
-        print("Ítem eliminado de la memoria.")
+        items_del_archivo = _items_del_archivo(items_globales, ruta_archivo)
+
+        if ruta_journal:
+            operacion = {
+                'op': 'eliminar', 'ruta': ruta_archivo,
+                'fila': _posicion_en_archivo(items_del_archivo, item_a_eliminar),
+                'nombre': item_a_eliminar['nombre']
+            }
+            if not db.registrar_en_journal(ruta_journal, [operacion]):
+                print("❌ Fallo al guardar en disco. El ítem no se eliminó.")
+                return False
+            items_globales.remove(item_a_eliminar)
+            print("✅ Eliminación registrada en el journal.")
+            return True
 
-        # 3. Preparar datos para persistencia
-        # Buscamos los ítems *restantes* de ese mismo archivo
-        items_restantes_del_archivo = [
-            item for item in items_globales
-            if item['ruta_archivo'] == ruta_archivo
-        ]
+        # 2. Preparar datos para persistencia: los ítems *restantes* de ese archivo
+        posicion = _posicion_en_archivo(items_del_archivo, item_a_eliminar)
+        items_restantes_del_archivo = (items_del_archivo[:posicion]
+                                       + items_del_archivo[posicion + 1:])
 
-        # 4. Llamar a persistencia (modo 'w')
+        # 3. Llamar a persistencia (modo 'w')
         print(f"Re-escribiendo archivo: {ruta_archivo}...")
-        if db.reescribir_csv_especifico(ruta_archivo, items_restantes_del_archivo, campos_item_csv):
-            print("✅ Eliminación guardada exitosamente en disco.")
-            return True
-        else:
-            print("❌ Fallo al guardar en disco.")
+        if not _reescribir_hoja(ruta_archivo, items_restantes_del_archivo, campos_item_csv,
+                                manifiesto):
+            print("❌ Fallo al guardar en disco. El ítem no se eliminó.")
             return False
 
+        # 4. Recién ahora lo sacamos de la memoria
+        items_globales.remove(item_a_eliminar)
+        print("✅ Eliminación guardada exitosamente en disco.")
+        return True
+
     except ValueError:
         print("❌ Error: No se pudo remover el ítem de la lista.")
         return False
     except Exception as e:
-        print(f"❌ Error inesperado during la eliminación: {e}")
+        print(f"❌ Error inesperado durante la eliminación: {e}")
         return False
 
+
+def _reescribir_hoja(ruta_archivo, items_del_archivo, campos_item_csv, manifiesto=None):
+
+    """
+    Ayuda (LÓGICA): Reescribe un CSV desde la memoria. Si el 'manifiesto'
+    tiene la firma con la que se leyó, persistencia controla que el
+    archivo no haya cambiado desde entonces (otro proceso): si cambió, no
+    se escribe, así no se pisan sus cambios. Si se escribe, el manifiesto
+    queda con la firma nueva (la memoria ya tiene ese contenido).
+    """
+    version_esperada = manifiesto.get(ruta_archivo) if manifiesto is not None else None
+    version_nueva = db.reescribir_csv_especifico(
+        ruta_archivo, items_del_archivo, campos_item_csv, version_esperada)
+    if version_nueva and version_esperada is not None:
+        manifiesto[ruta_archivo] = version_nueva
+    return bool(version_nueva)
+
+
+def compactar_journal(ruta_journal, campos_item_csv, manifiesto=None,
+                      minimo_operaciones=1, solo_rutas=None):
+
+    """
+    (LÓGICA) Aplica a los CSV los cambios pendientes del journal, agrupados
+    por archivo (cada CSV se reescribe UNA sola vez por lote, de forma
+    atómica) y después vacía el journal. Solo actúa si hay al menos
+    'minimo_operaciones' pendientes. Si se pasa el 'manifiesto' de la
+    recarga incremental, se actualiza con la firma nueva de cada archivo
+    (la memoria ya tenía esos cambios, no hace falta volver a leerlos);
+    salvo que otro proceso haya cambiado el archivo: ahí queda la firma
+    vieja y la próxima recarga incremental lo relee.
+    Con 'solo_rutas' se aplican únicamente las operaciones de esos CSV;
+    las demás siguen en el journal para el próximo lote.
+    Todo pasa con el candado del journal: varios procesos pueden compartir
+    el mismo journal sin aplicar dos veces ni perder operaciones.
+    Devuelve la cantidad de operaciones aplicadas.
+    """
+    try:
+        with db.bloquear_archivo(ruta_journal):
+            return _compactar_journal(ruta_journal, campos_item_csv, manifiesto,
+                                      minimo_operaciones, solo_rutas)
+    except OSError as e:
+        print(f"❌ No se pudo compactar el journal {ruta_journal}: {e}")
+        return 0
+
+
+def _compactar_journal(ruta_journal, campos_item_csv, manifiesto, minimo_operaciones,
+                       solo_rutas):
+    operaciones = db.leer_journal(ruta_journal)
+    restantes = []
+    if solo_rutas is not None:
+        restantes = [op for op in operaciones if op['ruta'] not in solo_rutas]
+        operaciones = [op for op in operaciones if op['ruta'] in solo_rutas]
+    if not operaciones or len(operaciones) < minimo_operaciones:
+        return 0
+
+    operaciones_por_archivo = {}
+    for op in operaciones:
+        operaciones_por_archivo.setdefault(op['ruta'], []).append(op)
+
+    aplicadas = 0
+    rutas = list(operaciones_por_archivo)
+    for i, ruta_archivo in enumerate(rutas):
+        ops_archivo = operaciones_por_archivo[ruta_archivo]
+        version_esperada = manifiesto.get(ruta_archivo) if manifiesto is not None else None
+        resultado = db.aplicar_operaciones_csv(ruta_archivo, ops_archivo, campos_item_csv,
+                                               version_esperada)
+        if resultado is None:
+            # El journal se queda SOLO con lo que falta aplicar, así los
+            # archivos ya compactados no reciben dos veces el mismo cambio.
+            pendientes = [op for ruta in rutas[i:]
+                          for op in operaciones_por_archivo[ruta]] + restantes
+            db.reescribir_journal(ruta_journal, pendientes)
+            print("❌ No se pudo compactar el journal. Se reintentará luego.")
+            return aplicadas
+        aplicadas_archivo, version_nueva = resultado
+        aplicadas += aplicadas_archivo
+        if version_esperada is not None and version_nueva is not None:
+            manifiesto[ruta_archivo] = version_nueva
+
+    if restantes:
+        db.reescribir_journal(ruta_journal, restantes)
+    else:
+        db.vaciar_journal(ruta_journal)
+    return aplicadas
+
 # --- Funciones de Lógica Pura (Adicionales) ---
 
 
-def ordenar_items(items_globales, clave_ordenamiento, reverso):
+def _clave_orden(clave_ordenamiento):
+
+    """
+    Ayuda (LÓGICA): Función "llave" para ordenar. Los nombres se ordenan
+    sin distinguir mayúsculas ni acentos (igual que normalizar_texto), y
+    a igual texto normalizado se desempata por el nombre original.
+    """
+    if clave_ordenamiento == 'nombre':
+        return lambda item: (val.normalizar_texto(item['nombre']), item['nombre'])
+    return lambda item: item[clave_ordenamiento]
+
+
+@inst.medido('logica.ordenar')
+def ordenar_items(items_globales, clave_ordenamiento, reverso, limite=None):
 
     """
     (LÓGICA) Ordena la lista global en memoria usando sorted().
+    Con 'limite' devuelve solo los primeros 'limite' ítems y usa un heap
+    (heapq.nsmallest/nlargest), que no necesita ordenar todo.
+    Con un AlmacenItems el orden completo queda guardado (como lista de
+    ids) hasta que el almacén cambie: repetir el mismo ordenamiento
+    no cuesta casi nada.
     """
     if not items_globales:
         return []
 
+    llave = _clave_orden(clave_ordenamiento)
+    es_almacen = isinstance(items_globales, AlmacenItems)
+    if es_almacen and clave_ordenamiento == 'nombre':
+        # El almacén ya tiene cada nombre normalizado: no se recalcula
+        nombres_norm = items_globales.nombres_norm
+        llave = lambda item: (nombres_norm[item._id], item['nombre'])
+
+    if es_almacen:
+        cacheado = items_globales.cache_orden.get((clave_ordenamiento, reverso))
+        if cacheado is not None and cacheado[0] == items_globales.version:
+            ids = cacheado[1] if limite is None else cacheado[1][:limite]
+            return [items_globales.vista(i) for i in ids]
+
+    # Top-k: con pocos ítems pedidos, un heap es mucho más barato que sorted()
+    if limite is not None and limite < len(items_globales):
+        if reverso:
+            return heapq.nlargest(limite, items_globales, key=llave)
+        return heapq.nsmallest(limite, items_globales, key=llave)
+
     # sorted() es una función muy potente. Le decimos que ordene la lista
     # usando como "llave" (key) el valor de cada diccionario para
     # la clave_ordenamiento (ej. 'poblacion').
-    items_ordenados = sorted(
-        items_globales, key=lambda item: item[clave_ordenamiento], reverse=reverso)
+    if es_almacen and clave_ordenamiento == 'poblacion' and not reverso:
+        # El índice ordenado de población ya tiene este orden
+        items_ordenados = [items_globales.vista(i)
+                           for i in items_globales.indice_poblacion.ids_en_orden()]
+    else:
+        items_ordenados = sorted(items_globales, key=llave, reverse=reverso)
+
+    if es_almacen:
+        items_globales.cache_orden[(clave_ordenamiento, reverso)] = (
+            items_globales.version, array('I', (item._id for item in items_ordenados)))
     return items_ordenados
 
 
-def calcular_estadisticas(items_globales, primer_nivel_jerarquia):
+def percentil(valores_ordenados, porcentaje):
+
+    """
+    (LÓGICA) Percentil con interpolación lineal entre los dos valores más
+    cercanos (ej: 50 = mediana). 'valores_ordenados' es cualquier secuencia
+    ordenada que se pueda leer por posición (una lista, un índice ordenado,
+    una columna de la base).
+    """
+    posicion = (len(valores_ordenados) - 1) * porcentaje / 100
+    abajo = int(posicion)
+    arriba = min(abajo + 1, len(valores_ordenados) - 1)
+    fraccion = posicion - abajo
+    return valores_ordenados[abajo] + (
+        valores_ordenados[arriba] - valores_ordenados[abajo]) * fraccion
+
+
+def _columnas_estadisticas(items_globales, niveles_grupo):
+
+    """
+    Ayuda (LÓGICA): Arma las columnas (poblaciones, superficies, claves de
+    grupo, ítems) que usa calcular_estadisticas(). Cada clave es la tupla
+    de valores de los niveles del grupo (None = sin valor).
+    Con un AlmacenItems se toman directo de sus arrays (sin crear vistas);
+    con una lista de dicts se arman en UNA sola pasada.
+    """
+    if isinstance(items_globales, AlmacenItems):
+        vivos = items_globales.vivos
+        ids = list(compress(range(len(vivos)), vivos))
+        poblaciones = list(compress(items_globales.poblacion, vivos))
+        superficies = list(compress(items_globales.superficie, vivos))
+
+        # Los niveles están codificados: agrupamos por código y
+        # traducimos a texto una sola vez por grupo.
+        columnas_codigos = []
+        for nivel in niveles_grupo:
+            tabla = items_globales.tablas[nivel]
+            textos = [None] + tabla[1:]
+            columnas_codigos.append(
+                [textos[c] for c in compress(items_globales.codigos[nivel], vivos)])
+        claves = list(zip(*columnas_codigos))
+        return poblaciones, superficies, claves, items_globales.vista, ids
+
+    items = []
+    poblaciones = []
+    superficies = []
+    claves = []
+    for item in items_globales:
+        items.append(item)
+        poblaciones.append(item['poblacion'])
+        superficies.append(item['superficie'])
+        claves.append(tuple(item.get(nivel) for nivel in niveles_grupo))
+    return poblaciones, superficies, claves, items.__getitem__, range(len(items))
+
+
+def _resumen_nodo(arbol, nodo):
+
+    """
+    Ayuda (LÓGICA): Totales de un nodo del árbol de jerarquía, con las
+    mismas claves que cada grupo de calcular_estadisticas().
+    """
+    min_pob, max_pob, min_sup, max_sup = arbol.extremos(nodo)
+    return {
+        'cantidad': nodo.cantidad,
+        'total_poblacion': nodo.suma_poblacion,
+        'total_superficie': nodo.suma_superficie,
+        'promedio_poblacion': nodo.suma_poblacion / nodo.cantidad,
+        'promedio_superficie': nodo.suma_superficie / nodo.cantidad,
+        'min_poblacion': min_pob,
+        'max_poblacion': max_pob,
+        'min_superficie': min_sup,
+        'max_superficie': max_sup
+    }
+
+
+def ordenar_grupos(grupos_por_valores):
+
+    """
+    (LÓGICA) Recibe {(valor de cada nivel, ...): datos del grupo} y
+    devuelve {"valor / valor": datos} ordenado por esos valores (orden
+    de texto, los que no tienen valor al final). Los dos backends lo usan,
+    así las estadísticas salen con los grupos en el mismo orden.
+    """
+    ordenadas = sorted(grupos_por_valores, key=lambda valores: [
+        (valor is None, valor or '') for valor in valores])
+    return {
+        " / ".join(valor or SIN_CATEGORIA for valor in valores): grupos_por_valores[valores]
+        for valores in ordenadas
+    }
+
+
+def _grupos_desde_arbol(arbol, niveles_grupo):
+
+    """
+    Ayuda (LÓGICA): Agrupa por uno o más niveles usando los nodos del
+    árbol (no los ítems). Se baja hasta el nivel más profundo pedido y se
+    juntan los nodos que comparten los valores de esos niveles (ej: por
+    'region' sola, 'Sur' de América y 'Sur' de Europa van al mismo grupo).
+    """
+    posiciones = [arbol.niveles.index(nivel) for nivel in niveles_grupo]
+    acumulados = {}
+    for nodo in arbol.nodos_en_profundidad(max(posiciones) + 1):
+        clave = tuple(nodo.camino[i] for i in posiciones)
+        grupo = _resumen_nodo(arbol, nodo)
+        acc = acumulados.get(clave)
+        if acc is None:
+            acumulados[clave] = grupo
+            continue
+        acc['cantidad'] += grupo['cantidad']
+        acc['total_poblacion'] += grupo['total_poblacion']
+        acc['total_superficie'] += grupo['total_superficie']
+        acc['min_poblacion'] = min(acc['min_poblacion'], grupo['min_poblacion'])
+        acc['max_poblacion'] = max(acc['max_poblacion'], grupo['max_poblacion'])
+        acc['min_superficie'] = min(acc['min_superficie'], grupo['min_superficie'])
+        acc['max_superficie'] = max(acc['max_superficie'], grupo['max_superficie'])
+
+    for acc in acumulados.values():
+        acc['promedio_poblacion'] = acc['total_poblacion'] / acc['cantidad']
+        acc['promedio_superficie'] = acc['total_superficie'] / acc['cantidad']
+    return ordenar_grupos(acumulados)
+
+
+def _estadisticas_incrementales(almacen, niveles_grupo, percentiles):
+
+    """
+    Ayuda (LÓGICA): Arma el diccionario de estadísticas SIN recorrer los
+    ítems, con lo que el AlmacenItems mantiene en cada alta, modificación
+    o baja: sumas, índices ordenados y el árbol de jerarquía (los grupos,
+    con sus mínimos y máximos, salen de los nodos del árbol).
+    El costo no depende de la cantidad de ítems.
+    """
+    cantidad_total = len(almacen)
+    indice_pob = almacen.indice_poblacion
+    indice_sup = almacen.indice_superficie
+    grupos = _grupos_desde_arbol(almacen.arbol, niveles_grupo)
+
+    return {
+        'cantidad_total': cantidad_total,
+        'total_poblacion': almacen.suma_poblacion,
+        'total_superficie': almacen.suma_superficie,
+        'promedio_poblacion': almacen.suma_poblacion / cantidad_total,
+        'promedio_superficie': almacen.suma_superficie / cantidad_total,
+        'pais_mayor_pob': almacen.vista(indice_pob.id_del_maximo()),
+        'pais_menor_pob': almacen.vista(indice_pob.id_del_minimo()),
+        'pais_mayor_sup': almacen.vista(indice_sup.id_del_maximo()),
+        'pais_menor_sup': almacen.vista(indice_sup.id_del_minimo()),
+        # Los índices ordenados se pueden leer por posición como una lista
+        'percentiles_poblacion': {p: percentil(indice_pob, p) for p in percentiles},
+        'percentiles_superficie': {p: percentil(indice_sup, p) for p in percentiles},
+        'conteo_primer_nivel': {
+            clave: grupo['cantidad'] for clave, grupo in grupos.items()},
+        'grupos': grupos,
+        'primer_nivel_jerarquia': " / ".join(niveles_grupo)
+    }
+
+
+def _diferencias_estadisticas(rapidas, completas):
+
+    """
+    Ayuda (LÓGICA): Compara dos diccionarios de estadísticas y devuelve
+    la lista de claves que no coinciden (vacía = todo bien). Los floats
+    se comparan con tolerancia y los países por su contenido.
+    """
+    def iguales(a, b):
+        if isinstance(a, dict) and isinstance(b, dict):
+            return all(k in b and iguales(v, b[k]) for k, v in a.items())
+        if isinstance(a, ItemVista) or isinstance(b, ItemVista):
+            return dict(a.items()) == dict(b.items())
+        if isinstance(a, float) or isinstance(b, float):
+            return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-6)
+        return a == b
+
+    return [clave for clave, valor in rapidas.items()
+            if clave not in completas or not iguales(valor, completas[clave])]
+
+
+def _arbol_de(items_globales, niveles_jerarquia):
+
+    """
+    Ayuda (LÓGICA): El árbol de jerarquía de los datos. Un AlmacenItems ya
+    lo tiene armado y al día; para una lista se arma en una pasada.
+    """
+    if isinstance(items_globales, AlmacenItems):
+        return items_globales.arbol
+    items = list(items_globales)
+    arbol = ArbolJerarquia(
+        niveles_jerarquia, lambda i: (items[i]['poblacion'], items[i]['superficie']))
+    for i, item in enumerate(items):
+        arbol.agregar(i, tuple(item.get(nivel) for nivel in niveles_jerarquia),
+                      item['poblacion'], item['superficie'])
+    return arbol
+
+
+def explorar_jerarquia(items_globales, niveles_jerarquia, camino=()):
+
+    """
+    (LÓGICA - READ) Navegación por la jerarquía ("drill-down"). 'camino'
+    son los valores elegidos hasta ahora (ej: [] = todo, ['Europa'],
+    ['europa', 'sur']; sin distinguir mayúsculas ni acentos).
+    Devuelve los totales de ese nodo y los de cada hijo (cantidad, sumas,
+    promedios, mínimos y máximos), o None si el camino no existe.
+    Con un AlmacenItems sale de los nodos del árbol: no recorre ítems.
+    """
+    if len(camino) > len(niveles_jerarquia):
+        return None
+    arbol = _arbol_de(items_globales, niveles_jerarquia)
+    nodo = arbol.raiz
+    for valor in camino:
+        valor_norm = val.normalizar_texto(valor)
+        nodo = next((hijo for clave, hijo in nodo.hijos.items()
+                     if val.normalizar_texto(clave or SIN_CATEGORIA) == valor_norm), None)
+        if nodo is None:
+            return None
+
+    profundidad = len(nodo.camino)
+    hijos = sorted(nodo.hijos.items(), key=lambda par: (par[0] is None, par[0] or ''))
+    return {
+        'camino': [valor or SIN_CATEGORIA for valor in nodo.camino],
+        'nivel': niveles_jerarquia[profundidad - 1] if profundidad else None,
+        'nivel_hijos': (niveles_jerarquia[profundidad]
+                        if profundidad < len(niveles_jerarquia) else None),
+        'total': _resumen_nodo(arbol, nodo) if nodo.cantidad else None,
+        'hijos': {clave or SIN_CATEGORIA: _resumen_nodo(arbol, hijo)
+                  for clave, hijo in hijos}
+    }
+
+
+@inst.medido('logica.estadisticas')
+def calcular_estadisticas(items_globales, primer_nivel_jerarquia,
+                          percentiles=(25, 50, 75), verificar=False):
 
     """
     (LÓGICA) Calcula todas las estadísticas y devuelve un diccionario.
     Esto es lógica pura, solo procesa la lista global.
+    'primer_nivel_jerarquia' es el nivel por el que se agrupa; también
+    puede ser una lista de niveles (ej: ['continente', 'region']) para
+    agrupar por la combinación. Las sumas, máximos y mínimos se hacen
+    sobre columnas (sum/max/min nativos) y los grupos en una sola pasada.
+    Con un AlmacenItems la respuesta sale directo de los agregados y del
+    árbol de jerarquía que el almacén mantiene (no recorre nada). Con verificar=True
+    además se recalcula todo y se agrega la clave 'verificacion' con la
+    lista de diferencias encontradas (vacía si coinciden).
     """
     if not items_globales:
         return None  # No hay datos para calcular
 
+    if isinstance(primer_nivel_jerarquia, str):
+        niveles_grupo = [primer_nivel_jerarquia]
+    else:
+        niveles_grupo = list(primer_nivel_jerarquia)
+
+    if isinstance(items_globales, AlmacenItems):
+        stats_dict = _estadisticas_incrementales(
+            items_globales, niveles_grupo, percentiles)
+        if verificar:
+            completas = _recalcular_estadisticas(
+                items_globales, niveles_grupo, percentiles)
+            stats_dict['verificacion'] = _diferencias_estadisticas(
+                stats_dict, completas)
+        return stats_dict
+
+    return _recalcular_estadisticas(items_globales, niveles_grupo, percentiles)
+
+
+def _recalcular_estadisticas(items_globales, niveles_grupo, percentiles):
+
+    """
+    Ayuda (LÓGICA): Cálculo completo de estadísticas (recorre los ítems).
+    """
+
+    poblaciones, superficies, claves, item_en, ids = _columnas_estadisticas(
+        items_globales, niveles_grupo)
+
     # 1. Cantidad total
-    cantidad_total = len(items_globales)
+    cantidad_total = len(poblaciones)
 
     # 2. Sumas y Promedios
-    total_poblacion = sum(item['poblacion'] for item in items_globales)
-    total_superficie = sum(item['superficie'] for item in items_globales)
+    total_poblacion = sum(poblaciones)
+    total_superficie = sum(superficies)
 
     promedio_poblacion = total_poblacion / cantidad_total
     promedio_superficie = total_superficie / cantidad_total
 
-    # 3. Máximos y Mínimos (usando 'max' con una 'key')
-    pais_mayor_pob = max(items_globales, key=lambda p: p['poblacion'])
-    pais_menor_pob = min(items_globales, key=lambda p: p['poblacion'])
-    pais_mayor_sup = max(items_globales, key=lambda p: p['superficie'])
+    # 3. Máximos y Mínimos (buscamos la POSICIÓN, después el ítem)
+    posiciones = range(cantidad_total)
+    pais_mayor_pob = item_en(ids[max(posiciones, key=poblaciones.__getitem__)])
+    pais_menor_pob = item_en(ids[min(posiciones, key=poblaciones.__getitem__)])
+    pais_mayor_sup = item_en(ids[max(posiciones, key=superficies.__getitem__)])
+    pais_menor_sup = item_en(ids[min(posiciones, key=superficies.__getitem__)])
+
+    # 4. Percentiles
+    poblaciones_ordenadas = sorted(poblaciones)
+    superficies_ordenadas = sorted(superficies)
+    percentiles_poblacion = {
+        p: percentil(poblaciones_ordenadas, p) for p in percentiles}
+    percentiles_superficie = {
+        p: percentil(superficies_ordenadas, p) for p in percentiles}
+
+    # 5. Agrupación por nivel (Requisito Fase 3), en UNA sola pasada:
+    # [cantidad, suma pob, suma sup, min pob, max pob, min sup, max sup]
+    acumulados = {}
+    for clave, pob, sup in zip(claves, poblaciones, superficies):
+        acc = acumulados.get(clave)
+        if acc is None:
+            acumulados[clave] = [1, pob, sup, pob, pob, sup, sup]
+            continue
+        acc[0] += 1
+        acc[1] += pob
+        acc[2] += sup
+        if pob < acc[3]:
+            acc[3] = pob
+        elif pob > acc[4]:
+            acc[4] = pob
+        if sup < acc[5]:
+            acc[5] = sup
+        elif sup > acc[6]:
+            acc[6] = sup
+
+    grupos = ordenar_grupos({
+        clave: {
+            'cantidad': acc[0],
+            'total_poblacion': acc[1],
+            'total_superficie': acc[2],
+            'promedio_poblacion': acc[1] / acc[0],
+            'promedio_superficie': acc[2] / acc[0],
+            'min_poblacion': acc[3],
+            'max_poblacion': acc[4],
+            'min_superficie': acc[5],
+            'max_superficie': acc[6]
+        }
+        for clave, acc in acumulados.items()
+    })
+    conteo_primer_nivel = {clave: grupo['cantidad'] for clave, grupo in grupos.items()}
 
-    # 4. Conteo por 1er Nivel (Requisito Fase 3)
-    conteo_primer_nivel = {}
-    for item in items_globales:
-        valor_nivel = item.get(primer_nivel_jerarquia, 'Sin Categoría')
-        
-        # .get(valor, 0) + 1 es un truco para contar:
-        # "Obtén el conteo actual (o 0 si no existe) y súmale 1"
-        conteo_primer_nivel[valor_nivel] = conteo_primer_nivel.get(
-            valor_nivel, 0) + 1
-
-    # 5. Empaquetamos todo en un solo diccionario para enviarlo a la VISTA
+    # 6. Empaquetamos todo en un solo diccionario para enviarlo a la VISTA
     stats_dict = {
         'cantidad_total': cantidad_total,
         'total_poblacion': total_poblacion,
+        'total_superficie': total_superficie,
         'promedio_poblacion': promedio_poblacion,
         'promedio_superficie': promedio_superficie,
         'pais_mayor_pob': pais_mayor_pob,
         'pais_menor_pob': pais_menor_pob,
         'pais_mayor_sup': pais_mayor_sup,
+        'pais_menor_sup': pais_menor_sup,
+        'percentiles_poblacion': percentiles_poblacion,
+        'percentiles_superficie': percentiles_superficie,
         'conteo_primer_nivel': conteo_primer_nivel,
-        'primer_nivel_jerarquia': primer_nivel_jerarquia
+        'grupos': grupos,
+        'primer_nivel_jerarquia': " / ".join(niveles_grupo)
     }
     return stats_dict
@@ -0,0 +1,282 @@
+# MÓDULO: indices.py
+# RESPONSABILIDAD: Índices secundarios en memoria para el almacén.
+# Cada índice guarda ids de fila en columnas tipadas (array), no en sets
+# ni en tuplas: unos pocos bytes por fila. Se actualiza con
+# agregar()/quitar() cada vez que el almacén cambia una fila.
+# Así los filtros no tienen que recorrer todos los ítems.
+# Las bajas no borran nada en el momento: el id queda como "lápida"
+# y se descarta al consultar (preguntándole al almacén si esa fila
+# sigue viva y con ese valor). Cuando las lápidas son mayoría, el
+# índice se limpia entero de una vez.
+# No lee ni escribe en disco y no imprime nada.
+
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import chain
+
+# Marcas de comienzo y fin de texto para los trigramas (no aparecen en
+# un texto normalizado): "peru" -> "\x02peru\x03"
+MARCA_INICIO = '\x02'
+MARCA_FIN = '\x03'
+
+# Una limpieza recorre el índice entero: se hace recién cuando las
+# lápidas superan a las entradas vivas (y son al menos estas)
+MINIMO_LAPIDAS = 1024
+
+
+def _trigramas(texto):
+
+    """
+    Ayuda (ÍNDICES): Devuelve el conjunto de trigramas (pedazos de 3 letras)
+    de un texto. Ej: "peru" -> {"per", "eru"}.
+    """
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def _hay_que_limpiar(lapidas, entradas):
+    return lapidas >= MINIMO_LAPIDAS and lapidas * 2 > entradas
+
+
+class IndiceTrigramas:
+
+    """
+    (ÍNDICES) Índice de texto para búsquedas por subcadena ("contiene").
+    Guarda, para cada trigrama, un array con los ids de las filas cuyo
+    texto lo contiene. El texto se indexa con las marcas de comienzo y
+    fin, así todo texto (aunque tenga 1 o 2 letras) tiene trigramas, y
+    una búsqueda exacta o por prefijo es una subcadena más
+    ("\\x02peru\\x03", "\\x02pe").
+    El índice no guarda los textos: 'texto_vigente(id)' devuelve el texto
+    normalizado actual de la fila (o None si se eliminó). Con él se
+    confirma cada candidato (hay falsos positivos y lápidas).
+    """
+
+    def __init__(self, texto_vigente):
+        self.ids_por_trigrama = {}   # trigrama -> array('I') de ids
+        self._texto_vigente = texto_vigente
+        self._entradas = 0
+        self._lapidas = 0
+
+    def agregar(self, id_fila, texto):
+        ids_por_trigrama = self.ids_por_trigrama
+        trigramas = _trigramas(MARCA_INICIO + texto + MARCA_FIN)
+        for trigrama in trigramas:
+            ids = ids_por_trigrama.get(trigrama)
+            if ids is None:
+                ids = ids_por_trigrama[trigrama] = array('I')
+            ids.append(id_fila)
+        self._entradas += len(trigramas)
+
+    def quitar(self, id_fila, texto):
+        """'texto' es el que tenía la fila al agregarse (sus ids quedan como lápidas)."""
+        self._lapidas += len(_trigramas(MARCA_INICIO + texto + MARCA_FIN))
+        if _hay_que_limpiar(self._lapidas, self._entradas):
+            self._limpiar()
+
+    def _limpiar(self):
+        texto_vigente = self._texto_vigente
+        entradas = 0
+        for trigrama in list(self.ids_por_trigrama):
+            vigentes = sorted({
+                i for i in self.ids_por_trigrama[trigrama]
+                if (texto := texto_vigente(i)) is not None
+                and trigrama in MARCA_INICIO + texto + MARCA_FIN})
+            if vigentes:
+                self.ids_por_trigrama[trigrama] = array('I', vigentes)
+                entradas += len(vigentes)
+            else:
+                del self.ids_por_trigrama[trigrama]
+        self._entradas = entradas
+        self._lapidas = 0
+
+    def _buscar(self, consulta):
+        """Ids (ordenados) cuyo texto CON marcas contiene a 'consulta'."""
+        if len(consulta) < 3:
+            # Consultas cortas: los trigramas que la contienen. Se recorre
+            # el vocabulario (miles de trigramas), no las filas.
+            listas = [ids for trigrama, ids in self.ids_por_trigrama.items()
+                      if consulta in trigrama]
+            if not listas:
+                return []
+            candidatos = set().union(*listas)
+        else:
+            listas = []
+            for trigrama in _trigramas(consulta):
+                ids = self.ids_por_trigrama.get(trigrama)
+                if not ids:
+                    return []
+                listas.append(ids)
+            # Se confirman los ids del trigrama menos frecuente
+            candidatos = min(listas, key=len)
+
+        texto_vigente = self._texto_vigente
+        return sorted({
+            i for i in candidatos
+            if (texto := texto_vigente(i)) is not None
+            and consulta in MARCA_INICIO + texto + MARCA_FIN})
+
+    def buscar_subcadena(self, consulta):
+        """Ids (ordenados) cuyo texto contiene a 'consulta' (ya normalizada)."""
+        return self._buscar(consulta)
+
+    def buscar_prefijo(self, consulta):
+        """Ids (ordenados) cuyo texto empieza con 'consulta'."""
+        return self._buscar(MARCA_INICIO + consulta)
+
+    def buscar_exacto(self, consulta):
+        """Ids (ordenados) cuyo texto es exactamente 'consulta'."""
+        return self._buscar(MARCA_INICIO + consulta + MARCA_FIN)
+
+
+class IndiceHash:
+
+    """
+    (ÍNDICES) Índice de igualdad exacta: valor -> array de ids.
+    Se usa para los niveles de jerarquía (ej: continente) y la ruta.
+    'vigente(id, valor)' dice si la fila sigue viva y con ese valor.
+    """
+
+    def __init__(self, vigente):
+        self.ids_por_valor = {}
+        self._vigente = vigente
+        self._entradas = 0
+        self._lapidas = 0
+
+    def agregar(self, id_fila, valor):
+        ids = self.ids_por_valor.get(valor)
+        if ids is None:
+            ids = self.ids_por_valor[valor] = array('I')
+        ids.append(id_fila)
+        self._entradas += 1
+
+    def agregar_lote(self, ids_filas, valor):
+        """Varias filas nuevas (ids crecientes) con el mismo valor."""
+        ids = self.ids_por_valor.get(valor)
+        if ids is None:
+            ids = self.ids_por_valor[valor] = array('I')
+        ids.extend(ids_filas)
+        self._entradas += len(ids_filas)
+
+    def quitar(self, id_fila, valor):
+        self._lapidas += 1
+        if _hay_que_limpiar(self._lapidas, self._entradas):
+            self._limpiar()
+
+    def _limpiar(self):
+        for valor in list(self.ids_por_valor):
+            vigentes = self._vigentes(valor)
+            if vigentes:
+                self.ids_por_valor[valor] = array('I', vigentes)
+            else:
+                del self.ids_por_valor[valor]
+        self._entradas = sum(map(len, self.ids_por_valor.values()))
+        self._lapidas = 0
+
+    def _vigentes(self, valor):
+        ids = self.ids_por_valor.get(valor, ())
+        vigente = self._vigente
+        return sorted({i for i in ids if vigente(i, valor)})
+
+    def valores(self):
+        """Los valores indexados (puede haber alguno sin filas vivas)."""
+        return self.ids_por_valor.keys()
+
+    def buscar(self, valor):
+        """Ids (ordenados) con ese valor exacto."""
+        if not self._lapidas:
+            # Sin bajas, cada array está ordenado y sin repetidos
+            return list(self.ids_por_valor.get(valor, ()))
+        return self._vigentes(valor)
+
+
+class IndiceOrdenado:
+
+    """
+    (ÍNDICES) Índice ordenado de valores numéricos.
+    Mantiene dos arrays paralelos ordenados por (valor, id): 'valores'
+    (del tipo de la columna: 'q' o 'd') e 'ids'; un rango [min, max] se
+    resuelve con dos búsquedas binarias (bisect).
+    Las altas se acumulan aparte y se ordenan juntas más tarde: en una
+    carga masiva se ordena una sola vez en lugar de hacer un insort por
+    ítem. Las bajas quedan como lápidas ('vigente(id, valor)' las
+    reconoce). Las consultas por posición (percentiles, mínimo,
+    máximo, orden completo) ordenan lo pendiente y limpian antes.
+    """
+
+    def __init__(self, tipo, vigente):
+        self._tipo = tipo
+        self._vigente = vigente
+        self.valores = array(tipo)
+        self.ids = array('I')
+        self._valores_pendientes = array(tipo)
+        self._ids_pendientes = array('I')
+        self._lapidas = 0
+
+    def _asentar(self, limpiar=True):
+        if not (self._ids_pendientes or (limpiar and self._lapidas)):
+            return
+        pares = zip(chain(self.valores, self._valores_pendientes),
+                    chain(self.ids, self._ids_pendientes))
+        if self._lapidas:
+            vigente = self._vigente
+            # Un set: una fila que volvió a un valor anterior aparece dos veces
+            pares = sorted({(valor, i) for valor, i in pares if vigente(i, valor)})
+        else:
+            pares = sorted(pares)  # Timsort aprovecha la parte ya ordenada
+        self.valores = array(self._tipo, [valor for valor, _ in pares])
+        self.ids = array('I', [i for _, i in pares])
+        self._valores_pendientes = array(self._tipo)
+        self._ids_pendientes = array('I')
+        self._lapidas = 0
+
+    def agregar(self, id_fila, valor):
+        self._valores_pendientes.append(valor)
+        self._ids_pendientes.append(id_fila)
+
+    def agregar_lote(self, ids_filas, valores):
+        self._valores_pendientes.extend(valores)
+        self._ids_pendientes.extend(ids_filas)
+
+    def quitar(self, id_fila, valor):
+        self._lapidas += 1
+        if _hay_que_limpiar(self._lapidas, len(self.ids) + len(self._ids_pendientes)):
+            self._asentar()
+
+    def buscar_rango(self, minimo, maximo):
+        """Ids (ordenados) con minimo <= valor <= maximo."""
+        if len(self._ids_pendientes) > max(MINIMO_LAPIDAS, len(self.ids) // 16):
+            self._asentar(limpiar=False)
+        desde = bisect_left(self.valores, minimo)
+        hasta = bisect_right(self.valores, maximo)
+        encontrados = [(self.valores[pos], self.ids[pos]) for pos in range(desde, hasta)]
+        encontrados.extend((valor, i) for valor, i in zip(
+            self._valores_pendientes, self._ids_pendientes) if minimo <= valor <= maximo)
+        vigente = self._vigente
+        return sorted({i for valor, i in encontrados
+                       if not self._lapidas or vigente(i, valor)})
+
+    def __len__(self):
+        self._asentar()
+        return len(self.ids)
+
+    def __getitem__(self, posicion):
+        """Valor en la posición indicada (0 = el menor). Sirve para percentiles."""
+        self._asentar()
+        return self.valores[posicion]
+
+    def ids_en_orden(self):
+        """Ids de menor a mayor valor (a igual valor, por id)."""
+        self._asentar()
+        return list(self.ids)
+
+    def id_del_minimo(self):
+        """Id de la fila con el menor valor (si hay empate, el id más chico)."""
+        self._asentar()
+        return self.ids[0] if self.ids else None
+
+    def id_del_maximo(self):
+        """Id de la fila con el mayor valor (si hay empate, el id más chico)."""
+        self._asentar()
+        if not self.ids:
+            return None
+        return self.ids[bisect_left(self.valores, self.valores[-1])]
@@ -0,0 +1,220 @@
+# MÓDULO: instrumentacion.py
+# RESPONSABILIDAD: Medición opcional de tiempos y contadores (diagnóstico).
+# Por defecto está APAGADA y cada llamada vuelve enseguida sin hacer nada.
+# Se enciende con la variable de entorno HUALPA_INSTRUMENTAR (o con
+# 'python main.py --instrumentar') y, además, puede perfilar todo el
+# programa con cProfile (HUALPA_PERFIL=archivo.pstats o '--perfil archivo').
+# No imprime nada: el resumen lo muestra vistas.mostrar_resumen_instrumentacion().
+
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+VARIABLE_INSTRUMENTAR = "HUALPA_INSTRUMENTAR"
+VARIABLE_PERFIL = "HUALPA_PERFIL"
+
+activo = False
+_contadores = {}          # nombre -> cantidad acumulada
+_tiempos = {}             # nombre -> [llamadas, segundos_total, segundos_max]
+_candado = threading.Lock()  # La carga lee los CSV desde varios hilos
+_perfilador = None
+_ruta_perfil = None
+_ruta_resumen = None
+_NULO = nullcontext()
+
+
+class _Cronometro:
+
+    """(INSTRUMENTACIÓN) Context manager que acumula el tiempo de un bloque."""
+
+    __slots__ = ('nombre', 'inicio')
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        registrar_tiempo(self.nombre, time.perf_counter() - self.inicio)
+        return False
+
+
+def activar(ruta_perfil=None, ruta_resumen=None):
+
+    """
+    (INSTRUMENTACIÓN) Enciende los contadores. Con 'ruta_perfil' también
+    arranca cProfile (el .pstats se guarda en finalizar()); con
+    'ruta_resumen' el resumen se guarda además como JSON.
+    """
+    global activo, _perfilador, _ruta_perfil, _ruta_resumen
+    activo = True
+    _ruta_resumen = ruta_resumen or _ruta_resumen
+    if ruta_perfil and _perfilador is None:
+        _ruta_perfil = ruta_perfil
+        _perfilador = cProfile.Profile()
+        _perfilador.enable()
+
+
+def configurar_desde_entorno():
+
+    """
+    (INSTRUMENTACIÓN) Lee HUALPA_INSTRUMENTAR y HUALPA_PERFIL.
+    HUALPA_INSTRUMENTAR=1 enciende los contadores; si su valor termina en
+    '.json', es además el archivo donde se guarda el resumen.
+    HUALPA_PERFIL=archivo.pstats enciende todo y activa cProfile.
+    """
+    valor = os.environ.get(VARIABLE_INSTRUMENTAR, "").strip()
+    ruta_perfil = os.environ.get(VARIABLE_PERFIL, "").strip() or None
+    if valor.lower() in ("", "0", "no", "false") and not ruta_perfil:
+        return
+    ruta_resumen = valor if valor.lower().endswith(".json") else None
+    activar(ruta_perfil, ruta_resumen)
+
+
+def contar(nombre, cantidad=1):
+
+    """(INSTRUMENTACIÓN) Suma 'cantidad' al contador 'nombre'."""
+    if not activo:
+        return
+    with _candado:
+        _contadores[nombre] = _contadores.get(nombre, 0) + cantidad
+
+
+def registrar_tiempo(nombre, segundos):
+
+    """(INSTRUMENTACIÓN) Acumula una medición de tiempo ya tomada."""
+    if not activo:
+        return
+    with _candado:
+        datos = _tiempos.get(nombre)
+        if datos is None:
+            _tiempos[nombre] = [1, segundos, segundos]
+        else:
+            datos[0] += 1
+            datos[1] += segundos
+            if segundos > datos[2]:
+                datos[2] = segundos
+
+
+def cronometro(nombre):
+
+    """
+    (INSTRUMENTACIÓN) Uso: 'with cronometro("io.leer_csv"): ...'.
+    Apagada, devuelve un context manager vacío (casi sin costo).
+    """
+    return _Cronometro(nombre) if activo else _NULO
+
+
+def medido(nombre):
+
+    """
+    (INSTRUMENTACIÓN) Decorador: mide cada llamada a la función con
+    cronometro(nombre). Se usa en las funciones de lógica y de vista más
+    pesadas, para separar el tiempo de cálculo del de impresión.
+    """
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not activo:
+                return funcion(*args, **kwargs)
+            with _Cronometro(nombre):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def resumen():
+
+    """(INSTRUMENTACIÓN) Devuelve los contadores y tiempos acumulados."""
+    with _candado:
+        return {
+            'contadores': dict(sorted(_contadores.items())),
+            'tiempos': {
+                nombre: {
+                    'llamadas': llamadas,
+                    'segundos_total': total,
+                    'segundos_promedio': total / llamadas,
+                    'segundos_max': maximo
+                }
+                for nombre, (llamadas, total, maximo) in sorted(_tiempos.items())
+            }
+        }
+
+
+def extraer():
+
+    """
+    (INSTRUMENTACIÓN) Devuelve lo acumulado (contadores y tiempos, en
+    crudo) y lo borra. Lo usa un proceso del pool para mandarle al
+    proceso principal lo que midió (ver sumar()).
+    """
+    with _candado:
+        datos = (dict(_contadores), {nombre: list(t) for nombre, t in _tiempos.items()})
+        _contadores.clear()
+        _tiempos.clear()
+    return datos
+
+
+def sumar(datos):
+
+    """(INSTRUMENTACIÓN) Suma a lo acumulado lo que devolvió extraer() en otro proceso."""
+    if not activo or not datos:
+        return
+    contadores, tiempos = datos
+    with _candado:
+        for nombre, cantidad in contadores.items():
+            _contadores[nombre] = _contadores.get(nombre, 0) + cantidad
+        for nombre, (llamadas, total, maximo) in tiempos.items():
+            actual = _tiempos.get(nombre)
+            if actual is None:
+                _tiempos[nombre] = [llamadas, total, maximo]
+            else:
+                actual[0] += llamadas
+                actual[1] += total
+                if maximo > actual[2]:
+                    actual[2] = maximo
+
+
+def reiniciar():
+
+    """(INSTRUMENTACIÓN) Borra lo acumulado (no apaga la instrumentación)."""
+    with _candado:
+        _contadores.clear()
+        _tiempos.clear()
+
+
+def finalizar():
+
+    """
+    (INSTRUMENTACIÓN) Se llama al salir. Detiene cProfile y guarda el
+    .pstats y el JSON si se pidieron. Devuelve el resumen (con las rutas
+    guardadas), o None si la instrumentación estaba apagada.
+    """
+    global _perfilador
+    if not activo:
+        return None
+
+    datos = resumen()
+    if _perfilador is not None:
+        _perfilador.disable()
+        try:
+            _perfilador.dump_stats(_ruta_perfil)
+            datos['archivo_perfil'] = _ruta_perfil
+        except OSError as e:
+            datos['error_perfil'] = str(e)
+        _perfilador = None
+
+    if _ruta_resumen:
+        try:
+            with open(_ruta_resumen, 'w', encoding='utf-8') as f:
+                json.dump(datos, f, ensure_ascii=False, indent=2)
+            datos['archivo_resumen'] = _ruta_resumen
+        except OSError as e:
+            datos['error_resumen'] = str(e)
+    return datos
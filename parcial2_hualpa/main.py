@@ -4,7 +4,19 @@
 import funciones as fn
 import vistas as vw
 import validaciones as val
+import instrumentacion as inst
+import backends
+import cli
+import servidor
+import vigilancia as vig
 import os
+import sys
+import time
+
+# Nombre de cada opción del menú en el resumen de la instrumentación
+ACCIONES_MENU = {0: 'salir', 1: 'cargar', 2: 'alta', 3: 'mostrar', 4: 'filtrar',
+                 5: 'modificar', 6: 'eliminar', 7: 'ordenar', 8: 'estadisticas',
+                 9: 'explorar'}
 
 def main():
 
@@ -14,11 +26,63 @@ def main():
     DIRECTORIO_DATOS = "datos_paises"
     NIVELES_JERARQUIA = ['continente', 'region', 'gobierno']
     CAMPOS_CSV_ITEM = ['nombre', 'poblacion', 'superficie']
+    # Caché binaria de la última carga (se guarda al lado de 'datos_paises')
+    ARCHIVO_SNAPSHOT = DIRECTORIO_DATOS + ".snap"
+    # Journal de cambios pendientes (Modificar/Eliminar) y cada cuántos
+    # cambios se aplican en lote a los CSV
+    ARCHIVO_JOURNAL = DIRECTORIO_DATOS + ".journal"
+    LOTE_JOURNAL = 20
+    # Filas por página al mostrar los ítems
+    ITEMS_POR_PAGINA = 50
+    # Si es True, la opción 8 compara los agregados incrementales
+    # contra un recálculo completo (útil para depurar)
+    VERIFICAR_ESTADISTICAS = False
     # --- Fin Definición ---
 
     items_globales = []
+    manifiesto = {}  # Firma de cada CSV leído, para la recarga incremental
     datos_cargados = False
 
+    # Servidor local de consultas: python main.py servidor [--puerto N]
+    if len(sys.argv) > 1 and sys.argv[1] == "servidor":
+        sys.exit(servidor.ejecutar_servidor(sys.argv[2:], backends.BackendCSV(
+            DIRECTORIO_DATOS, NIVELES_JERARQUIA, CAMPOS_CSV_ITEM, ARCHIVO_JOURNAL,
+            ARCHIVO_SNAPSHOT, LOTE_JOURNAL)))
+
+    # Modo no interactivo: python main.py <comando> [opciones] [";" <comando> ...]
+    # o python main.py lote [archivo]. Ver cli.py o 'python main.py --help'.
+    # Con 'python main.py --sqlite archivo <comando>' los datos salen de una
+    # base SQLite (se crea con: python main.py migrar --a-sqlite archivo).
+    if len(sys.argv) > 1:
+        sys.exit(cli.ejecutar_cli(
+            sys.argv[1:], DIRECTORIO_DATOS, NIVELES_JERARQUIA, CAMPOS_CSV_ITEM,
+            ARCHIVO_JOURNAL, ARCHIVO_SNAPSHOT, LOTE_JOURNAL, ITEMS_POR_PAGINA))
+
+    # Si la sesión anterior se cortó con cambios sin aplicar, se aplican ahora
+    fn.compactar_journal(ARCHIVO_JOURNAL, CAMPOS_CSV_ITEM)
+
+    # El vigilante avisa qué CSV cambiaron (altas, ediciones externas...),
+    # así los datos en memoria se mantienen al día sin volver a la opción 1.
+    # Arranca ANTES de la carga para no perder cambios que pasen durante ella.
+    vigilante = vig.VigilanteDatos(DIRECTORIO_DATOS)
+    vigilante.iniciar()
+
+    def sincronizar():
+        resumen = fn.sincronizar_con_disco(
+            DIRECTORIO_DATOS, NIVELES_JERARQUIA, items_globales, manifiesto,
+            vigilante, ARCHIVO_JOURNAL, CAMPOS_CSV_ITEM)
+        if resumen:
+            vw.mostrar_resumen_recarga(resumen)
+
+    # Si existe un snapshot de una sesión anterior, arrancamos con los datos
+    # ya cargados (solo se leen los CSV que cambiaron desde entonces).
+    if os.path.exists(ARCHIVO_SNAPSHOT):
+        items_globales = fn.cargar_almacen(
+            DIRECTORIO_DATOS, NIVELES_JERARQUIA, manifiesto=manifiesto,
+            ruta_snapshot=ARCHIVO_SNAPSHOT)
+        datos_cargados = True
+        print(f"⚡ Datos restaurados desde '{ARCHIVO_SNAPSHOT}': {len(items_globales)} ítems.")
+
     while True:
 
         # 1. Llamar a la VISTA para mostrar el menú
@@ -26,43 +90,86 @@ def main():
 
         # 2. Llamar a VALIDACIONES para obtener la opción
         opcion = val.validar_opcion_menu(
-            "➡️  Seleccione una opción (0-8): ", 0, 8)
+            "➡️  Seleccione una opción (0-9): ", 0, 9)
         print()
+        # (Instrumentación) el tiempo de cada acción incluye sus preguntas
+        inicio_accion = time.perf_counter()
+
+        # Antes de cada acción, aplicamos lo que haya cambiado en el disco
+        if datos_cargados and opcion != 1:
+            sincronizar()
 
         if opcion == 0:
+            fn.compactar_journal(ARCHIVO_JOURNAL, CAMPOS_CSV_ITEM)
+            vigilante.cerrar()
             print("👋 Saliendo del sistema de Gestión Jerárquica... ¡Hasta pronto!")
             break
 
         elif opcion == 1:
             
             # 3. Llamar a FUNCIONES para la lógica (Lectura Recursiva)
+            fn.compactar_journal(ARCHIVO_JOURNAL, CAMPOS_CSV_ITEM)
             print(f"Leyendo datos desde '{DIRECTORIO_DATOS}'...")
-            items_globales = fn.cargar_datos_recursivo(
-                DIRECTORIO_DATOS, NIVELES_JERARQUIA)
+            items_globales = fn.cargar_almacen(
+                DIRECTORIO_DATOS, NIVELES_JERARQUIA, manifiesto=manifiesto,
+                ruta_snapshot=ARCHIVO_SNAPSHOT)
             datos_cargados = True
             print(
                 f"✅ Lectura completada. Se encontraron {len(items_globales)} ítems en total.")
 
+        elif not datos_cargados and opcion in [3, 4]:
+
+            # Sin datos cargados, Mostrar y Filtrar leen directo del disco
+            # "en flujo": la salida empieza enseguida y no se carga todo.
+            # Un filtro por jerarquía solo recorre las carpetas que lo cumplen.
+            if opcion == 4:
+                vw.mostrar_menu_filtro()
+                opcion_filtro = val.validar_opcion_menu(
+                    "Seleccione un filtro: ", 1, 4)
+                items_en_disco = fn.filtrar_en_disco(
+                    DIRECTORIO_DATOS, NIVELES_JERARQUIA, opcion_filtro, NIVELES_JERARQUIA[0])
+            else:
+                items_en_disco = fn.iterar_datos_recursivo(
+                    DIRECTORIO_DATOS, NIVELES_JERARQUIA)
+            vw.mostrar_items_stream(items_en_disco, NIVELES_JERARQUIA)
+
         elif not datos_cargados and opcion not in [0, 2]:
             print("⚠️ Debe ejecutar la opción 1 (Cargar/Recargar Datos) primero.")
 
         elif opcion == 2:
 
             # Alta de Ítem
-            if fn.alta_item(DIRECTORIO_DATOS, NIVELES_JERARQUIA, CAMPOS_CSV_ITEM):
-                datos_cargados = False  # Forzar recarga
+            # Si ya había datos, el vigilante ve el CSV que cambió y
+            # solo se relee ese
+            ruta_alta = fn.alta_item(DIRECTORIO_DATOS, NIVELES_JERARQUIA, CAMPOS_CSV_ITEM)
+            if ruta_alta and datos_cargados:
+                vigilante.marcar(ruta_alta)
+                sincronizar()
 
         elif opcion == 3:
 
-            # Mostrar Ítems Totales
-            vw.mostrar_items(items_globales, NIVELES_JERARQUIA)
+            # Mostrar Ítems Totales (de a una página por vez)
+            pagina = 1
+            while True:
+                total_paginas = vw.mostrar_items(
+                    items_globales, NIVELES_JERARQUIA, pagina, ITEMS_POR_PAGINA)
+                if total_paginas <= 1:
+                    break
+                navegar = input(
+                    "(S)iguiente, (A)nterior, (V)olver al menú: ").strip().upper()
+                if navegar == 'S' and pagina < total_paginas:
+                    pagina += 1
+                elif navegar == 'A' and pagina > 1:
+                    pagina -= 1
+                elif navegar == 'V':
+                    break
 
         elif opcion == 4:
 
             # Filtrado
             vw.mostrar_menu_filtro()
             opcion_filtro = val.validar_opcion_menu(
-                "Seleccione un filtro: ", 1, 3)
+                "Seleccione un filtro: ", 1, 4)
             
             # Llama a LÓGICA para filtrar (pasando el 1er nivel de la jerarquía)
             resultados = fn.filtrar_items(
@@ -74,14 +181,20 @@ def main():
         elif opcion == 5:
 
             # Modificación
-            if fn.modificar_item(items_globales, NIVELES_JERARQUIA, CAMPOS_CSV_ITEM):
-                datos_cargados = False
+            # La memoria ya quedó al día: el cambio va al journal y los CSV
+            # se actualizan en lote cada LOTE_JOURNAL cambios
+            if fn.modificar_item(items_globales, NIVELES_JERARQUIA, CAMPOS_CSV_ITEM, ARCHIVO_JOURNAL):
+                fn.compactar_journal(
+                    ARCHIVO_JOURNAL, CAMPOS_CSV_ITEM, manifiesto, LOTE_JOURNAL)
 
         elif opcion == 6:
 
             # Eliminación
-            if fn.eliminar_item(items_globales, NIVELES_JERARQUIA, CAMPOS_CSV_ITEM):
-                datos_cargados = False
+            # La memoria ya quedó al día: el cambio va al journal y los CSV
+            # se actualizan en lote cada LOTE_JOURNAL cambios
+            if fn.eliminar_item(items_globales, NIVELES_JERARQUIA, CAMPOS_CSV_ITEM, ARCHIVO_JOURNAL):
+                fn.compactar_journal(
+                    ARCHIVO_JOURNAL, CAMPOS_CSV_ITEM, manifiesto, LOTE_JOURNAL)
 
         elif opcion == 7:
 
@@ -106,18 +219,95 @@ def main():
 
             reverso = (orden_in == 'D')
 
+            # Si solo se quieren los primeros N, no hace falta ordenar todo
+            limite = val.validar_entero_positivo_opcional(
+                "¿Cuántos mostrar? (Enter = todos): ")
+
             items_ordenados = fn.ordenar_items(
-                items_globales, clave_ordenamiento, reverso)
+                items_globales, clave_ordenamiento, reverso, limite)
             vw.mostrar_tabla_simple_ordenada(
-                items_ordenados, clave_ordenamiento)
+                items_ordenados, clave_ordenamiento, limite)
 
         elif opcion == 8:
             
-            # Estadísticas
+            # Estadísticas (agrupadas por uno o varios niveles)
+            for i, nivel in enumerate(NIVELES_JERARQUIA, start=1):
+                print(f"[{i}] {nivel.capitalize()}")
+            elegidos = val.validar_lista_opciones(
+                "Agrupar por (ej: 1 o 1,2; Enter = 1): ", 1, len(NIVELES_JERARQUIA), [1])
             stats_dict = fn.calcular_estadisticas(
-                items_globales, NIVELES_JERARQUIA[0])
+                items_globales, [NIVELES_JERARQUIA[i - 1] for i in elegidos],
+                verificar=VERIFICAR_ESTADISTICAS)
             vw.imprimir_estadisticas(stats_dict)
 
+        elif opcion == 9:
+
+            # Explorar la jerarquía nivel por nivel (los totales salen de
+            # los nodos del árbol que mantiene el almacén)
+            camino = []
+            while True:
+                exploracion = fn.explorar_jerarquia(
+                    items_globales, NIVELES_JERARQUIA, camino)
+                vw.mostrar_exploracion_jerarquia(exploracion)
+                if exploracion is None:
+                    camino.pop()  # Ese valor no existe: volvemos a mostrar el anterior
+                    continue
+                if exploracion['total'] is None:
+                    break
+                if exploracion['nivel_hijos']:
+                    mensaje = (f"Escriba un(a) {exploracion['nivel_hijos']} para bajar, "
+                               "'..' para subir o Enter para volver: ")
+                else:
+                    mensaje = "'..' para subir o Enter para volver: "
+                eleccion = input(mensaje).strip()
+                if not eleccion:
+                    break
+                if eleccion == '..':
+                    if camino:
+                        camino.pop()
+                elif exploracion['nivel_hijos']:
+                    camino.append(eleccion)
+
+        inst.registrar_tiempo(f"menu.{ACCIONES_MENU[opcion]}",
+                              time.perf_counter() - inicio_accion)
+
+
+def tomar_opciones_instrumentacion(argumentos):
+
+    """
+    Quita de 'argumentos' las opciones de diagnóstico y las aplica:
+      --instrumentar[=resumen.json]  contadores y tiempos (resumen al salir)
+      --perfil archivo.pstats        además, perfil completo con cProfile
+    Devuelve los argumentos restantes (los que entiende main()).
+    """
+    restantes = []
+    ruta_perfil = ruta_resumen = None
+    encender = False
+    i = 0
+    while i < len(argumentos):
+        arg = argumentos[i]
+        if arg == "--instrumentar" or arg.startswith("--instrumentar="):
+            encender = True
+            ruta_resumen = arg.partition("=")[2] or ruta_resumen
+        elif arg == "--perfil" and i + 1 < len(argumentos):
+            encender = True
+            ruta_perfil = argumentos[i + 1]
+            i += 1
+        elif arg.startswith("--perfil="):
+            encender = True
+            ruta_perfil = arg.partition("=")[2]
+        else:
+            restantes.append(arg)
+        i += 1
+    if encender:
+        inst.activar(ruta_perfil, ruta_resumen)
+    return restantes
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    inst.configurar_desde_entorno()
+    sys.argv[1:] = tomar_opciones_instrumentacion(sys.argv[1:])
+    try:
+        main()
+    finally:
+        vw.mostrar_resumen_instrumentacion(inst.finalizar())
\ No newline at end of file
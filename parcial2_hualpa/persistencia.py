@@ -1,77 +1,405 @@
 # MÓDULO: persistencia.py
 # RESPONSABILIDAD: Capa de Acceso a Datos (Data Access Layer).
-# Es el ÚNICO archivo que sabe cómo leer y escribir en el disco.
+# Es el ÚNICO archivo que sabe cómo leer y escribir los CSV en el disco
+# (la base SQLite opcional la maneja persistencia_sqlite.py).
 # No contiene lógica de negocio, solo operaciones de I/O (Input/Output).
+# Si la instrumentación está encendida, cada lectura/escritura suma su
+# tiempo ('io.*') y sus bytes ('io.*.bytes') en instrumentacion.py.
+# Varios procesos pueden escribir el mismo árbol a la vez: cada escritura
+# de un CSV (o del journal) se hace con un candado de ESE archivo (ver
+# bloquear_archivo()), así procesos que escriben hojas distintas no se
+# frenan entre sí y los que escriben la misma esperan su turno.
 # Importa csv y os.
 
+import contextlib
 import csv
+import io
+import json
+import mmap
 import os
+import struct
+import sys
+import time
+from array import array
 
+try:
+    import fcntl
+except ImportError:  # Windows: no hay candados de fcntl
+    fcntl = None
 
-def leer_csv_items(ruta_archivo_csv, jerarquia_info):
+import instrumentacion as inst
+
+# --- Snapshot binario (caché de la carga completa) ---
+# Formato: MAGIA | largo de cabecera (uint32) | cabecera JSON |
+#          tabla de cadenas (utf-8 separadas por '\0') |
+#          códigos de nombre (uint32) | poblaciones (int64) | superficies (float64)
+# Todo en little-endian. La cabecera guarda, por cada hoja, su firma
+# (mtime_ns, tamaño, inodo), su jerarquía y qué rango de filas le corresponde.
+MAGIA_SNAPSHOT = b'HUALPA\x00\x01'
+
+# Todos los bytes menos ',' y '\n' (ver _columnas_csv())
+_NO_SEPARADORES = bytes(b for b in range(256) if b not in b',\n')
+
+
+def iterar_csv_items(ruta_archivo_csv, jerarquia_info):
     
     """
-    (PERSISTENCIA) Lee un archivo CSV específico.
+    (PERSISTENCIA) Lee un archivo CSV específico, fila por fila (generador).
     Recibe la ruta completa del archivo y el diccionario de jerarquía
     (ej: {'continente': 'America'}) y los fusiona con los datos del CSV.
     Maneja excepciones de archivos corruptos.
+    Con la instrumentación encendida suma 'io.iterar_csv' (solo el tiempo
+    de leer y convertir, no el de quien consume las filas) y
+    'io.iterar_csv.filas'.
     """
-    items = []
+    filas = _iterar_csv_items(ruta_archivo_csv, jerarquia_info)
+    if not inst.activo:
+        yield from filas
+        return
+
+    reloj = time.perf_counter
+    segundos = 0.0
+    cantidad = 0
+    try:
+        while True:
+            inicio = reloj()
+            try:
+                item = next(filas)
+            except StopIteration:
+                break
+            finally:
+                segundos += reloj() - inicio
+            cantidad += 1
+            yield item
+    finally:
+        filas.close()
+        inst.registrar_tiempo('io.iterar_csv', segundos)
+        inst.contar('io.iterar_csv.filas', cantidad)
+
+
+def _iterar_csv_items(ruta_archivo_csv, jerarquia_info):
+
+    """Ayuda (PERSISTENCIA): El generador de iterar_csv_items(), sin medir."""
     try:
         # Usamos 'with open' para garantizar que el archivo se cierre
         # automáticamente, incluso si hay un error. (Requisito Fase 2)
         with open(ruta_archivo_csv, 'r', encoding='utf-8', newline='') as f:
+            if inst.activo:
+                inst.contar('io.leer_csv.bytes', os.fstat(f.fileno()).st_size)
 
             # DictReader es ideal porque lee directo a diccionarios.
             reader = csv.DictReader(f)
             for fila in reader:
                 try:
                     # Convertimos los tipos de datos leídos (que son strings)
-                    # a los tipos correctos (int, float).
-                    item = {
-                        'nombre': fila['nombre'],
-                        'poblacion': int(fila['poblacion']),
-                        'superficie': float(fila['superficie']),
-                        **jerarquia_info,  # Desempaqueta el dict de jerarquía
-                        'ruta_archivo': ruta_archivo_csv  # Guardamos la ruta para Modificar/Eliminar
-                    }
-                    items.append(item)
-                except (ValueError, KeyError, TypeError) as e:
+                    # a los tipos correctos, con las MISMAS reglas que
+                    # leer_csv_items(): las dos lecturas omiten las mismas filas.
+                    nombre, poblacion, superficie = _convertir_fila(
+                        fila, 'nombre', 'poblacion', 'superficie')
+                    if nombre is None:
+                        raise ValueError("falta el nombre")
+                except (ValueError, KeyError, TypeError, OverflowError) as e:
 
                     # Si una fila está mal (ej. "poblacion": "abc"), la saltamos.
-                    print(
-                        f"⚠️ Fila corrupta en {ruta_archivo_csv} omitida: {e}")
+                    _rechazar_fila(ruta_archivo_csv, e)
+                    continue
+                item = {
+                    'nombre': nombre,
+                    'poblacion': poblacion,
+                    'superficie': superficie,
+                    **jerarquia_info,  # Desempaqueta el dict de jerarquía
+                    'ruta_archivo': ruta_archivo_csv  # Guardamos la ruta para Modificar/Eliminar
+                }
+                yield item
     except FileNotFoundError:
 
         # Manejo de excepción obligatorio (Requisito Fase 2)
         print(f"❌ Error: No se encontró el archivo {ruta_archivo_csv}")
     except Exception as e:
         print(f"❌ Error inesperado al leer {ruta_archivo_csv}: {e}")
-    return items
 
 
-def reescribir_csv_especifico(ruta_archivo, items_del_archivo, campos_item_csv):
+class HojaItems:
+
+    """
+    (PERSISTENCIA) Ítems de UNA hoja (un CSV), guardados por columnas.
+    La jerarquía y la ruta se guardan UNA sola vez para todo el archivo,
+    no copiadas en cada fila. Se usa como una lista de solo lectura:
+    len(), iteración e índice devuelven dicts nuevos con el mismo formato
+    de siempre ('nombre', 'poblacion', 'superficie', niveles, 'ruta_archivo').
+    AlmacenItems.extend() reconoce esta clase y copia las columnas directo.
+    """
+
+    __slots__ = ('ruta_archivo', 'jerarquia_info', 'nombres', 'poblaciones', 'superficies')
+
+    def __init__(self, ruta_archivo, jerarquia_info, nombres=None,
+                 poblaciones=None, superficies=None):
+        self.ruta_archivo = ruta_archivo
+        self.jerarquia_info = jerarquia_info
+        self.nombres = nombres if nombres is not None else []
+        self.poblaciones = poblaciones if poblaciones is not None else array('q')
+        self.superficies = superficies if superficies is not None else array('d')
+
+    def __len__(self):
+        return len(self.nombres)
+
+    def _item(self, nombre, poblacion, superficie):
+        return {
+            'nombre': nombre,
+            'poblacion': poblacion,
+            'superficie': superficie,
+            **self.jerarquia_info,
+            'ruta_archivo': self.ruta_archivo
+        }
+
+    def __iter__(self):
+        for fila in zip(self.nombres, self.poblaciones, self.superficies):
+            yield self._item(*fila)
+
+    def __getitem__(self, posicion):
+        return self._item(self.nombres[posicion], self.poblaciones[posicion],
+                          self.superficies[posicion])
+
+
+def _columnas_csv(contenido):
+
+    """
+    Ayuda (PERSISTENCIA): Camino rápido para el caso normal (lo escribe
+    csv.writer y ningún valor lleva comas ni comillas). Verifica que TODAS
+    las líneas tengan la misma cantidad de comas (borrando de los bytes
+    todo lo que no sea ',' o salto de línea y comparando con el patrón
+    esperado) y después parte el archivo entero con UN solo split: cada
+    columna es un campo de cada N. Devuelve (cabecera, columnas), o None
+    si hay que usar csv.reader (comillas, líneas vacías, filas desparejas).
+    """
+    if b'"' in contenido:
+        return None
+    if b'\r' in contenido:
+        contenido = contenido.replace(b'\r\n', b'\n')
+        if b'\r' in contenido:
+            return None
+    if not contenido.endswith(b'\n'):
+        contenido += b'\n'
+    ancho = contenido.count(b',', 0, contenido.index(b'\n')) + 1
+    separadores = contenido.translate(None, _NO_SEPARADORES)
+    if separadores != (b',' * (ancho - 1) + b'\n') * (len(separadores) // ancho):
+        return None
+    campos = contenido[:-1].decode('utf-8').replace('\n', ',').split(',')
+    return campos[:ancho], [campos[ancho + i::ancho] for i in range(ancho)]
+
+
+def _filas_csv(contenido):
+
+    """Ayuda (PERSISTENCIA): Filas (listas de campos) del CSV, sin las líneas vacías."""
+    texto = contenido.decode('utf-8')
+    return [fila for fila in csv.reader(io.StringIO(texto, newline='')) if fila]
+
+
+def _convertir_fila(fila, i_nombre, i_poblacion, i_superficie):
+
+    """
+    Ayuda (PERSISTENCIA): Convierte una fila de a una. Lanza ValueError,
+    IndexError u OverflowError si la fila está mal.
+    """
+    poblacion = int(fila[i_poblacion])
+    array('q', [poblacion])  # OverflowError si no entra en 64 bits
+    return fila[i_nombre], poblacion, float(fila[i_superficie])
+
+
+def _rechazar_fila(ruta_archivo_csv, motivo):
+    inst.contar('csv.filas_rechazadas')
+    print(f"⚠️ Fila corrupta en {ruta_archivo_csv} omitida: {motivo}")
+
+
+def parsear_csv_items(contenido, ruta_archivo_csv, jerarquia_info):
 
     """
-    (PERSISTENCIA) Sobrescribe (modo 'w') un archivo CSV.
+    (PERSISTENCIA) Convierte el contenido (bytes) de un items.csv en una
+    HojaItems. Primero intenta convertir cada columna entera de una vez
+    (map(int, ...) sobre toda la columna); si alguna fila está mal, repite
+    fila por fila con csv.reader para avisar cuáles se omiten, igual que antes.
+    """
+    hoja = HojaItems(ruta_archivo_csv, jerarquia_info)
+
+    # Camino rápido: sin comillas, filas parejas y todos los números válidos
+    rapido = _columnas_csv(contenido)
+    if rapido is not None:
+        cabecera, columnas = rapido
+        # Si un campo se repite en la cabecera, gana el último (como csv.DictReader)
+        posiciones = {campo: i for i, campo in enumerate(cabecera)}
+        if all(campo in posiciones for campo in ('nombre', 'poblacion', 'superficie')):
+            try:
+                hoja.poblaciones = array('q', map(int, columnas[posiciones['poblacion']]))
+                hoja.superficies = array('d', map(float, columnas[posiciones['superficie']]))
+                hoja.nombres = columnas[posiciones['nombre']]
+                return hoja
+            except (ValueError, OverflowError):
+                hoja = HojaItems(ruta_archivo_csv, jerarquia_info)
+
+    # Camino lento: las revisamos de a una para avisar cuáles están mal
+    filas = _filas_csv(contenido)
+    if not filas:
+        return hoja
+    posiciones = {campo: i for i, campo in enumerate(filas[0])}
+    faltantes = [c for c in ('nombre', 'poblacion', 'superficie') if c not in posiciones]
+    if faltantes:
+        for _ in filas[1:]:
+            _rechazar_fila(ruta_archivo_csv, f"falta la columna {faltantes[0]!r}")
+        return hoja
+
+    i_nombre = posiciones['nombre']
+    i_poblacion = posiciones['poblacion']
+    i_superficie = posiciones['superficie']
+    for fila in filas[1:]:
+        try:
+            nombre, poblacion, superficie = _convertir_fila(
+                fila, i_nombre, i_poblacion, i_superficie)
+        except IndexError:
+            _rechazar_fila(ruta_archivo_csv, f"tiene {len(fila)} columnas y se "
+                           f"esperaban {max(i_nombre, i_poblacion, i_superficie) + 1}")
+            continue
+        except (ValueError, OverflowError) as e:
+            _rechazar_fila(ruta_archivo_csv, e)
+            continue
+        hoja.nombres.append(nombre)
+        hoja.poblaciones.append(poblacion)
+        hoja.superficies.append(superficie)
+    return hoja
+
+
+def leer_csv_items(ruta_archivo_csv, jerarquia_info):
+    
+    """
+    (PERSISTENCIA) Lee un archivo CSV específico y devuelve todos sus
+    ítems como una HojaItems (se usa como una lista de dicts).
+    Lee el archivo de una sola vez y lo convierte por columnas.
+    Maneja excepciones de archivos corruptos.
+    """
+    with inst.cronometro('io.leer_csv'):
+        try:
+            # Usamos 'with open' para garantizar que el archivo se cierre
+            # automáticamente, incluso si hay un error. (Requisito Fase 2)
+            with open(ruta_archivo_csv, 'rb') as f:
+                contenido = f.read()
+            inst.contar('io.leer_csv.bytes', len(contenido))
+            return parsear_csv_items(contenido, ruta_archivo_csv, jerarquia_info)
+        except FileNotFoundError:
+
+            # Manejo de excepción obligatorio (Requisito Fase 2)
+            print(f"❌ Error: No se encontró el archivo {ruta_archivo_csv}")
+        except Exception as e:
+            print(f"❌ Error inesperado al leer {ruta_archivo_csv}: {e}")
+        return HojaItems(ruta_archivo_csv, jerarquia_info)
+
+
+@contextlib.contextmanager
+def bloquear_archivo(ruta_archivo):
+
+    """
+    (PERSISTENCIA) Candado exclusivo (fcntl.flock) para escribir
+    'ruta_archivo' entre procesos. Se toma sobre un archivo aparte
+    ('<ruta>.lock'), no sobre el CSV: _reemplazar_atomico() cambia el
+    archivo por otro (otro inodo) y un candado sobre el viejo ya no
+    protegería al nuevo. Es "consultivo": solo lo respetan los que
+    escriben a través de este módulo. Sin fcntl (Windows) no bloquea.
+    No es reentrante: no volver a pedirlo para el mismo archivo adentro.
+    """
+    if fcntl is None:
+        yield
+        return
+    with inst.cronometro('io.esperar_candado'), \
+            open(ruta_archivo + ".lock", 'a') as candado:
+        fcntl.flock(candado.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(candado.fileno(), fcntl.LOCK_UN)
+
+
+def version_archivo(ruta_archivo):
+
+    """
+    (PERSISTENCIA) Devuelve la "versión" de un archivo: (mtime_ns, tamaño,
+    inodo), o None si no existe. Como los CSV se reemplazan renombrando
+    (inodo nuevo) o crecen al agregar filas, cualquier escritura la cambia.
+    """
+    try:
+        st = os.stat(ruta_archivo)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _reemplazar_atomico(ruta_archivo, contenido):
+
+    """
+    (PERSISTENCIA) Escribe 'contenido' en un archivo temporal de la misma
+    carpeta y lo renombra sobre 'ruta_archivo'. os.replace es atómico:
+    si el programa se corta a mitad de camino, el archivo original
+    queda intacto (nunca queda un CSV truncado).
+    """
+    ruta_temporal = f"{ruta_archivo}.{os.getpid()}.tmp"
+    try:
+        with inst.cronometro('io.reemplazar_atomico'):
+            with open(ruta_temporal, 'w', encoding='utf-8', newline='') as f:
+                f.write(contenido)
+                f.flush()
+                os.fsync(f.fileno())
+                if inst.activo:
+                    inst.contar('io.reemplazar_atomico.bytes', os.fstat(f.fileno()).st_size)
+            os.replace(ruta_temporal, ruta_archivo)
+    except BaseException:
+        # Si algo falló, no dejamos basura en la carpeta
+        if os.path.exists(ruta_temporal):
+            os.remove(ruta_temporal)
+        raise
+
+
+def _escribir_csv(ruta_archivo, items_del_archivo, campos_item_csv):
+
+    """
+    Ayuda (PERSISTENCIA): Arma el CSV completo en memoria y reemplaza el
+    archivo de una vez. No toma el candado (lo toma quien la llama).
+    Devuelve la versión nueva del archivo (ver version_archivo()).
+    """
+    # Armamos todo el contenido en memoria y lo escribimos de una vez.
+    # (Requisito Fase 3 - Update/Delete)
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=campos_item_csv)
+    writer.writeheader()  # Siempre escribimos la cabecera
+
+    for item in items_del_archivo:
+
+        # Nos aseguramos de escribir solo los campos del CSV,
+        # no los de jerarquía (ej. 'continente').
+        item_para_csv = {campo: item[campo]
+                         for campo in campos_item_csv}
+        writer.writerow(item_para_csv)
+
+    _reemplazar_atomico(ruta_archivo, buffer.getvalue())
+    return version_archivo(ruta_archivo)
+
+
+def reescribir_csv_especifico(ruta_archivo, items_del_archivo, campos_item_csv,
+                              version_esperada=None):
+
+    """
+    (PERSISTENCIA) Sobrescribe un archivo CSV.
     Se usa para Modificar y Eliminar. Recibe la lista COMPLETA de ítems
     que deben quedar en ese archivo y lo re-escribe desde cero.
+    La escritura es atómica (archivo temporal + renombrar) y con el
+    candado del archivo. Con 'version_esperada' (la versión que tenía
+    cuando se leyó) se controla antes que nadie lo haya cambiado: si
+    cambió, NO se escribe (se perderían esos cambios) y devuelve False.
+    Si se guardó, devuelve la versión nueva (un valor verdadero).
     """
     try:
-        # Usamos modo 'w' (write/escribir) para borrar el contenido
-        # anterior y escribir el nuevo. (Requisito Fase 3 - Update/Delete)
-        with open(ruta_archivo, 'w', encoding='utf-8', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=campos_item_csv)
-            writer.writeheader()  # Siempre escribimos la cabecera
-
-            for item in items_del_archivo:
-                
-                # Nos aseguramos de escribir solo los campos del CSV,
-                # no los de jerarquía (ej. 'continente').
-                item_para_csv = {campo: item[campo]
-                                 for campo in campos_item_csv}
-                writer.writerow(item_para_csv)
-        return True
+        with bloquear_archivo(ruta_archivo):
+            if version_esperada is not None and version_archivo(ruta_archivo) != version_esperada:
+                print(f"⚠️ {ruta_archivo} cambió en disco desde que se leyó "
+                      f"(otro proceso): no se sobrescribe. Recargue y reintente.")
+                return False
+            return _escribir_csv(ruta_archivo, items_del_archivo, campos_item_csv) or True
 
     except (OSError, csv.Error) as e:
         print(
@@ -86,22 +414,26 @@ def agregar_item_csv(ruta_archivo_csv, item_para_csv, campos_item_csv):
 
     """
     (PERSISTENCIA) Agrega una nueva fila a un CSV (modo 'a').
-    Se usa para el Alta.
+    Se usa para el Alta. Con el candado del archivo: si otro proceso lo
+    está reemplazando, la fila no puede ir a parar al archivo viejo.
     """
     try:
-        # Comprobamos si el archivo existe para decidir si escribimos
-        # la cabecera (nombre,poblacion,superficie) o no.
-        archivo_existe = os.path.exists(ruta_archivo_csv)
-
         # Usamos modo 'a' (append/agregar) para añadir una línea al final
         # sin borrar lo que ya existe. (Requisito Fase 3 - Create)
-        with open(ruta_archivo_csv, 'a', encoding='utf-8', newline='') as f:
+        with bloquear_archivo(ruta_archivo_csv), inst.cronometro('io.agregar_csv'), \
+                open(ruta_archivo_csv, 'a', encoding='utf-8', newline='') as f:
             writer = csv.DictWriter(f, fieldnames=campos_item_csv)
+            tamano_inicial = f.tell()
 
-            if not archivo_existe:
-                writer.writeheader()  # Escribir cabecera solo si es un archivo nuevo
+            # Archivo vacío (recién creado): primero la cabecera
+            # (nombre,poblacion,superficie). Se decide con el candado
+            # tomado, así dos procesos no la escriben dos veces.
+            if tamano_inicial == 0:
+                writer.writeheader()
 
             writer.writerow(item_para_csv)
+            if inst.activo:
+                inst.contar('io.agregar_csv.bytes', f.tell() - tamano_inicial)
         return True
 
     except OSError as e:
@@ -111,3 +443,398 @@ def agregar_item_csv(ruta_archivo_csv, item_para_csv, campos_item_csv):
     except Exception as e:
         print(f"❌ Error inesperado durante la escritura: {e}")
         return False
+
+
+def agregar_items_csv(ruta_archivo_csv, items_para_csv, campos_item_csv):
+
+    """
+    (PERSISTENCIA) Versión masiva de agregar_item_csv(): agrega MUCHAS filas
+    a un CSV (modo 'a') armando todo el texto en memoria y haciendo
+    una sola escritura. Se usa en la importación masiva.
+    """
+    try:
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=campos_item_csv)
+        writer.writerows(items_para_csv)
+
+        with bloquear_archivo(ruta_archivo_csv), inst.cronometro('io.agregar_csv'), \
+                open(ruta_archivo_csv, 'a', encoding='utf-8', newline='') as f:
+            tamano_inicial = f.tell()
+            if tamano_inicial == 0:
+                csv.DictWriter(f, fieldnames=campos_item_csv).writeheader()
+            f.write(buffer.getvalue())
+            if inst.activo:
+                inst.contar('io.agregar_csv.bytes', f.tell() - tamano_inicial)
+        return True
+
+    except OSError as e:
+        print(
+            f"❌ Error de Sistema Operativo al escribir en {ruta_archivo_csv}: {e}")
+        return False
+
+
+def leer_feed(ruta_feed):
+
+    """
+    (PERSISTENCIA) Lee un archivo de importación masiva, fila por fila
+    (generador, no carga todo en memoria).
+    Soporta CSV con cabecera o JSONL (un objeto JSON por línea),
+    según la extensión. Produce tuplas (numero_linea, fila, error):
+    'fila' es un dict o None si la línea no se pudo interpretar.
+    """
+    with open(ruta_feed, 'r', encoding='utf-8', newline='') as f:
+        if ruta_feed.lower().endswith(('.jsonl', '.json')):
+            for numero_linea, linea in enumerate(f, start=1):
+                if not linea.strip():
+                    continue
+                try:
+                    fila = json.loads(linea)
+                except json.JSONDecodeError as e:
+                    yield numero_linea, None, f"JSON inválido: {e}"
+                    continue
+                if not isinstance(fila, dict):
+                    yield numero_linea, None, "Se esperaba un objeto JSON."
+                    continue
+                yield numero_linea, fila, None
+        else:
+            reader = csv.DictReader(f)
+            for fila in reader:
+                yield reader.line_num, fila, None
+
+
+# --- Journal de cambios (write-ahead) ---
+# Archivo JSONL de solo-agregar. Cada línea es una operación pendiente
+# sobre una fila de un CSV: {"op": "modificar"|"eliminar", "ruta", "fila",
+# "nombre", ["campo", "valor"]}. "fila" cuenta solo las filas válidas del
+# archivo (las que se cargan en memoria), no las corruptas que la carga
+# omite. La compactación las aplica a los CSV y recién ahí vacía el journal.
+
+def registrar_en_journal(ruta_journal, operaciones):
+
+    """
+    (PERSISTENCIA) Agrega una o más operaciones al journal con UNA sola
+    escritura y un solo fsync (group-commit). Cuando devuelve True, las
+    operaciones ya están a salvo en disco aunque el programa se corte.
+    """
+    lineas = "".join(
+        json.dumps(op, ensure_ascii=False) + "\n" for op in operaciones)
+    try:
+        # Candado: una compactación de otro proceso no puede vaciar el
+        # journal justo después de que agregamos y antes de aplicarlo
+        with bloquear_archivo(ruta_journal), inst.cronometro('io.journal'), \
+                open(ruta_journal, 'a', encoding='utf-8') as f:
+            f.write(lineas)
+            f.flush()
+            os.fsync(f.fileno())
+            if inst.activo:
+                inst.contar('io.journal.bytes', len(lineas.encode('utf-8')))
+        return True
+    except OSError as e:
+        print(f"❌ Error Crítico: No se pudo escribir el journal {ruta_journal}: {e}")
+        return False
+
+
+def leer_journal(ruta_journal):
+
+    """
+    (PERSISTENCIA) Devuelve la lista de operaciones pendientes del journal.
+    Una última línea incompleta (corte durante la escritura) se ignora:
+    esa operación nunca llegó a confirmarse.
+    """
+    operaciones = []
+    try:
+        with open(ruta_journal, 'r', encoding='utf-8') as f:
+            for linea in f:
+                if not linea.endswith("\n"):
+                    break  # Línea truncada
+                try:
+                    operaciones.append(json.loads(linea))
+                except json.JSONDecodeError:
+                    print(f"⚠️ Línea dañada en el journal {ruta_journal} omitida.")
+    except FileNotFoundError:
+        pass  # Sin journal = sin operaciones pendientes
+    return operaciones
+
+
+def reescribir_journal(ruta_journal, operaciones):
+
+    """(PERSISTENCIA) Reemplaza (atómicamente) el journal por 'operaciones'."""
+    try:
+        _reemplazar_atomico(ruta_journal, "".join(
+            json.dumps(op, ensure_ascii=False) + "\n" for op in operaciones))
+        return True
+    except OSError as e:
+        print(f"❌ Error Crítico: No se pudo reescribir el journal {ruta_journal}: {e}")
+        return False
+
+
+def vaciar_journal(ruta_journal):
+
+    """(PERSISTENCIA) Borra el journal una vez aplicadas sus operaciones."""
+    try:
+        os.remove(ruta_journal)
+    except FileNotFoundError:
+        pass
+
+
+def aplicar_operaciones_csv(ruta_archivo, operaciones, campos_item_csv,
+                           version_esperada=None):
+
+    """
+    (PERSISTENCIA) Aplica EN ORDEN un lote de operaciones del journal a UN
+    CSV y lo reemplaza de forma atómica. Lee y reescribe con el candado
+    del archivo tomado, así no se pierde una fila que otro proceso agregue
+    en el medio. Cada operación indica la posición de la fila (entre las
+    filas válidas, igual que en memoria) y el nombre que tenía: si en esa posición hay otro nombre (otro proceso borró
+    filas), se busca la fila por nombre; si no aparece (o hay varias con
+    ese nombre), la operación se descarta con un aviso.
+    Devuelve (aplicadas, version_nueva), o None si falló. 'version_nueva'
+    es la versión después de escribir si ANTES el archivo estaba en
+    'version_esperada' (nadie más lo tocó); si no, None: hay cambios
+    ajenos que quien lo tiene en memoria todavía no leyó.
+    """
+    try:
+        with bloquear_archivo(ruta_archivo):
+            version_anterior = version_archivo(ruta_archivo)
+            with inst.cronometro('io.leer_csv'), \
+                    open(ruta_archivo, 'r', encoding='utf-8', newline='') as f:
+                filas = list(csv.DictReader(f))
+                if inst.activo:
+                    inst.contar('io.leer_csv.bytes', os.fstat(f.fileno()).st_size)
+
+            # Las posiciones del journal son las de memoria: las filas
+            # corruptas no cuentan (y se conservan tal cual en el archivo)
+            validas = [fila for fila in filas if _fila_valida(fila)]
+            eliminadas = set()
+            aplicadas = 0
+            for op in operaciones:
+                posicion = _ubicar_fila(validas, op['fila'], op['nombre'])
+                if posicion is None:
+                    print(f"⚠️ Cambio sobre '{op['nombre']}' en {ruta_archivo} no coincide con el archivo, se omite.")
+                    continue
+                if op['op'] == 'eliminar':
+                    eliminadas.add(id(validas.pop(posicion)))
+                else:
+                    validas[posicion][op['campo']] = op['valor']
+                aplicadas += 1
+
+            if eliminadas:
+                filas = [fila for fila in filas if id(fila) not in eliminadas]
+            version_nueva = _escribir_csv(ruta_archivo, filas, campos_item_csv)
+    except FileNotFoundError:
+        print(f"⚠️ {ruta_archivo} ya no existe: {len(operaciones)} cambio(s) descartado(s).")
+        return 0, None
+    except (OSError, csv.Error) as e:
+        print(f"❌ Error al aplicar el journal sobre {ruta_archivo}: {e}")
+        return None
+
+    if version_esperada is not None and version_anterior != version_esperada:
+        version_nueva = None
+    return aplicadas, version_nueva
+
+
+def _fila_valida(fila):
+
+    """
+    Ayuda (PERSISTENCIA): True si una fila de csv.DictReader es de las que
+    la carga acepta (mismas reglas que _convertir_fila()).
+    """
+    try:
+        _convertir_fila(fila, 'nombre', 'poblacion', 'superficie')
+    except (KeyError, TypeError, ValueError, OverflowError):
+        return False
+    return fila['nombre'] is not None
+
+
+def _ubicar_fila(filas, fila, nombre):
+
+    """
+    Ayuda (PERSISTENCIA): Posición de la fila 'nombre' que el journal
+    anotó en 'fila'. Si ahí hay otra (se borraron o movieron filas), la
+    busca por nombre; None si no está o si hay más de una con ese nombre.
+    """
+    if 0 <= fila < len(filas) and filas[fila].get('nombre') == nombre:
+        return fila
+    posiciones = [i for i, f in enumerate(filas) if f.get('nombre') == nombre]
+    return posiciones[0] if len(posiciones) == 1 else None
+
+
+class EscritorSnapshot:
+
+    """
+    (PERSISTENCIA) Arma un snapshot binario columnar hoja por hoja:
+    agregar() copia las columnas de una hoja (la hoja ya se puede soltar)
+    y guardar() escribe el archivo al final. Así la carga no tiene que
+    tener todas las hojas a la vez para poder guardar el snapshot.
+    """
+
+    def __init__(self, niveles_jerarquia):
+        self.niveles = list(niveles_jerarquia)
+        self.cadenas = []
+        self.codigos_cadenas = {}
+        self.codigos_nombre = array('I')
+        self.poblaciones = array('q')
+        self.superficies = array('d')
+        self.info_hojas = []
+
+    def agregar(self, ruta, firma, jerarquia_info, items):
+        """Suma una hoja: 'items' es una HojaItems o una lista de dicts."""
+        self.info_hojas.append({
+            'ruta': ruta,
+            'firma': list(firma),
+            'jerarquia': [jerarquia_info.get(n) for n in self.niveles],
+            'inicio': len(self.poblaciones),
+            'cantidad': len(items)
+        })
+        if isinstance(items, HojaItems):
+            nombres = items.nombres
+            self.poblaciones.extend(items.poblaciones)
+            self.superficies.extend(items.superficies)
+        else:
+            nombres = [item['nombre'] for item in items]
+            self.poblaciones.extend(item['poblacion'] for item in items)
+            self.superficies.extend(item['superficie'] for item in items)
+        codigos_cadenas = self.codigos_cadenas
+        for nombre in nombres:
+            # Tabla de cadenas: cada nombre distinto se guarda una sola vez
+            codigo = codigos_cadenas.get(nombre)
+            if codigo is None:
+                codigo = codigos_cadenas[nombre] = len(self.cadenas)
+                self.cadenas.append(nombre)
+            self.codigos_nombre.append(codigo)
+
+    def guardar(self, ruta_snapshot):
+        """
+        Escribe el snapshot en un archivo temporal y lo renombra, para que
+        nunca quede a medio escribir. Devuelve True si se guardó.
+        """
+        columnas = (self.codigos_nombre, self.poblaciones, self.superficies)
+        if sys.byteorder != 'little':
+            columnas = [array(c.typecode, c) for c in columnas]
+            for columna in columnas:
+                columna.byteswap()
+
+        bloque_cadenas = '\0'.join(self.cadenas).encode('utf-8')
+        cabecera = json.dumps({
+            'niveles': self.niveles,
+            'hojas': self.info_hojas,
+            'cantidad_items': len(self.poblaciones),
+            'cantidad_cadenas': len(self.cadenas),
+            'bytes_cadenas': len(bloque_cadenas)
+        }).encode('utf-8')
+
+        ruta_temporal = ruta_snapshot + '.tmp'
+        try:
+            with inst.cronometro('io.snapshot_escribir'):
+                with open(ruta_temporal, 'wb') as f:
+                    f.write(MAGIA_SNAPSHOT)
+                    f.write(struct.pack('<I', len(cabecera)))
+                    f.write(cabecera)
+                    f.write(bloque_cadenas)
+                    for columna in columnas:
+                        columna.tofile(f)
+                    inst.contar('io.snapshot_escribir.bytes', f.tell())
+                os.replace(ruta_temporal, ruta_snapshot)
+            return True
+
+        except (OSError, OverflowError) as e:
+            print(f"⚠️ No se pudo guardar el snapshot {ruta_snapshot}: {e}")
+            return False
+
+
+def guardar_snapshot(ruta_snapshot, niveles_jerarquia, hojas):
+
+    """
+    (PERSISTENCIA) Guarda un snapshot binario columnar de los datos cargados.
+    'hojas' es una lista (o cualquier iterable) de tuplas
+    (ruta_archivo, firma, jerarquia_info, items). Ver EscritorSnapshot.
+    """
+    escritor = EscritorSnapshot(niveles_jerarquia)
+    for ruta, firma, jerarquia_info, items in hojas:
+        escritor.agregar(ruta, firma, jerarquia_info, items)
+    return escritor.guardar(ruta_snapshot)
+
+
+def leer_snapshot(ruta_snapshot, niveles_jerarquia):
+
+    """
+    (PERSISTENCIA) Abre un snapshot binario con mmap y devuelve un dict con
+    las columnas y la información de cada hoja (indexada por ruta).
+    Devuelve None si no existe, está dañado o fue creado con otra jerarquía.
+    """
+    try:
+        with inst.cronometro('io.snapshot_leer'), open(ruta_snapshot, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            inst.contar('io.snapshot_leer.bytes', len(mm))
+
+            if mm[:len(MAGIA_SNAPSHOT)] != MAGIA_SNAPSHOT:
+                return None
+            pos = len(MAGIA_SNAPSHOT)
+            (largo_cabecera,) = struct.unpack_from('<I', mm, pos)
+            pos += 4
+            cabecera = json.loads(mm[pos:pos + largo_cabecera].decode('utf-8'))
+            pos += largo_cabecera
+
+            if cabecera['niveles'] != list(niveles_jerarquia):
+                return None
+
+            bloque_cadenas = mm[pos:pos + cabecera['bytes_cadenas']]
+            pos += cabecera['bytes_cadenas']
+            cadenas = bloque_cadenas.decode('utf-8').split('\0')
+            if cabecera['cantidad_cadenas'] == 0:
+                cadenas = []
+
+            columnas = []
+            n = cabecera['cantidad_items']
+            for tipo in ('I', 'q', 'd'):
+                columna = array(tipo)
+                columna.frombytes(mm[pos:pos + n * columna.itemsize])
+                pos += n * columna.itemsize
+                if len(columna) != n:
+                    return None  # Archivo truncado
+                if sys.byteorder != 'little':
+                    columna.byteswap()
+                columnas.append(columna)
+
+    except FileNotFoundError:
+        return None  # Todavía no hay snapshot: no es un error
+    except (OSError, ValueError, KeyError, struct.error) as e:
+        print(f"⚠️ Snapshot {ruta_snapshot} inválido, se ignora: {e}")
+        return None
+
+    hojas = {}
+    for hoja in cabecera['hojas']:
+        hoja['firma'] = tuple(hoja['firma'])
+        hojas[hoja['ruta']] = hoja
+
+    return {
+        'niveles': cabecera['niveles'],
+        'hojas': hojas,
+        'cadenas': cadenas,
+        'codigos_nombre': columnas[0],
+        'poblacion': columnas[1],
+        'superficie': columnas[2]
+    }
+
+
+def items_desde_snapshot(snapshot, ruta_archivo):
+
+    """
+    (PERSISTENCIA) Reconstruye los ítems de UNA hoja del snapshot, como
+    la HojaItems que devuelve leer_csv_items().
+    """
+    hoja = snapshot['hojas'][ruta_archivo]
+    jerarquia_info = {
+        nivel: valor
+        for nivel, valor in zip(snapshot['niveles'], hoja['jerarquia'])
+        if valor is not None
+    }
+    cadenas = snapshot['cadenas']
+    inicio = hoja['inicio']
+    fin = inicio + hoja['cantidad']
+
+    return HojaItems(
+        ruta_archivo, jerarquia_info,
+        [cadenas[codigo] for codigo in snapshot['codigos_nombre'][inicio:fin]],
+        snapshot['poblacion'][inicio:fin],
+        snapshot['superficie'][inicio:fin])
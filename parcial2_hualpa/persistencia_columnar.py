@@ -0,0 +1,338 @@
+# MÓDULO: persistencia_columnar.py
+# RESPONSABILIDAD: Capa de Acceso a Datos para exportar/importar TODOS los
+# ítems (con sus niveles de jerarquía) en UN solo archivo columnar, en
+# lugar de miles de items.csv chicos. Se escribe y se lee por bloques de
+# filas ("row groups", como Parquet): nunca hay más de un bloque en memoria.
+# Formato propio, sin dependencias (.hcol):
+#   MAGIA | segmento cabecera | segmento bloque ... | segmento fin
+#   segmento = largo JSON (uint32) | largo datos (uint64) | JSON | datos
+# En cada bloque, cada columna va comprimida con zlib: los niveles como
+# diccionario (valores distintos en el JSON + códigos uint32), los nombres
+# en utf-8 separados por '\0', poblacion int64 y superficie float64
+# (little-endian). El segmento 'fin' trae los totales: un archivo sin él
+# está truncado y no se importa.
+# Si pyarrow está instalado, las rutas '.arrow' / '.feather' usan Arrow IPC
+# (un record batch por bloque). No contiene lógica de negocio.
+
+import json
+import os
+import struct
+import sys
+import zlib
+from array import array
+
+import instrumentacion as inst
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+except ImportError:  # Opcional: sin pyarrow se usa solo el formato propio
+    pa = None
+
+MAGIA_COLUMNAR = b'HUALCOL\x01'
+MAGIA_ARROW = b'ARROW1'
+EXTENSIONES_ARROW = ('.arrow', '.feather')
+VERSION_FORMATO = 1
+FILAS_POR_BLOQUE = 65536
+_SEGMENTO = struct.Struct('<IQ')  # largo JSON, largo datos
+
+
+def es_ruta_arrow(ruta_archivo):
+    return ruta_archivo.lower().endswith(EXTENSIONES_ARROW)
+
+
+def es_archivo_columnar(ruta_archivo):
+
+    """
+    (PERSISTENCIA) True si el archivo empieza con la marca del formato
+    propio o de Arrow (se usa para distinguirlo de un CSV/JSONL de importación).
+    """
+    try:
+        with open(ruta_archivo, 'rb') as f:
+            inicio = f.read(len(MAGIA_COLUMNAR))
+    except OSError:
+        return False
+    return inicio == MAGIA_COLUMNAR or inicio.startswith(MAGIA_ARROW)
+
+
+def _exigir_pyarrow():
+    if pa is None:
+        raise ValueError("Para archivos Arrow (.arrow/.feather) hace falta "
+                         "instalar pyarrow; sin él use la extensión .hcol.")
+
+
+def _a_little_endian(columna):
+    if sys.byteorder != 'little':
+        columna = array(columna.typecode, columna)
+        columna.byteswap()
+    return columna.tobytes()
+
+
+def _desde_little_endian(tipo, datos):
+    columna = array(tipo)
+    columna.frombytes(datos)
+    if sys.byteorder != 'little':
+        columna.byteswap()
+    return columna
+
+
+class EscritorColumnar:
+
+    """
+    (PERSISTENCIA) Escribe un archivo columnar de a bloques. Uso:
+        escritor = EscritorColumnar("paises.hcol", niveles, campos)
+        escritor.agregar(items)       # lotes de ítems o HojaItems, las veces que haga falta
+        resumen = escritor.cerrar()   # {'filas', 'bloques', 'bytes'}
+    Se escribe en un archivo temporal que recién al cerrar reemplaza al
+    destino (os.replace): nunca queda un archivo a medio escribir.
+    Los errores de disco se lanzan como OSError; los datos que no se
+    pueden guardar (ej: un nombre con '\\0'), como ValueError.
+    """
+
+    def __init__(self, ruta_archivo, niveles_jerarquia, campos_item_csv,
+                 filas_por_bloque=FILAS_POR_BLOQUE):
+        self.ruta_archivo = ruta_archivo
+        self.niveles = list(niveles_jerarquia)
+        self.campos = list(campos_item_csv)
+        self.filas_por_bloque = max(1, filas_por_bloque)
+        self.arrow = es_ruta_arrow(ruta_archivo)
+        self.filas = 0
+        self.bloques = 0
+        self._ruta_temporal = f"{ruta_archivo}.{os.getpid()}.tmp"
+        self._vaciar_pendientes()
+
+        cabecera = {'formato': 'hualpa-columnar', 'version': VERSION_FORMATO,
+                    'niveles': self.niveles, 'campos': self.campos}
+        if self.arrow:
+            _exigir_pyarrow()
+            self._esquema = pa.schema(
+                [pa.field(nivel, pa.string()) for nivel in self.niveles]
+                + [pa.field('nombre', pa.string()), pa.field('poblacion', pa.int64()),
+                   pa.field('superficie', pa.float64())],
+                metadata={'hualpa': json.dumps(cabecera)})
+            self._escritor_arrow = pa_ipc.new_file(self._ruta_temporal, self._esquema)
+            self._f = None
+        else:
+            self._f = open(self._ruta_temporal, 'wb')
+            self._f.write(MAGIA_COLUMNAR)
+            self._escribir_segmento(cabecera)
+
+    def _vaciar_pendientes(self):
+        self._niveles_pendientes = [[] for _ in self.niveles]
+        self._nombres = []
+        self._poblaciones = array('q')
+        self._superficies = array('d')
+
+    def _escribir_segmento(self, datos_json, datos=b''):
+        texto = json.dumps(datos_json, ensure_ascii=False).encode('utf-8')
+        self._f.write(_SEGMENTO.pack(len(texto), len(datos)))
+        self._f.write(texto)
+        self._f.write(datos)
+
+    def agregar(self, items):
+
+        """
+        Agrega un lote de ítems (dicts con sus niveles, o una HojaItems) y
+        escribe cada bloque que se completa. Se copia por columnas: una
+        HojaItems pasa sus columnas directo, sin armar un dict por fila.
+        """
+        if hasattr(items, 'jerarquia_info'):
+            n = len(items)
+            for nivel, columna in zip(self.niveles, self._niveles_pendientes):
+                columna.extend([items.jerarquia_info.get(nivel)] * n)
+            self._nombres.extend(items.nombres)
+            self._poblaciones.extend(items.poblaciones)
+            self._superficies.extend(items.superficies)
+        else:
+            for nivel, columna in zip(self.niveles, self._niveles_pendientes):
+                columna.extend([item.get(nivel) for item in items])
+            self._nombres.extend([item['nombre'] for item in items])
+            self._poblaciones.extend([item['poblacion'] for item in items])
+            self._superficies.extend([item['superficie'] for item in items])
+        while len(self._nombres) >= self.filas_por_bloque:
+            self._escribir_bloque()
+
+    def _escribir_bloque(self):
+        # Escribe hasta 'filas_por_bloque' filas pendientes; el resto queda
+        n = min(len(self._nombres), self.filas_por_bloque)
+        if not n:
+            return
+        niveles = [columna[:n] for columna in self._niveles_pendientes]
+        nombres = self._nombres[:n]
+        poblaciones = self._poblaciones[:n]
+        superficies = self._superficies[:n]
+        with inst.cronometro('io.columnar_escribir_bloque'):
+            if self.arrow:
+                self._escritor_arrow.write_batch(pa.record_batch(
+                    [pa.array(columna, pa.string()) for columna in niveles]
+                    + [pa.array(nombres, pa.string()), pa.array(poblaciones),
+                       pa.array(superficies)],
+                    schema=self._esquema))
+            else:
+                columnas, partes = [], []
+                for nivel, valores in zip(self.niveles, niveles):
+                    # Diccionario: en un bloque hay pocos valores distintos por nivel
+                    codigos_por_valor = {v: i for i, v in enumerate(dict.fromkeys(valores))}
+                    codigos = array('I', map(codigos_por_valor.__getitem__, valores))
+                    partes.append(zlib.compress(_a_little_endian(codigos), 1))
+                    columnas.append({'nombre': nivel, 'tipo': 'diccionario',
+                                     'valores': list(codigos_por_valor),
+                                     'bytes': len(partes[-1])})
+                texto_nombres = '\0'.join(nombres)
+                if texto_nombres.count('\0') != n - 1:
+                    raise ValueError("Hay un nombre con el carácter '\\0': no se puede exportar.")
+                partes.append(zlib.compress(texto_nombres.encode('utf-8'), 1))
+                columnas.append({'nombre': 'nombre', 'tipo': 'texto', 'bytes': len(partes[-1])})
+                for campo, columna, tipo in (('poblacion', poblaciones, 'int64'),
+                                             ('superficie', superficies, 'float64')):
+                    partes.append(zlib.compress(_a_little_endian(columna), 1))
+                    columnas.append({'nombre': campo, 'tipo': tipo, 'bytes': len(partes[-1])})
+                self._escribir_segmento({'filas': n, 'columnas': columnas}, b''.join(partes))
+        self.filas += n
+        self.bloques += 1
+        for columna in self._niveles_pendientes:
+            del columna[:n]
+        del self._nombres[:n]
+        del self._poblaciones[:n]
+        del self._superficies[:n]
+
+    def cerrar(self):
+        """Escribe lo pendiente y el cierre, y reemplaza el destino. Devuelve el resumen."""
+        try:
+            self._escribir_bloque()
+            if self.arrow:
+                self._escritor_arrow.close()
+            else:
+                self._escribir_segmento({'fin': True, 'filas': self.filas,
+                                         'bloques': self.bloques})
+                self._f.flush()
+                os.fsync(self._f.fileno())
+                self._f.close()
+            os.replace(self._ruta_temporal, self.ruta_archivo)
+        except BaseException:
+            self.descartar()
+            raise
+        tamano = os.path.getsize(self.ruta_archivo)
+        inst.contar('io.columnar_escribir.bytes', tamano)
+        return {'filas': self.filas, 'bloques': self.bloques, 'bytes': tamano}
+
+    def descartar(self):
+        """Abandona la escritura: el destino queda como estaba."""
+        if self.arrow:
+            try:
+                self._escritor_arrow.close()
+            except Exception:
+                pass
+        elif not self._f.closed:
+            self._f.close()
+        if os.path.exists(self._ruta_temporal):
+            os.remove(self._ruta_temporal)
+
+
+def _leer_segmento(f):
+    encabezado = f.read(_SEGMENTO.size)
+    if len(encabezado) < _SEGMENTO.size:
+        raise ValueError("archivo truncado")
+    largo_json, largo_datos = _SEGMENTO.unpack(encabezado)
+    texto = f.read(largo_json)
+    if len(texto) < largo_json:
+        raise ValueError("archivo truncado")
+    return json.loads(texto.decode('utf-8')), largo_datos
+
+
+def _cabecera_arrow(lector):
+    metadatos = lector.schema.metadata or {}
+    if b'hualpa' not in metadatos:
+        raise ValueError("el archivo Arrow no fue exportado por este programa")
+    return json.loads(metadatos[b'hualpa'].decode('utf-8'))
+
+
+def verificar_columnar(ruta_archivo):
+
+    """
+    (PERSISTENCIA) Revisa la estructura completa SIN descomprimir nada
+    (salta de segmento en segmento). Devuelve la cabecera con 'filas' y
+    'bloques' del cierre; lanza ValueError si está dañado o truncado
+    (así una importación no empieza con un archivo que no va a terminar).
+    """
+    with open(ruta_archivo, 'rb') as f:
+        magia = f.read(len(MAGIA_COLUMNAR))
+        if magia.startswith(MAGIA_ARROW):
+            _exigir_pyarrow()
+            lector = pa_ipc.open_file(ruta_archivo)
+            cabecera = _cabecera_arrow(lector)
+            cabecera['bloques'] = lector.num_record_batches
+            cabecera['filas'] = sum(lector.get_batch(i).num_rows
+                                    for i in range(lector.num_record_batches))
+            return cabecera
+        if magia != MAGIA_COLUMNAR:
+            raise ValueError("no es un archivo columnar exportado por este programa")
+        cabecera, _ = _leer_segmento(f)
+        filas = bloques = 0
+        tamano = os.fstat(f.fileno()).st_size
+        while True:
+            segmento, largo_datos = _leer_segmento(f)
+            if segmento.get('fin'):
+                if (segmento['filas'], segmento['bloques']) != (filas, bloques):
+                    raise ValueError("los totales del cierre no coinciden con los bloques")
+                break
+            if f.tell() + largo_datos > tamano:
+                raise ValueError("archivo truncado")
+            f.seek(largo_datos, os.SEEK_CUR)
+            filas += segmento['filas']
+            bloques += 1
+    cabecera['filas'] = filas
+    cabecera['bloques'] = bloques
+    return cabecera
+
+
+def iterar_bloques_columnar(ruta_archivo):
+
+    """
+    (PERSISTENCIA) Generador: lee el archivo de a UN bloque y produce
+    dicts de columnas {nivel: [valores], 'nombre': [...], 'poblacion':
+    array, 'superficie': array}. Lanza ValueError si está dañado.
+    """
+    with open(ruta_archivo, 'rb') as f:
+        magia = f.read(len(MAGIA_COLUMNAR))
+        if magia.startswith(MAGIA_ARROW):
+            _exigir_pyarrow()
+            lector = pa_ipc.open_file(ruta_archivo)
+            for i in range(lector.num_record_batches):
+                lote = lector.get_batch(i)
+                yield {nombre: lote.column(nombre).to_pylist() for nombre in lote.schema.names}
+            return
+        if magia != MAGIA_COLUMNAR:
+            raise ValueError("no es un archivo columnar exportado por este programa")
+
+        _leer_segmento(f)  # Cabecera (ver verificar_columnar())
+        while True:
+            segmento, largo_datos = _leer_segmento(f)
+            if segmento.get('fin'):
+                return
+            with inst.cronometro('io.columnar_leer_bloque'):
+                datos = f.read(largo_datos)
+                if len(datos) < largo_datos:
+                    raise ValueError("archivo truncado")
+                inst.contar('io.columnar_leer.bytes', largo_datos)
+                n = segmento['filas']
+                bloque, pos = {}, 0
+                for columna in segmento['columnas']:
+                    try:
+                        crudo = zlib.decompress(datos[pos:pos + columna['bytes']])
+                    except zlib.error as e:
+                        raise ValueError(f"bloque dañado: {e}") from None
+                    pos += columna['bytes']
+                    tipo = columna['tipo']
+                    if tipo == 'diccionario':
+                        valores = columna['valores']
+                        bloque[columna['nombre']] = [valores[c] for c in
+                                                     _desde_little_endian('I', crudo)]
+                    elif tipo == 'texto':
+                        bloque[columna['nombre']] = crudo.decode('utf-8').split('\0')
+                    else:
+                        bloque[columna['nombre']] = _desde_little_endian(
+                            'q' if tipo == 'int64' else 'd', crudo)
+                    if len(bloque[columna['nombre']]) != n:
+                        raise ValueError(f"la columna '{columna['nombre']}' no tiene {n} filas")
+            yield bloque
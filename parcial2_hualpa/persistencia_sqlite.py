@@ -0,0 +1,389 @@
+# MÓDULO: persistencia_sqlite.py
+# RESPONSABILIDAD: Capa de Acceso a Datos alternativa: una base SQLite
+# local (un solo archivo) en lugar de una carpeta con un CSV por hoja.
+# Igual que persistencia.py, no contiene lógica de negocio: guarda filas,
+# las lee y traduce los filtros, órdenes y agregados a SQL, para que los
+# resuelva SQLite con sus índices (sin traer todos los ítems a Python).
+# Tabla 'items': id, un par de columnas por nivel de jerarquía (el valor y
+# su versión normalizada '<nivel>_norm'), nombre, nombre_norm, poblacion
+# y superficie. Las escrituras van en transacciones: quien llama decide
+# cuándo confirmar (confirmar()), así varias escrituras van en un lote.
+# Importa sqlite3 (viene con Python).
+
+import json
+import sqlite3
+
+import instrumentacion as inst
+
+# Versión del esquema (se guarda en la tabla 'meta')
+VERSION_ESQUEMA = 1
+# Filas que se piden a SQLite de una vez al recorrer toda la tabla
+FILAS_POR_LECTURA = 1000
+
+
+def _columna(nombre):
+
+    """Ayuda (PERSISTENCIA): Nombre de columna entre comillas (identificador SQL)."""
+    return '"' + nombre.replace('"', '""') + '"'
+
+
+def abrir_base(ruta_base_datos, niveles_jerarquia):
+
+    """
+    (PERSISTENCIA) Abre (o crea) la base SQLite y sus índices. Si la base
+    ya existe, tiene que haberse creado con los mismos niveles de
+    jerarquía. Devuelve la conexión, o None si no se pudo abrir.
+    """
+    columnas_niveles = "".join(
+        f"{_columna(nivel)} TEXT, {_columna(nivel + '_norm')} TEXT, "
+        for nivel in niveles_jerarquia)
+    try:
+        conexion = sqlite3.connect(ruta_base_datos)
+        # WAL: los lectores no bloquean al que escribe (y viceversa)
+        conexion.execute("PRAGMA journal_mode=WAL")
+        conexion.execute("PRAGMA synchronous=NORMAL")
+        with conexion:
+            conexion.execute(
+                "CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor TEXT)")
+            fila = conexion.execute(
+                "SELECT valor FROM meta WHERE clave = 'niveles'").fetchone()
+            if fila is not None and json.loads(fila[0]) != list(niveles_jerarquia):
+                print(f"❌ La base {ruta_base_datos} tiene otros niveles de jerarquía: "
+                      f"{', '.join(json.loads(fila[0]))}.")
+                conexion.close()
+                return None
+
+            conexion.execute(
+                "CREATE TABLE IF NOT EXISTS items ("
+                "id INTEGER PRIMARY KEY, " + columnas_niveles +
+                "nombre TEXT NOT NULL, nombre_norm TEXT NOT NULL, "
+                "poblacion INTEGER NOT NULL, superficie REAL NOT NULL)")
+            # Si una carga masiva se cortó sin rearmarlos, se rearman acá
+            crear_indices(conexion, niveles_jerarquia)
+            conexion.executemany(
+                "INSERT OR IGNORE INTO meta (clave, valor) VALUES (?, ?)",
+                [('niveles', json.dumps(list(niveles_jerarquia))),
+                 ('version', str(VERSION_ESQUEMA))])
+        return conexion
+
+    except sqlite3.Error as e:
+        print(f"❌ Error: No se pudo abrir la base {ruta_base_datos}: {e}")
+        return None
+
+
+def crear_indices(conexion, niveles_jerarquia):
+
+    """
+    (PERSISTENCIA) Crea los índices que falten: nombre (búsqueda exacta y
+    orden), cada nivel (filtros), la jerarquía completa (agrupar y
+    navegar), población y superficie (rangos, orden, extremos y percentiles).
+    """
+    with inst.cronometro('io.sqlite.crear_indices'):
+        conexion.execute("CREATE INDEX IF NOT EXISTS idx_items_nombre "
+                         "ON items (nombre_norm, nombre)")
+        for nivel in niveles_jerarquia:
+            conexion.execute(
+                f"CREATE INDEX IF NOT EXISTS {_columna('idx_items_' + nivel)} "
+                f"ON items ({_columna(nivel + '_norm')})")
+        if niveles_jerarquia:
+            conexion.execute(
+                "CREATE INDEX IF NOT EXISTS idx_items_jerarquia ON items ("
+                + ", ".join(_columna(nivel) for nivel in niveles_jerarquia) + ")")
+        conexion.execute("CREATE INDEX IF NOT EXISTS idx_items_poblacion "
+                         "ON items (poblacion)")
+        conexion.execute("CREATE INDEX IF NOT EXISTS idx_items_superficie "
+                         "ON items (superficie)")
+
+
+def quitar_indices(conexion):
+
+    """
+    (PERSISTENCIA) Borra los índices de la tabla 'items'. Para una carga
+    masiva en una base vacía: insertar sin índices y armarlos al final
+    (crear_indices()) es mucho más rápido que mantenerlos fila por fila.
+    """
+    with conexion:
+        nombres = [fila[0] for fila in conexion.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' "
+            "AND tbl_name = 'items' AND sql IS NOT NULL")]
+        for nombre in nombres:
+            conexion.execute(f"DROP INDEX {_columna(nombre)}")
+
+
+def confirmar(conexion):
+
+    """(PERSISTENCIA) Confirma (COMMIT) las escrituras pendientes de la conexión."""
+    with inst.cronometro('io.sqlite.confirmar'):
+        conexion.commit()
+
+
+def cerrar_base(conexion):
+
+    """(PERSISTENCIA) Confirma lo pendiente y cierra la conexión."""
+    try:
+        confirmar(conexion)
+    finally:
+        conexion.close()
+
+
+def _fila_a_item(fila, niveles_jerarquia):
+    # (id, nivel_1, ..., nivel_n, nombre, poblacion, superficie)
+    item = {'id': fila[0]}
+    item.update(zip(niveles_jerarquia, fila[1:]))
+    item['nombre'], item['poblacion'], item['superficie'] = fila[-3:]
+    return item
+
+
+def _columnas_item(niveles_jerarquia):
+    return ", ".join(['id', *map(_columna, niveles_jerarquia),
+                      'nombre', 'poblacion', 'superficie'])
+
+
+def _valores_fila(jerarquia_valores, item_para_csv, normalizar, normalizados=None):
+    # 'normalizados': caché opcional {valor: normalizado} para los niveles,
+    # que se repiten mucho en una carga masiva
+    valores = []
+    for valor in jerarquia_valores:
+        valores.append(valor)
+        if valor is None:
+            valores.append(None)
+        elif normalizados is None:
+            valores.append(normalizar(valor))
+        else:
+            norm = normalizados.get(valor)
+            if norm is None:
+                norm = normalizados[valor] = normalizar(valor)
+            valores.append(norm)
+    nombre = item_para_csv['nombre']
+    valores.extend((nombre, normalizar(nombre),
+                    item_para_csv['poblacion'], item_para_csv['superficie']))
+    return valores
+
+
+def _sql_insertar(niveles_jerarquia):
+    columnas = [c for nivel in niveles_jerarquia for c in (nivel, nivel + '_norm')]
+    columnas += ['nombre', 'nombre_norm', 'poblacion', 'superficie']
+    return (f"INSERT INTO items ({', '.join(map(_columna, columnas))}) "
+            f"VALUES ({', '.join('?' * len(columnas))})")
+
+
+def insertar_item(conexion, niveles_jerarquia, jerarquia_valores, item_para_csv, normalizar):
+
+    """
+    (PERSISTENCIA) Agrega UNA fila (sin confirmar: ver confirmar()).
+    'normalizar' es la función que arma las columnas *_norm.
+    Devuelve el id nuevo, o None si falló.
+    """
+    try:
+        with inst.cronometro('io.sqlite.insertar'):
+            cursor = conexion.execute(
+                _sql_insertar(niveles_jerarquia),
+                _valores_fila(jerarquia_valores, item_para_csv, normalizar))
+        return cursor.lastrowid
+    except sqlite3.Error as e:
+        print(f"❌ Error al guardar en la base SQLite: {e}")
+        return None
+
+
+def insertar_items(conexion, niveles_jerarquia, filas, normalizar):
+
+    """
+    (PERSISTENCIA) Versión masiva: agrega todas las filas
+    (jerarquia_valores, item_para_csv) con un solo executemany, en UNA
+    transacción (o entran todas o ninguna). Devuelve cuántas entraron,
+    o None si falló.
+    """
+    normalizados = {}
+    try:
+        with inst.cronometro('io.sqlite.insertar_lote'), conexion:
+            cursor = conexion.executemany(
+                _sql_insertar(niveles_jerarquia),
+                (_valores_fila(jerarquia, item, normalizar, normalizados)
+                 for jerarquia, item in filas))
+        if inst.activo:
+            inst.contar('io.sqlite.filas_insertadas', cursor.rowcount)
+        return cursor.rowcount
+    except sqlite3.Error as e:
+        print(f"❌ Error al guardar el lote en la base SQLite (no se guardó nada): {e}")
+        return None
+
+
+def actualizar_campo(conexion, id_fila, campo, valor, normalizar):
+
+    """
+    (PERSISTENCIA) Cambia un campo (nombre, poblacion o superficie) de una
+    fila, sin confirmar. Devuelve True si la fila existía.
+    """
+    asignaciones, params = f"{_columna(campo)} = ?", [valor]
+    if campo == 'nombre':
+        asignaciones += ", nombre_norm = ?"
+        params.append(normalizar(valor))
+    try:
+        with inst.cronometro('io.sqlite.actualizar'):
+            cursor = conexion.execute(
+                f"UPDATE items SET {asignaciones} WHERE id = ?", (*params, id_fila))
+        return cursor.rowcount == 1
+    except sqlite3.Error as e:
+        print(f"❌ Error al modificar en la base SQLite: {e}")
+        return False
+
+
+def borrar_item(conexion, id_fila):
+
+    """(PERSISTENCIA) Borra una fila, sin confirmar. Devuelve True si existía."""
+    try:
+        with inst.cronometro('io.sqlite.borrar'):
+            cursor = conexion.execute("DELETE FROM items WHERE id = ?", (id_fila,))
+        return cursor.rowcount == 1
+    except sqlite3.Error as e:
+        print(f"❌ Error al eliminar en la base SQLite: {e}")
+        return False
+
+
+# --- Consultas: filtros, órdenes y agregados resueltos por SQLite ---
+# Las condiciones se arman como (texto SQL, parámetros); siempre con
+# parámetros '?', nunca pegando valores del usuario en el SQL.
+
+def _patron_glob(patron):
+    # fnmatch niega con '[!...]'; GLOB de SQLite, con '[^...]'
+    return patron.replace('[!', '[^')
+
+
+def armar_condiciones(niveles_jerarquia, criterio=None, restricciones=None, camino=None,
+                      nombre_exacto=None):
+
+    """
+    (PERSISTENCIA) Traduce a un WHERE de SQL:
+      - criterio: ('nombre', texto_norm) | ('nivel', valor_norm) |
+        ('rango', (min, max)) | ('jerarquia', {nivel: patrones_norm})
+      - restricciones: {nivel: patrones_norm} (comodines * ? [..], como fnmatch)
+      - camino: valores normalizados desde el primer nivel (None = sin valor)
+      - nombre_exacto: nombre normalizado completo
+    Todo compara contra las columnas normalizadas. Devuelve (sql, params);
+    sql es "" si no hay condiciones.
+    """
+    partes, params = [], []
+
+    if criterio is not None:
+        tipo, valor = criterio
+        if tipo == 'nombre':
+            partes.append("instr(nombre_norm, ?) > 0")
+            params.append(valor)
+        elif tipo == 'nivel':
+            partes.append(f"{_columna(niveles_jerarquia[0] + '_norm')} = ?")
+            params.append(valor)
+        elif tipo == 'rango':
+            partes.append("poblacion BETWEEN ? AND ?")
+            params.extend(valor)
+        elif tipo == 'jerarquia':
+            restricciones = {**(restricciones or {}), **valor}
+
+    for nivel, patrones in (restricciones or {}).items():
+        columna = _columna(nivel + '_norm')
+        partes.append("(" + " OR ".join(f"{columna} GLOB ?" for _ in patrones) + ")")
+        params.extend(_patron_glob(p) for p in patrones)
+
+    if nombre_exacto is not None:
+        partes.append("nombre_norm = ?")
+        params.append(nombre_exacto)
+
+    for nivel, valor in zip(niveles_jerarquia, camino or ()):
+        if valor is None:
+            partes.append(f"{_columna(nivel)} IS NULL")
+        else:
+            partes.append(f"{_columna(nivel + '_norm')} = ?")
+            params.append(valor)
+
+    return (" WHERE " + " AND ".join(partes) if partes else ""), params
+
+
+def consultar_items(conexion, niveles_jerarquia, condiciones=("", ()), orden=None,
+                    limite=None):
+
+    """
+    (PERSISTENCIA) Filas que cumplen 'condiciones' (ver armar_condiciones())
+    como lista de dicts (con su 'id'). 'orden' es una lista de
+    (columna, descendente); con 'limite' SQLite corta antes de traerlas.
+    """
+    sql = f"SELECT {_columnas_item(niveles_jerarquia)} FROM items{condiciones[0]}"
+    params = list(condiciones[1])
+    if orden:
+        sql += " ORDER BY " + ", ".join(
+            f"{_columna(columna)}{' DESC' if descendente else ''}"
+            for columna, descendente in orden)
+    if limite is not None:
+        sql += " LIMIT ?"
+        params.append(limite)
+    with inst.cronometro('io.sqlite.consultar'):
+        filas = conexion.execute(sql, params).fetchall()
+    if inst.activo:
+        inst.contar('io.sqlite.filas_leidas', len(filas))
+    return [_fila_a_item(fila, niveles_jerarquia) for fila in filas]
+
+
+def iterar_lotes_sqlite(conexion, niveles_jerarquia, filas_por_lote=FILAS_POR_LECTURA):
+
+    """
+    (PERSISTENCIA) Generador con TODAS las filas, en orden de jerarquía,
+    en listas de hasta 'filas_por_lote' ítems: la memoria no depende del total.
+    """
+    cursor = conexion.execute(
+        f"SELECT {_columnas_item(niveles_jerarquia)} FROM items ORDER BY "
+        + ", ".join([*map(_columna, niveles_jerarquia), 'id']))
+    while filas := cursor.fetchmany(filas_por_lote):
+        yield [_fila_a_item(fila, niveles_jerarquia) for fila in filas]
+
+
+def contar_items(conexion, condiciones=("", ())):
+
+    """(PERSISTENCIA) Cantidad de filas que cumplen 'condiciones'."""
+    return conexion.execute(
+        f"SELECT COUNT(*) FROM items{condiciones[0]}", condiciones[1]).fetchone()[0]
+
+
+_AGREGADOS = ("COUNT(*), SUM(poblacion), TOTAL(superficie), "
+              "MIN(poblacion), MAX(poblacion), MIN(superficie), MAX(superficie)")
+
+
+def consultar_agregados(conexion, columnas_grupo=(), condiciones=("", ())):
+
+    """
+    (PERSISTENCIA) Agregados con GROUP BY. Devuelve una lista de tuplas
+    (valores_de_grupo, cantidad, suma_pob, suma_sup, min_pob, max_pob,
+    min_sup, max_sup), ordenada por los valores del grupo (sin valor al
+    final). Sin 'columnas_grupo' devuelve una sola tupla con el total.
+    """
+    columnas = [_columna(c) for c in columnas_grupo]
+    sql = f"SELECT {', '.join([*columnas, _AGREGADOS])} FROM items{condiciones[0]}"
+    if columnas:
+        sql += (" GROUP BY " + ", ".join(columnas) + " ORDER BY "
+                + ", ".join(f"{c} IS NULL, {c}" for c in columnas))
+    with inst.cronometro('io.sqlite.agregados'):
+        filas = conexion.execute(sql, condiciones[1]).fetchall()
+    n = len(columnas)
+    return [(tuple(fila[:n]), *fila[n:]) for fila in filas]
+
+
+def item_extremo(conexion, niveles_jerarquia, columna, mayor):
+
+    """
+    (PERSISTENCIA) La fila con el mayor (o menor) valor de 'columna'
+    (a igual valor, la de menor id). Usa el índice: no recorre la tabla.
+    """
+    items = consultar_items(conexion, niveles_jerarquia,
+                            orden=[(columna, mayor), ('id', False)], limite=1)
+    return items[0] if items else None
+
+
+def valor_en_posicion(conexion, columna, posicion):
+
+    """
+    (PERSISTENCIA) El valor de 'columna' en la posición 'posicion' del
+    orden ascendente (0 = el menor). Recorre solo el índice.
+    """
+    fila = conexion.execute(
+        f"SELECT {_columna(columna)} FROM items ORDER BY {_columna(columna)} "
+        "LIMIT 1 OFFSET ?", (posicion,)).fetchone()
+    if fila is None:
+        raise IndexError(posicion)
+    return fila[0]
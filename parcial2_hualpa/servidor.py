@@ -0,0 +1,190 @@
+# MÓDULO: servidor.py
+# RESPONSABILIDAD: Servidor local de consultas (CONTROLADOR con asyncio).
+# Carga 'datos_paises' UNA vez y lo mantiene en memoria; atiende pedidos
+# por TCP en localhost con el mismo lenguaje de comandos que cli.py
+# (una línea por pedido, una línea JSON por respuesta):
+#   filtrar --nombre ar
+#   ["modificar", "--nombre", "San Marino", "--campo", "poblacion", "--valor", "35000"]
+# Los comandos se ejecutan de a uno (un candado), así las escrituras pasan
+# en orden por persistencia. Cada tanto pregunta al vigilante
+# (vigilancia.py) qué CSV cambiaron y relee solo esas hojas.
+#
+# Uso: python main.py servidor [--puerto 8765] [--intervalo 2]
+
+import argparse
+import asyncio
+import contextlib
+import json
+import shlex
+import signal
+import sys
+import time
+
+import cli
+import funciones as fn
+import vigilancia as vig
+import vistas as vw
+
+PUERTO_POR_DEFECTO = 8765
+HOSTS_LOCALES = ('127.0.0.1', 'localhost', '::1')
+COMANDOS_SERVIDOR = frozenset({'cargar', 'filtrar', 'ordenar', 'estadisticas', 'explorar',
+                               'alta', 'modificar', 'eliminar', 'importar'})
+COMANDOS_ESCRITURA = frozenset({'alta', 'modificar', 'eliminar', 'importar'})
+
+
+class ServidorConsultas:
+
+    """
+    (SERVIDOR) Atiende conexiones y ejecuta sus comandos sobre un
+    backends.BackendCSV ya cargado. Los comandos corren en un hilo aparte
+    (para no frenar el aceptar conexiones) pero de a UNO por vez.
+    """
+
+    def __init__(self, sesion, vigilante, intervalo_revision=2.0):
+        self.sesion = sesion
+        self.vigilante = vigilante
+        self.parser = cli.armar_parser(sesion.niveles)
+        self.intervalo_revision = intervalo_revision
+        self._candado = asyncio.Lock()
+        self.inicio = time.time()
+        self.pedidos = 0
+        self.recargas_externas = 0
+
+    def _revisar_cambios_externos(self):
+
+        """
+        (SERVIDOR) Relee las hojas que el vigilante vio cambiar
+        (ver funciones.sincronizar_con_disco()).
+        """
+        with contextlib.redirect_stdout(sys.stderr):
+            resumen = fn.sincronizar_con_disco(
+                self.sesion.directorio_datos, self.sesion.niveles, self.sesion.items,
+                self.sesion.manifiesto, self.vigilante, self.sesion.ruta_journal,
+                self.sesion.campos)
+            if resumen:
+                self.recargas_externas += 1
+                vw.mostrar_resumen_recarga(resumen)
+
+    async def _en_hilo(self, funcion, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, funcion, *args)
+
+    async def ejecutar(self, argumentos):
+
+        """(SERVIDOR) Ejecuta un pedido (lista de argumentos) y devuelve la respuesta."""
+        comando = argumentos[0] if argumentos else ''
+        async with self._candado:
+            self.pedidos += 1
+            if comando == 'estado':
+                return {'ok': True, 'comando': 'estado',
+                        'cantidad': len(self.sesion.items),
+                        'pedidos': self.pedidos,
+                        'recargas_externas': self.recargas_externas,
+                        'segundos_activo': round(time.time() - self.inicio, 1)}
+            if comando in COMANDOS_ESCRITURA:
+                # Antes de escribir, la memoria tiene que reflejar el disco
+                await self._en_hilo(self._revisar_cambios_externos)
+            return await self._en_hilo(cli.resolver_comando, self.sesion, self.parser,
+                                       argumentos, COMANDOS_SERVIDOR)
+
+    async def vigilar(self):
+
+        """(SERVIDOR) Tarea de fondo: revisa cambios externos cada 'intervalo_revision' s."""
+        while True:
+            await asyncio.sleep(self.intervalo_revision)
+            async with self._candado:
+                await self._en_hilo(self._revisar_cambios_externos)
+
+    async def atender(self, lector, escritor):
+
+        """(SERVIDOR) Atiende UNA conexión: un pedido por línea hasta que se cierre."""
+        try:
+            while linea := await lector.readline():
+                texto = linea.decode('utf-8', errors='replace').strip()
+                if not texto:
+                    continue
+                argumentos, error = _interpretar_pedido(texto)
+                if error:
+                    respuesta = {'ok': False, 'comando': texto, 'error': error}
+                else:
+                    respuesta = await self.ejecutar(argumentos)
+                escritor.write((vw.texto_respuesta_json(respuesta) + "\n").encode('utf-8'))
+                await escritor.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # El cliente se fue a mitad de camino
+        finally:
+            escritor.close()
+
+
+def _interpretar_pedido(texto):
+
+    """
+    Ayuda (SERVIDOR): Convierte una línea en la lista de argumentos.
+    Acepta una lista JSON (["filtrar", "--nombre", "ar"]) o texto con
+    el formato de la consola (filtrar --nombre ar).
+    Devuelve (argumentos, None) o (None, motivo).
+    """
+    if texto.startswith('['):
+        try:
+            argumentos = json.loads(texto)
+        except json.JSONDecodeError as e:
+            return None, f"JSON inválido: {e}"
+        if not all(isinstance(a, str) for a in argumentos):
+            return None, "Se esperaba una lista de textos."
+        return argumentos, None
+    try:
+        return shlex.split(texto), None
+    except ValueError as e:
+        return None, str(e)
+
+
+async def _servir(servidor, host, puerto):
+    conexiones = await asyncio.start_server(servidor.atender, host, puerto)
+    vigilancia = asyncio.create_task(servidor.vigilar())
+    vw.mostrar_inicio_servidor(host, puerto, len(servidor.sesion.items))
+
+    # Ctrl+C cancela esta tarea; SIGTERM (ej: 'kill') termina igual de prolijo
+    parada = asyncio.Event()
+    with contextlib.suppress(NotImplementedError, AttributeError):
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, parada.set)
+    try:
+        async with conexiones:
+            await parada.wait()
+    finally:
+        vigilancia.cancel()
+
+
+def ejecutar_servidor(argumentos, sesion):
+
+    """
+    (SERVIDOR) Punto de entrada: lee las opciones, carga los datos y
+    atiende hasta Ctrl+C. Al salir aplica el journal pendiente.
+    Devuelve el código de salida.
+    """
+    parser = argparse.ArgumentParser(prog="main.py servidor",
+                                     description="Servidor local de consultas.")
+    parser.add_argument('--host', default='127.0.0.1', choices=HOSTS_LOCALES,
+                        help="solo direcciones locales")
+    parser.add_argument('--puerto', type=int, default=PUERTO_POR_DEFECTO)
+    parser.add_argument('--intervalo', type=float, default=2.0,
+                        help="segundos entre revisiones de cambios externos")
+    args = parser.parse_args(argumentos)
+    if args.intervalo <= 0:
+        parser.error("--intervalo debe ser mayor que 0")
+
+    # El vigilante arranca antes de la carga para no perder cambios
+    vigilante = vig.VigilanteDatos(sesion.directorio_datos, args.intervalo)
+    vigilante.iniciar()
+    sesion.cargar()
+    servidor = ServidorConsultas(sesion, vigilante, args.intervalo)
+    try:
+        asyncio.run(_servir(servidor, args.host, args.puerto))
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        vw.mostrar_error_servidor(args.host, args.puerto, e)
+        return 1
+    finally:
+        vigilante.cerrar()
+        with contextlib.redirect_stdout(sys.stderr):
+            sesion.cerrar()
+    return 0
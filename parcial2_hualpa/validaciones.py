@@ -4,6 +4,84 @@
 # Mantenemos funciones separadas (ej. _entero vs _entero_positivo)
 # para cumplir con el Principio de Responsabilidad Única (SRP).
 
+import math
+import os
+import unicodedata
+from functools import lru_cache
+
+# La población se guarda en columnas array('q') (enteros de 64 bits):
+# un valor más grande se perdería al cargarlo
+MAXIMO_ENTERO = 2 ** 63 - 1
+
+# --- Reglas puras (sin input/print) ---
+# Devuelven el mensaje de error, o None si el valor es válido.
+# Las usan tanto las validaciones interactivas como la importación masiva,
+# así las reglas están escritas en un solo lugar.
+
+def error_string_alfabetico(texto):
+
+    """Regla: no vacío y sin números."""
+    if not texto:
+        return "La entrada no puede estar vacía."
+    if any(char.isdigit() for char in texto):
+        return "La entrada no puede contener números."
+    return None
+
+
+def error_nombre_carpeta(texto):
+
+    """Regla: el valor va a ser un nombre de carpeta: no puede "escaparse"."""
+    if not texto:
+        return "La entrada no puede estar vacía."
+    if os.sep in texto or '/' in texto or texto in ('.', '..'):
+        return "nombre de carpeta inválido."
+    return None
+
+
+def convertir_entero_positivo(valor):
+
+    """
+    Regla: entero > 0 (y que entre en 64 bits, ver MAXIMO_ENTERO).
+    Devuelve (numero, None) si es válido
+    o (None, mensaje_error) si no lo es.
+    Un feed JSONL puede traer números o booleanos ya convertidos: int()
+    aceptaría 1.5 (-> 1) y true (-> 1), que por teclado se rechazan.
+    Solo se acepta un float si no tiene decimales (ej: 3.0).
+    """
+    if isinstance(valor, bool) or (isinstance(valor, float) and not valor.is_integer()):
+        return None, "Se esperaba un valor numérico entero."
+    try:
+        num = int(valor)
+    except (ValueError, TypeError):
+        return None, "Se esperaba un valor numérico entero."
+    if num <= 0:
+        return None, "El valor debe ser positivo y mayor a cero."
+    if num > MAXIMO_ENTERO:
+        return None, f"El valor no puede ser mayor a {MAXIMO_ENTERO:,}."
+    return num, None
+
+
+def convertir_flotante_positivo(valor):
+
+    """
+    Regla: número real > 0 (y finito). Devuelve (numero, None) si es
+    válido o (None, mensaje_error) si no lo es.
+    """
+    if isinstance(valor, bool):
+        return None, "Se esperaba un valor numérico (ej: 150.75)."
+    try:
+        num = float(valor)
+    except (ValueError, TypeError):
+        return None, "Se esperaba un valor numérico (ej: 150.75)."
+    if not math.isfinite(num):
+        return None, "Se esperaba un valor numérico (ej: 150.75)."
+    if not num > 0:
+        return None, "El valor debe ser positivo y mayor a cero."
+    return num, None
+
+
+# --- Validaciones interactivas ---
+
 def validar_entero(mensaje):
 
     """
@@ -22,32 +100,45 @@ def validar_entero_positivo(mensaje):
     
     """
     Validación estricta de lógica de negocio (requisito Fase 3).
-    Reutiliza validar_entero() y añade la restricción de que sea > 0.
+    Pide hasta que la entrada cumpla convertir_entero_positivo().
     """
     while True:
-        num = validar_entero(mensaje)
-        if num > 0:
+        num, error = convertir_entero_positivo(input(mensaje))
+        if error:
+            print(f"❌ {error}")
+        else:
             return num
+
+
+def validar_entero_positivo_opcional(mensaje):
+
+    """
+    Igual que validar_entero_positivo() pero permite dejar la entrada
+    vacía (Enter), en cuyo caso devuelve None.
+    """
+    while True:
+        entrada = input(mensaje).strip()
+        if not entrada:
+            return None
+        num, error = convertir_entero_positivo(entrada)
+        if error:
+            print(f"❌ {error}")
         else:
-            print("❌ El valor debe ser positivo y mayor a cero.")
+            return num
 
 
 def validar_flotante_positivo(mensaje):
     
     """
     Validación estricta de lógica de negocio (requisito Fase 3).
-    Asegura que sea un float y que sea > 0.
+    Pide hasta que la entrada cumpla convertir_flotante_positivo().
     """
     while True:
-        try:
-            entrada = input(mensaje)
-            num = float(entrada)
-            if num > 0:
-                return num
-            else:
-                print("❌ El valor debe ser positivo y mayor a cero.")
-        except ValueError:
-            print("❌ Entrada inválida. Se esperaba un valor numérico (ej: 150.75)❗")
+        num, error = convertir_flotante_positivo(input(mensaje))
+        if error:
+            print(f"❌ {error}")
+        else:
+            return num
 
 
 def validar_opcion_menu(mensaje, min_val, max_val):
@@ -66,6 +157,31 @@ def validar_opcion_menu(mensaje, min_val, max_val):
                 f"❌ Opción inválida. El número debe estar entre {min_val} y {max_val}.")
 
 
+def validar_lista_opciones(mensaje, min_val, max_val, por_defecto):
+
+    """
+    Validación para elegir VARIAS opciones separadas por coma (ej: "1,2").
+    Cada número debe estar en [min, max] y no repetirse.
+    Si se presiona Enter sin escribir nada, devuelve 'por_defecto'.
+    """
+    while True:
+        entrada = input(mensaje).strip()
+        if not entrada:
+            return por_defecto
+        try:
+            numeros = [int(parte) for parte in entrada.split(',')]
+        except ValueError:
+            print("❌ Entrada inválida. Ingrese números separados por coma (ej: 1,2)❗")
+            continue
+        if len(set(numeros)) != len(numeros):
+            print("❌ No repita opciones.")
+        elif all(min_val <= num <= max_val for num in numeros):
+            return numeros
+        else:
+            print(
+                f"❌ Opción inválida. Los números deben estar entre {min_val} y {max_val}.")
+
+
 def validar_string_alfabetico(mensaje):
 
     """
@@ -77,10 +193,9 @@ def validar_string_alfabetico(mensaje):
     while True:
         entrada = input(mensaje).strip()
 
-        if not entrada:
-            print("❌ La entrada no puede estar vacía.")
-        elif any(char.isdigit() for char in entrada):
-            print("❌ La entrada no puede contener números.")
+        error = error_string_alfabetico(entrada)
+        if error:
+            print(f"❌ {error}")
         else:
             return entrada
 
@@ -99,17 +214,55 @@ def validar_string_no_vacio(mensaje):
             print("❌ La entrada no puede estar vacía.")
 
 
+def _construir_tabla_acentos():
+
+    """
+    Arma (una sola vez, al importar el módulo) la tabla de str.translate
+    que quita acentos y diacríticos: á -> a, ñ -> n, ç -> c, à -> a, etc.
+    Se calcula con unicodedata para todo el rango latino, más algunas
+    letras que Unicode no "descompone" (ø, ł, æ, ...).
+    """
+    tabla = {}
+    for codigo in range(0x00C0, 0x0250):  # Latin-1, Latin Extendido A y B
+        letra = chr(codigo)
+        base = "".join(c for c in unicodedata.normalize('NFKD', letra)
+                       if not unicodedata.combining(c))
+        if base and base != letra:
+            tabla[codigo] = base
+    tabla.update(str.maketrans({
+        'ø': 'o', 'ł': 'l', 'đ': 'd', 'ħ': 'h', 'ı': 'i',
+        'æ': 'ae', 'œ': 'oe', 'þ': 'th'
+    }))
+    return tabla
+
+
+_TABLA_ACENTOS = _construir_tabla_acentos()
+
+
+@lru_cache(maxsize=65536)
 def normalizar_texto(texto):
 
     """
     Función de utilidad para búsquedas y filtros.
     Pasa a minúsculas y quita acentos para que las
     comparaciones no fallen (ej: "America" == "américa").
+    Usa una tabla precalculada (un solo str.translate) y guarda los
+    últimos resultados en una caché acotada (lru_cache), así el mismo
+    texto no se normaliza dos veces.
+    """
+    return normalizar_texto_sin_cache(texto)
+
+
+def normalizar_texto_sin_cache(texto):
+
+    """
+    Igual que normalizar_texto(), sin la caché. Para textos que casi no
+    se repiten (ej: los nombres al cargar el almacén): guardarlos en la
+    caché solo ocuparía memoria.
     """
-    texto = texto.lower()
-    reemplazos = {
-        'á': 'a', 'é': 'e', 'í': 'i', 'ó': 'o', 'ú': 'u', 'ü': 'u'
-    }
-    for acento, sin_acento in reemplazos.items():
-        texto = texto.replace(acento, sin_acento)
+    texto = texto.casefold().translate(_TABLA_ACENTOS)
+    if not texto.isascii():
+        # Letras fuera de la tabla (ej: griego con tilde): caso general
+        texto = "".join(c for c in unicodedata.normalize('NFKD', texto)
+                        if not unicodedata.combining(c))
     return texto
@@ -0,0 +1,190 @@
+# MÓDULO: vigilancia.py
+# RESPONSABILIDAD: Detectar qué CSV de 'datos_paises' cambiaron en el disco
+# (por otro programa o por nosotros mismos) sin tener que recorrer todo.
+# En Linux usa inotify (vía ctypes, sin dependencias): el kernel avisa qué
+# archivo se creó, se reescribió o se borró. Si inotify no está disponible
+# (otro sistema operativo, límite de watches...), cae a "sondeo": cada
+# 'intervalo' segundos pide revisar todas las firmas (manifiesto).
+# No lee los CSV ni toca los datos: solo devuelve rutas candidatas.
+# funciones.sincronizar_con_disco() decide qué releer.
+
+import ctypes
+import ctypes.util
+import os
+import struct
+import time
+
+# Constantes de <sys/inotify.h>
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_MASCARA = (_IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE
+            | _IN_DELETE | _IN_DELETE_SELF | _IN_MOVE_SELF)
+_EVENTO = struct.Struct('iIII')  # wd, mask, cookie, len (+ nombre)
+
+
+def _cargar_libc():
+
+    """Ayuda (VIGILANCIA): libc con inotify, o None si no existe (ej: Windows/macOS)."""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+    return libc
+
+
+class VigilanteDatos:
+
+    """
+    (VIGILANCIA) Vigila el árbol de 'ruta_base'. Uso:
+        vigilante = VigilanteDatos("datos_paises"); vigilante.iniciar()
+        rutas, revisar_todo = vigilante.cambios()   # en cada vuelta del menú
+        vigilante.cerrar()
+    'modo' queda en 'inotify' o 'sondeo'.
+    """
+
+    def __init__(self, ruta_base, intervalo_sondeo=1.0):
+        self.ruta_base = ruta_base
+        self.intervalo_sondeo = intervalo_sondeo
+        self.modo = None
+        self._fd = None
+        self._libc = None
+        self._carpeta_por_wd = {}
+        self._ultimo_sondeo = time.monotonic()
+        self._pendiente_todo = False
+        self._marcadas = set()
+
+    def iniciar(self, usar_inotify=True):
+        """Empieza a vigilar. Devuelve el modo elegido."""
+        self.cerrar()
+        self._libc = _cargar_libc() if usar_inotify else None
+        if self._libc is not None:
+            fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd >= 0:
+                self._fd = fd
+                self.modo = 'inotify'
+                if os.path.isdir(self.ruta_base):
+                    try:
+                        self._vigilar_arbol(self.ruta_base)
+                    except OSError:
+                        self._pasar_a_sondeo()  # Ej: se agotaron los watches
+                return self.modo
+        self._pasar_a_sondeo()
+        return self.modo
+
+    def _pasar_a_sondeo(self):
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = None
+        self._carpeta_por_wd.clear()
+        self.modo = 'sondeo'
+        self._pendiente_todo = True
+
+    def _vigilar_carpeta(self, carpeta):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(carpeta), _MASCARA)
+        if wd < 0:
+            numero = ctypes.get_errno()
+            raise OSError(numero, os.strerror(numero), carpeta)
+        self._carpeta_por_wd[wd] = carpeta
+
+    def _vigilar_arbol(self, carpeta):
+        """Agrega watches a 'carpeta' y sus subcarpetas; devuelve los CSV que contienen."""
+        self._vigilar_carpeta(carpeta)
+        csvs = []
+        with os.scandir(carpeta) as it:
+            for entry in it:
+                if entry.is_dir():
+                    csvs.extend(self._vigilar_arbol(entry.path))
+                elif entry.name.endswith('.csv'):
+                    csvs.append(entry.path)
+        return csvs
+
+    def marcar(self, *rutas):
+        """Agrega rutas que se sabe que cambiaron (ej: el CSV de un alta)."""
+        self._marcadas.update(rutas)
+
+    def cambios(self):
+
+        """
+        (VIGILANCIA) Devuelve (rutas, revisar_todo): las rutas de CSV que
+        pueden haber cambiado desde la última llamada, y si además hay que
+        revisar todo el árbol (sondeo, o inotify perdió eventos).
+        """
+        rutas, self._marcadas = self._marcadas, set()
+
+        if self.modo == 'sondeo':
+            ahora = time.monotonic()
+            if self._pendiente_todo or ahora - self._ultimo_sondeo >= self.intervalo_sondeo:
+                self._ultimo_sondeo = ahora
+                self._pendiente_todo = False
+                return rutas, True
+            return rutas, False
+
+        if not self._carpeta_por_wd:
+            # La carpeta base todavía no existía: ¿ya la crearon?
+            if not os.path.isdir(self.ruta_base):
+                return rutas, False
+            try:
+                self._vigilar_arbol(self.ruta_base)
+            except OSError:
+                self._pasar_a_sondeo()
+            return rutas, True
+
+        revisar_todo = False
+        while True:
+            try:
+                datos = os.read(self._fd, 65536)
+            except BlockingIOError:
+                break  # No hay más eventos
+            pos = 0
+            while pos < len(datos):
+                wd, mascara, _, largo = _EVENTO.unpack_from(datos, pos)
+                pos += _EVENTO.size
+                nombre = os.fsdecode(datos[pos:pos + largo].rstrip(b'\0'))
+                pos += largo
+                if mascara & _IN_Q_OVERFLOW:
+                    revisar_todo = True
+                    continue
+                carpeta = self._carpeta_por_wd.get(wd)
+                if mascara & _IN_IGNORED:
+                    self._carpeta_por_wd.pop(wd, None)
+                    continue
+                if carpeta is None:
+                    continue
+                ruta = os.path.join(carpeta, nombre) if nombre else carpeta
+
+                if mascara & _IN_ISDIR:
+                    if mascara & (_IN_CREATE | _IN_MOVED_TO):
+                        # Carpeta nueva: la vigilamos y revisamos sus CSV
+                        try:
+                            rutas.update(self._vigilar_arbol(ruta))
+                        except FileNotFoundError:
+                            pass  # Se borró antes de que llegáramos
+                        except OSError:
+                            self._pasar_a_sondeo()
+                            return rutas, True
+                    else:
+                        revisar_todo = True  # Se borró o movió una carpeta entera
+                elif mascara & (_IN_DELETE_SELF | _IN_MOVE_SELF):
+                    revisar_todo = True
+                elif nombre.endswith('.csv'):
+                    rutas.add(ruta)
+        return rutas, revisar_todo
+
+    def cerrar(self):
+        """Deja de vigilar (libera el descriptor de inotify)."""
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = None
+        self._carpeta_por_wd.clear()
+        self.modo = None
@@ -5,6 +5,14 @@
 
 # NOTA: No necesita importar 'os' ni 'csv'.
 
+import json
+import sys
+from itertools import islice
+
+import instrumentacion as inst
+
+FORMATOS_SALIDA = ('tabla', 'tsv', 'jsonl')
+
 def mostrar_menu():
     """(VISTA) Muestra el menú principal de opciones del sistema."""
 
@@ -33,48 +41,193 @@ def mostrar_menu():
     print(f"│ {'[6] ❌  Eliminar Ítem ':<49}  │")
     print(f"│ {'[7] 🔀  Ordenar Ítems ':<49}  │")
     print(f"│ {'[8] 📊  Ver Estadísticas ':<49}  │")
+    print(f"│ {'[9] 🧭  Explorar Jerarquía ':<49}  │")
     print(borde_medio)
 
     print(f"│ {'[0] 🚪  Salir del Programa':<49}  │")
     print(borde_inf)
 
 
-def mostrar_items(lista_items, niveles_jerarquia):
+def _cabecera_items(niveles_jerarquia):
+    """(VISTA) Arma la cabecera de la tabla de ítems."""
+
+    # Construimos la cabecera de la tabla dinámicamente
+    cabecera_jerarquia = " | ".join(
+        [n.capitalize() for n in niveles_jerarquia])
+    return f"| {cabecera_jerarquia:<35} | {'Nombre':<30} | {'Población (hab)':>15} | {'Superficie (km²)':>18} |"
+
+
+def _formatear_fila_item(item, niveles_jerarquia):
+    """(VISTA) Arma el texto de UNA fila de la tabla de ítems."""
+
+    # Mostramos la jerarquía (requisito Fase 3)
+    jerarquia_str = " / ".join([item.get(n, 'N/A')
+                                  for n in niveles_jerarquia])
+    
+    # Formateamos los números para que sean legibles
+    # :, -> agrega separador de miles (1000000 -> 1,000,000)
+    # :.2f -> formatea como flotante con 2 decimales
+    pob_fmt = f"{item['poblacion']:,}"
+    sup_fmt = f"{item['superficie']:,.2f}"
+
+    # :<30 -> alinear a la izquierda, 30 espacios
+    # :>15 -> alinear a la derecha, 15 espacios
+    return f"| {jerarquia_str:<35} | {item['nombre']:<30} | {pob_fmt:>15} | {sup_fmt:>18} |"
+
+
+def _filas_de_pagina(items, pagina, por_pagina):
+    """(VISTA) Devuelve solo las filas de la página pedida (la 1 es la primera)."""
+    if por_pagina is None:
+        return list(items)
+    inicio = (pagina - 1) * por_pagina
+    if isinstance(items, list):
+        return items[inicio:inicio + por_pagina]
+    return list(islice(items, inicio, inicio + por_pagina))
+
+
+def _texto_tabla(filas, niveles_jerarquia):
+
+    """
+    (VISTA) Formatea TODAS las filas de una vez en un solo texto.
+    Los anchos de columna se calculan antes, con las filas de la página,
+    y el formato se arma una sola vez para todas las filas.
+    """
+    # La jerarquía suele repetirse mucho: unimos cada combinación una sola vez
+    cache_jerarquia = {}
+    columnas = []
+    for item in filas:
+        valores = tuple(item.get(n, 'N/A') for n in niveles_jerarquia)
+        jerarquia_str = cache_jerarquia.get(valores)
+        if jerarquia_str is None:
+            jerarquia_str = cache_jerarquia[valores] = " / ".join(valores)
+        columnas.append((jerarquia_str, item['nombre'],
+                         f"{item['poblacion']:,}", f"{item['superficie']:,.2f}"))
+
+    titulos = (" | ".join(n.capitalize() for n in niveles_jerarquia),
+               'Nombre', 'Población (hab)', 'Superficie (km²)')
+    anchos = [max([len(titulo)] + [len(fila[i]) for fila in columnas])
+              for i, titulo in enumerate(titulos)]
+
+    formato = (f"| {{:<{anchos[0]}}} | {{:<{anchos[1]}}} | "
+               f"{{:>{anchos[2]}}} | {{:>{anchos[3]}}} |")
+    separador = "-" * (sum(anchos) + 13)
+
+    lineas = [formato.format(*titulos), separador]
+    lineas.extend(formato.format(*fila) for fila in columnas)
+    lineas.append(separador)
+    return "\n".join(lineas) + "\n"
+
+
+def _texto_tsv(filas, niveles_jerarquia):
+    """(VISTA) Filas separadas por tabulaciones, con cabecera (para otras herramientas)."""
+    claves = [*niveles_jerarquia, 'nombre', 'poblacion', 'superficie']
+    lineas = ["\t".join(claves)]
+    for item in filas:
+        lineas.append("\t".join(
+            str(item.get(c, '')).replace("\t", " ").replace("\n", " ")
+            for c in claves))
+    return "\n".join(lineas) + "\n"
+
+
+def _texto_jsonl(filas, niveles_jerarquia):
+    """(VISTA) Un objeto JSON por línea (para otras herramientas)."""
+    claves = [*niveles_jerarquia, 'nombre', 'poblacion', 'superficie']
+    return "".join(
+        json.dumps({c: item.get(c) for c in claves}, ensure_ascii=False) + "\n"
+        for item in filas)
+
+
+@inst.medido('vista.pagina')
+def mostrar_pagina_items(items, niveles_jerarquia, pagina=1, por_pagina=50,
+                         formato='tabla'):
+
+    """
+    (VISTA) Muestra UNA página de ítems ('por_pagina=None' = todos).
+    'formato' puede ser 'tabla' (para leer), 'tsv' o 'jsonl' (para
+    procesar con otras herramientas). Todo el texto de la página se
+    arma en memoria y se escribe con una sola llamada.
+    Devuelve la cantidad de filas mostradas.
+    """
+    if pagina < 1 or (por_pagina is not None and por_pagina < 1):
+        print("❌ La página y los ítems por página deben ser mayores a cero.")
+        return 0
+    filas = _filas_de_pagina(items, pagina, por_pagina)
+    if formato == 'tsv':
+        texto = _texto_tsv(filas, niveles_jerarquia)
+    elif formato == 'jsonl':
+        texto = _texto_jsonl(filas, niveles_jerarquia)
+    else:
+        texto = _texto_tabla(filas, niveles_jerarquia)
+    sys.stdout.write(texto)
+    sys.stdout.flush()
+    return len(filas)
+
+
+@inst.medido('vista.items')
+def mostrar_items(lista_items, niveles_jerarquia, pagina=1, por_pagina=None):
     
     """
     (VISTA) Muestra una lista de items formateada como tabla.
+    Con 'por_pagina' muestra solo la página pedida.
+    Devuelve la cantidad total de páginas.
     """
     if not lista_items:
         print("ℹ️ No hay ítems para mostrar.")
-        return
+        return 0
 
-    # Construimos la cabecera de la tabla dinámicamente
-    cabecera_jerarquia = " | ".join(
-        [n.capitalize() for n in niveles_jerarquia])
-    print(f"\n--- LISTADO DE {len(lista_items)} ÍTEMS ---")
+    if por_pagina is not None and por_pagina < 1:
+        print("❌ Los ítems por página deben ser mayores a cero.")
+        return 0
+
+    total = len(lista_items)
+    total_paginas = 1 if por_pagina is None else -(-total // por_pagina)
+    pagina = min(max(pagina, 1), total_paginas)
+
+    titulo = f"\n--- LISTADO DE {total} ÍTEMS ---"
+    if total_paginas > 1:
+        titulo += f" (página {pagina} de {total_paginas})"
+    print(titulo)
     print()
-    print(
-        f"| {cabecera_jerarquia:<35} | {'Nombre':<30} | {'Población (hab)':>15} | {'Superficie (km²)':>18} |")
-    print("-" * 111)
+    mostrar_pagina_items(lista_items, niveles_jerarquia, pagina, por_pagina)
+    return total_paginas
+
+
+@inst.medido('vista.items_stream')
+def mostrar_items_stream(items, niveles_jerarquia, tamano_bloque=1000):
 
-    for item in lista_items:
+    """
+    (VISTA) Muestra ítems a medida que llegan de un iterable (ej: un
+    generador que lee del disco). No necesita saber cuántos son: las filas
+    se formatean y se escriben en bloques de 'tamano_bloque' con una sola
+    escritura por bloque. Devuelve la cantidad de ítems mostrados.
+    """
+    salida = sys.stdout
+    cantidad = 0
+    bloque = []
 
-        # Mostramos la jerarquía (requisito Fase 3)
-        jerarquia_str = " / ".join([item.get(n, 'N/A')
-                                      for n in niveles_jerarquia])
-        
-        # Formateamos los números para que sean legibles
-        # :, -> agrega separador de miles (1000000 -> 1,000,000)
-        # :.2f -> formatea como flotante con 2 decimales
-        pob_fmt = f"{item['poblacion']:,}"
-        sup_fmt = f"{item['superficie']:,.2f}"
+    for item in items:
+        if cantidad == 0:
+            salida.write("\n--- LISTADO DE ÍTEMS (en flujo) ---\n\n")
+            salida.write(_cabecera_items(niveles_jerarquia) + "\n")
+            salida.write("-" * 111 + "\n")
+        bloque.append(_formatear_fila_item(item, niveles_jerarquia))
+        cantidad += 1
+        if len(bloque) >= tamano_bloque:
+            bloque.append("")
+            salida.write("\n".join(bloque))
+            salida.flush()
+            bloque = []
 
-        # :<30 -> alinear a la izquierda, 30 espacios
-        # :>15 -> alinear a la derecha, 15 espacios
-        print(
-            f"| {jerarquia_str:<35} | {item['nombre']:<30} | {pob_fmt:>15} | {sup_fmt:>18} |")
+    if cantidad == 0:
+        print("ℹ️ No hay ítems para mostrar.")
+        return 0
 
-    print("-" * 111)
+    bloque.append("-" * 111)
+    bloque.append(f"Total: {cantidad} ítems.")
+    bloque.append("")
+    salida.write("\n".join(bloque))
+    salida.flush()
+    return cantidad
 
 
 def mostrar_menu_filtro():
@@ -83,9 +236,11 @@ def mostrar_menu_filtro():
     print("[1] Filtrar por Nombre (parcial)")
     print("[2] Filtrar por Continente (1er nivel)")
     print("[3] Filtrar por Rango de Población")
+    print("[4] Filtrar por Jerarquía (cualquier nivel, admite * y ?)")
     return
 
 
+@inst.medido('vista.filtro')
 def mostrar_resultados_filtro(resultados, niveles_jerarquia):
     """(VISTA) Muestra el resultado de un filtro."""
     if resultados:
@@ -96,23 +251,182 @@ def mostrar_resultados_filtro(resultados, niveles_jerarquia):
         print("ℹ️ No se encontraron ítems que coincidan con el filtro.")
 
 
-def mostrar_tabla_simple_ordenada(items_ordenados, clave_ordenamiento):
-    """(VISTA) Muestra una tabla simplificada para la Opción 7."""
-    print(f"\n✅ Ítems ordenados por '{clave_ordenamiento}':")
-    print(f"| {'Nombre':<35} | {clave_ordenamiento.capitalize():>20} |")
-    print("-" * 60)
-    for item in items_ordenados:
+@inst.medido('vista.ordenados')
+def mostrar_tabla_simple_ordenada(items_ordenados, clave_ordenamiento, limite=None):
+    """
+    (VISTA) Muestra una tabla simplificada para la Opción 7.
+    Con 'limite' muestra solo las primeras filas. Se escribe todo junto.
+    """
+    lineas = [f"\n✅ Ítems ordenados por '{clave_ordenamiento}':",
+              f"| {'Nombre':<35} | {clave_ordenamiento.capitalize():>20} |",
+              "-" * 60]
+    for item in islice(items_ordenados, limite):
         valor = item[clave_ordenamiento]
         # Formateo especial si es número
-        if isinstance(valor, (int, float)):
-            valor_fmt = f"{valor:,.2f}" if isinstance(
-                valor, float) else f"{valor:,}"
-            print(f"| {item['nombre']:<35} | {valor_fmt:>20} |")
+        if isinstance(valor, float):
+            valor_fmt = f"{valor:,.2f}"
+        elif isinstance(valor, int):
+            valor_fmt = f"{valor:,}"
         else:
-            print(f"| {item['nombre']:<35} | {str(valor):>20} |")
-    print("-" * 60)
+            valor_fmt = str(valor)
+        lineas.append(f"| {item['nombre']:<35} | {valor_fmt:>20} |")
+    lineas.append("-" * 60)
+    sys.stdout.write("\n".join(lineas) + "\n")
+
+
+def mostrar_resumen_recarga(resumen):
+    """(VISTA) Muestra qué archivos se releyeron en una recarga incremental."""
+    cambios = (len(resumen['agregados']) + len(resumen['modificados'])
+               + len(resumen['eliminados']))
+    if not cambios:
+        print("ℹ️ Los datos en memoria ya estaban al día.")
+        return
+    print(
+        f"🔄 Recarga incremental: {len(resumen['agregados'])} archivo(s) nuevo(s), "
+        f"{len(resumen['modificados'])} modificado(s), {len(resumen['eliminados'])} eliminado(s).")
+    print(f"   Total en memoria: {resumen['cantidad_items']} ítems.")
+
+
+def mostrar_resumen_importacion(resumen, max_errores=20):
+    """(VISTA) Muestra el resultado de una importación masiva."""
+    if resumen is None:
+        print("❌ La importación no se pudo realizar.")
+        return
+    print("\n--- 📥 IMPORTACIÓN MASIVA ---")
+    print(f"Filas leídas: {resumen['filas_leidas']:,}")
+    print(f"✅ Aceptadas: {resumen['aceptadas']:,} "
+          f"(en {resumen['archivos_escritos']:,} archivo(s))")
+    print(f"❌ Rechazadas: {len(resumen['rechazadas']):,}")
+    print(f"⏱️ {resumen['segundos']:.2f} s "
+          f"({resumen['filas_por_segundo']:,.0f} filas/s)")
+    for numero_linea, motivo in resumen['rechazadas'][:max_errores]:
+        ubicacion = f"línea {numero_linea}" if numero_linea else "escritura"
+        print(f" - {ubicacion}: {motivo}")
+    if len(resumen['rechazadas']) > max_errores:
+        print(f" ... y {len(resumen['rechazadas']) - max_errores} más.")
+
+
+def mostrar_resultados_benchmark(reporte, anterior=None):
+    """
+    (VISTA) Muestra un reporte de benchmark. Si se pasa un reporte
+    'anterior', agrega cuántas veces más rápido (>1) o lento (<1) es ahora.
+    """
+    previos = {}
+    if anterior:
+        for r in anterior.get('resultados', []):
+            previos[(r['filas'], r['estructura'], r['operacion'])] = r['segundos_min']
+
+    lineas = ["\n--- ⏱️ BENCHMARK ---",
+              f"{'Filas':>9} {'Estructura':<10} {'Operación':<18} "
+              f"{'Mejor (ms)':>11} {'Mediana (ms)':>13} {'Memoria (KB)':>13}"
+              + (f" {'vs anterior':>12}" if anterior else "")]
+    for r in reporte['resultados']:
+        memoria = r['memoria_pico_bytes']
+        texto_memoria = f"{memoria / 1024:,.0f}" if memoria is not None else "-"
+        linea = (f"{r['filas']:>9,} {r['estructura']:<10} {r['operacion']:<18} "
+                 f"{r['segundos_min'] * 1000:>11.2f} {r['segundos_mediana'] * 1000:>13.2f} "
+                 f"{texto_memoria:>13}")
+        if anterior:
+            previo = previos.get((r['filas'], r['estructura'], r['operacion']))
+            if previo and r['segundos_min']:
+                linea += f" {previo / r['segundos_min']:>11.2f}x"
+            else:
+                linea += f" {'-':>12}"
+        lineas.append(linea)
+    print("\n".join(lineas))
+
+
+def texto_respuesta_json(respuesta):
+    """
+    (VISTA) Respuesta de un comando como UNA línea JSON (fácil de leer
+    desde otro programa). La usan la consola y el servidor.
+    """
+    return json.dumps(respuesta, ensure_ascii=False, default=str)
+
 
+def mostrar_respuesta_json(respuesta):
+    """(VISTA) Muestra la respuesta de un comando del modo no interactivo."""
+    print(texto_respuesta_json(respuesta), flush=True)
 
+
+def mostrar_inicio_servidor(host, puerto, cantidad_items):
+    """(VISTA) Avisa que el servidor de consultas está escuchando."""
+    print(f"🟢 Servidor escuchando en {host}:{puerto} con {cantidad_items:,} ítems "
+          f"en memoria. Ctrl+C para detenerlo.", flush=True)
+
+
+def mostrar_error_servidor(host, puerto, error):
+    """(VISTA) El servidor no pudo abrir el puerto."""
+    print(f"❌ No se pudo abrir {host}:{puerto}: {error}", file=sys.stderr)
+
+
+def mostrar_resumen_instrumentacion(resumen):
+    """
+    (VISTA) Muestra los contadores y tiempos de instrumentacion.finalizar().
+    Se escribe por stderr para no mezclarse con la salida de 'listar'.
+    """
+    if not resumen:
+        return
+    lineas = ["\n--- 🔬 INSTRUMENTACIÓN ---"]
+    if resumen['contadores']:
+        lineas.append("Contadores:")
+        ancho = max(len(nombre) for nombre in resumen['contadores'])
+        for nombre, cantidad in resumen['contadores'].items():
+            lineas.append(f"  {nombre:<{ancho}} {cantidad:>14,}")
+    if resumen['tiempos']:
+        ancho = max(len(nombre) for nombre in resumen['tiempos'])
+        lineas.append(f"Tiempos:\n  {'':<{ancho}} {'Llamadas':>9} {'Total (ms)':>11} "
+                      f"{'Prom. (ms)':>11} {'Máx. (ms)':>10}")
+        for nombre, t in resumen['tiempos'].items():
+            lineas.append(
+                f"  {nombre:<{ancho}} {t['llamadas']:>9,} {t['segundos_total'] * 1000:>11.2f} "
+                f"{t['segundos_promedio'] * 1000:>11.3f} {t['segundos_max'] * 1000:>10.2f}")
+    for clave, texto in (('archivo_perfil', "💾 Perfil cProfile guardado en"),
+                         ('archivo_resumen', "💾 Resumen guardado en")):
+        if clave in resumen:
+            lineas.append(f"{texto} '{resumen[clave]}'.")
+    for clave in ('error_perfil', 'error_resumen'):
+        if clave in resumen:
+            lineas.append(f"❌ No se pudo guardar: {resumen[clave]}")
+    print("\n".join(lineas), file=sys.stderr)
+
+
+@inst.medido('vista.explorar')
+def mostrar_exploracion_jerarquia(exploracion):
+    """
+    (VISTA) Muestra un paso de la navegación por jerarquía: los totales
+    del nivel elegido y una fila por cada hijo.
+    """
+    if exploracion is None:
+        print("ℹ️ No existe ese camino en la jerarquía.")
+        return
+    if exploracion['total'] is None:
+        print("ℹ️ No hay datos cargados.")
+        return
+
+    titulo = " / ".join(exploracion['camino']) or "Todos los datos"
+    total = exploracion['total']
+    print(f"\n--- 🧭 {titulo} ---")
+    print(f"Ítems: {total['cantidad']} | Población: {total['total_poblacion']:,} hab. | "
+          f"Superficie: {total['total_superficie']:,.2f} km²")
+    print(f"Población mín./máx.: {total['min_poblacion']:,} / {total['max_poblacion']:,} | "
+          f"Superficie mín./máx.: {total['min_superficie']:,.2f} / {total['max_superficie']:,.2f}")
+
+    if not exploracion['hijos'] or exploracion['nivel_hijos'] is None:
+        return
+    hijos = exploracion['hijos']
+    encabezado = exploracion['nivel_hijos'].capitalize()
+    ancho = max(len(encabezado), *(len(nombre) for nombre in hijos))
+    print(f"\n| {encabezado:<{ancho}} | {'Ítems':>6} | {'Población total':>15} | "
+          f"{'Prom. población':>15} | {'Superficie total':>18} |")
+    print("-" * (ancho + 72))
+    for nombre, grupo in hijos.items():
+        print(f"| {nombre:<{ancho}} | {grupo['cantidad']:>6} | {grupo['total_poblacion']:>15,} | "
+              f"{grupo['promedio_poblacion']:>15,.0f} | {grupo['total_superficie']:>18,.2f} |")
+    print("-" * (ancho + 72))
+
+
+@inst.medido('vista.estadisticas')
 def imprimir_estadisticas(stats_dict):
     """
     (VISTA) Recibe el diccionario de estadísticas de la lógica
@@ -139,8 +453,31 @@ def imprimir_estadisticas(stats_dict):
     print(
         f"🏞️ Mayor Superficie: {stats_dict['pais_mayor_sup']['nombre']} ({stats_dict['pais_mayor_sup']['superficie']:,.2f} km²)")
     print("-" * 40)
-    print(f"🌍 Conteo por {stats_dict['primer_nivel_jerarquia'].capitalize()}:")
+    if 'percentiles_poblacion' in stats_dict:
+        pct_pob = " | ".join(
+            f"P{p}: {v:,.0f}" for p, v in stats_dict['percentiles_poblacion'].items())
+        pct_sup = " | ".join(
+            f"P{p}: {v:,.2f}" for p, v in stats_dict['percentiles_superficie'].items())
+        print(f"📈 Percentiles Población: {pct_pob}")
+        print(f"📈 Percentiles Superficie: {pct_sup}")
+        print("-" * 40)
+    nombre_grupo = " / ".join(
+        n.capitalize() for n in stats_dict['primer_nivel_jerarquia'].split(" / "))
+    print(f"🌍 Conteo por {nombre_grupo}:")
     # Usamos sorted() para que la lista de continentes salga ordenada
+    grupos = stats_dict.get('grupos', {})
     for valor, cantidad in sorted(stats_dict['conteo_primer_nivel'].items()):
-        print(f" - {valor}: {cantidad} ítems")
+        grupo = grupos.get(valor)
+        if grupo:
+            print(f" - {valor}: {cantidad} ítems "
+                  f"(prom. pob. {grupo['promedio_poblacion']:,.0f} hab., "
+                  f"prom. sup. {grupo['promedio_superficie']:,.2f} km²)")
+        else:
+            print(f" - {valor}: {cantidad} ítems")
     print("-" * 40)
+    if 'verificacion' in stats_dict:
+        if stats_dict['verificacion']:
+            print("⚠️ Los agregados NO coinciden con el recálculo en: "
+                  + ", ".join(stats_dict['verificacion']))
+        else:
+            print("✅ Agregados verificados contra un recálculo completo.")